@@ -4,23 +4,29 @@ from collections import defaultdict, deque
 from friday.environment.py_env import PythonEnv
 from friday.core.llms import OpenAI
 from friday.core.action_manager import ActionManager
+from friday.core.context_compactor import ContextCompactor
 from friday.action.get_os_version import get_os_version, check_os_version
 from friday.agent.prompt import prompt
 from friday.core.utils import get_open_api_description_pair, get_open_api_doc_path
 from utils import json_utils
 import re
+import copy
 import json
+import threading
 from utils.logger import Logger
 from pathlib import Path
 
 class FridayAgent(BaseAgent):
     """ AI agent class, including planning, retrieval and execution modules """
 
-    def __init__(self, config_path=None, action_lib_dir=None, max_iter=3, logger:Logger=None):
+    def __init__(self, config_path=None, action_lib_dir=None, max_iter=3, logger:Logger=None, llm=None, action_lib=None, environment=None):
+        """
+        llm, action_lib and environment may be passed in to share already initialized components between agents.
+        """
         super().__init__()
-        self.llm = OpenAI(config_path)
-        self.action_lib = ActionManager(config_path, action_lib_dir)
-        self.environment = PythonEnv()
+        self.llm = llm if llm is not None else OpenAI(config_path)
+        self.action_lib = action_lib if action_lib is not None else ActionManager(config_path, action_lib_dir)
+        self.environment = environment if environment is not None else PythonEnv()
         self.prompt = prompt
         self.system_version = get_os_version()
         self.planner = PlanningModule(self.llm, self.environment, self.action_lib, self.prompt['planning_prompt'], self.system_version, logger)
@@ -53,6 +59,9 @@ class PlanningModule(BaseAgent):
         self.execute_list = []
         self.logging = logger
         self.replan = False
+        # Guards the action graph when several actions are executed concurrently
+        self.graph_lock = threading.RLock()
+        self.context_compactor = ContextCompactor()
         
     def re_init(self):
         """
@@ -141,18 +150,42 @@ class PlanningModule(BaseAgent):
         """
         Update action node info.
         """
+        self._update_node(self.action_node[action], return_val, relevant_code, status, type, verbose=True)
+
+    def _update_node(self, node, return_val='', relevant_code=None, status=False, type='Code', verbose=False):
         if return_val:
             if type=='Code':
                 return_val = self.extract_information(return_val, "<return>", "</return>")
-                print("************************<return>**************************")
-                self.logging.info(return_val, title='Return Value', color='gray')
-                print(return_val)
-                print("************************</return>*************************")  
+                if verbose:
+                    print("************************<return>**************************")
+                    self.logging.info(return_val, title='Return Value', color='gray')
+                    print(return_val)
+                    print("************************</return>*************************")  
             if return_val != 'None':
-                self.action_node[action]._return_val = return_val
+                node._return_val = return_val
         if relevant_code:
-            self.action_node[action]._relevant_code = relevant_code
-        self.action_node[action]._status = status
+            node._relevant_code = relevant_code
+        node._status = status
+        node._summary = self.context_compactor.summarize(node.description, node.return_val, node._relevant_code)
+
+    def preview_pre_tasks_info(self, current_task, action, return_val='', relevant_code=None, type='Code'):
+        """
+        Get the prerequisite task information of current_task as it will be once action succeeds with return_val,
+        without updating the action graph.
+        """
+        node = copy.copy(self.action_node[action])
+        self._update_node(node, return_val, relevant_code, True, type)
+        return self.get_pre_tasks_info(current_task, {action: node})
+
+    def get_unblocked_actions(self, action):
+        """
+        Get the actions in execute list that become ready once action is executed.
+        """
+        return [
+            next_action for next_action in self.execute_list
+            if next_action != action and action in self.action_graph[next_action]
+            and all(self.action_node[pre_action].status for pre_action in self.action_graph[next_action] if pre_action != action)
+        ]
 
     def task_decompose_format_message(self, task, action_list, files_and_folders):
         """
@@ -309,21 +342,33 @@ class PlanningModule(BaseAgent):
         else:
             return "Cycle detected in the graph, topological sort not possible."
         
-    def get_pre_tasks_info(self, current_task):
+    def get_ready_actions(self):
         """
-        Get string information of the prerequisite task for the current task.
+        Get the actions in execute list whose prerequisite actions have all been executed.
+        """
+        ready_actions = []
+        for action in self.execute_list:
+            if all(self.action_node[pre_action].status for pre_action in self.action_graph[action]):
+                ready_actions.append(action)
+        return ready_actions
+
+    def get_pre_tasks_info(self, current_task, nodes=None):
+        """
+        Get string information of the prerequisite task for the current task, within the context token budget.
+        nodes optionally overrides some action nodes by name.
         """
         pre_tasks_info = {}
         for task in self.action_graph[current_task]:
+            node = (nodes or {}).get(task) or self.action_node[task]
             task_info = {
-                "description" : self.action_node[task].description,
-                "return_val" : self.action_node[task].return_val
+                "description" : node.description,
+                "return_val" : node.return_val
             }
-            if self.action_node[task]._relevant_code:
-                task_info["relevant_code"] = self.action_node[task]._relevant_code
-            pre_tasks_info[task] = task_info
-        pre_tasks_info = json.dumps(pre_tasks_info)
-        return pre_tasks_info
+            if node._relevant_code:
+                task_info["relevant_code"] = node._relevant_code
+            summary = node.summary or self.context_compactor.summarize(node.description, node.return_val, node._relevant_code)
+            pre_tasks_info[task] = (task_info, summary)
+        return self.context_compactor.build(pre_tasks_info)
 
 
 
@@ -410,11 +455,11 @@ class RetrievalModule(BaseAgent):
             task_description=task_description,
             action_code_pair=action_code_pair
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)    
+        return self.llm.chat(message)    
 
 
 class ExecutionModule(BaseAgent):
@@ -573,11 +618,11 @@ class ExecutionModule(BaseAgent):
             pre_tasks_info=pre_tasks_info,
             relevant_code=relevant_code
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)
+        return self.llm.chat(message)
 
     def skill_create_format_message(self, task_name, task_description):
         """
@@ -590,11 +635,11 @@ class ExecutionModule(BaseAgent):
             working_dir= self.environment.working_dir,
             task_name=task_name
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)
+        return self.llm.chat(message)
 
     def invoke_generate_format_message(self, class_code, task_description, pre_tasks_info):
         """
@@ -609,11 +654,11 @@ class ExecutionModule(BaseAgent):
             pre_tasks_info = pre_tasks_info,
             working_dir = self.environment.working_dir
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)        
+        return self.llm.chat(message)        
     
     def question_and_answer_format_message(self, context, question, current_question):
         """
@@ -625,11 +670,11 @@ class ExecutionModule(BaseAgent):
             question = question,
             current_question = current_question
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)      
+        return self.llm.chat(message)      
  
     def skill_amend_and_invoke_format_message(self, original_code, task, error, code_output, current_working_dir, files_and_folders, critique, pre_tasks_info):
         """
@@ -647,11 +692,11 @@ class ExecutionModule(BaseAgent):
             critique = critique,
             pre_tasks_info = pre_tasks_info
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)   
+        return self.llm.chat(message)   
 
     def skill_amend_format_message(self, original_code, task, error, code_output, current_working_dir, files_and_folders, critique):
         """
@@ -668,11 +713,11 @@ class ExecutionModule(BaseAgent):
             files_and_folders = files_and_folders,
             critique = critique
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        return self.llm.chat(self.message)    
+        return self.llm.chat(message)    
     
     def task_judge_format_message(self, current_code, task, code_output, current_working_dir, files_and_folders, next_action):
         """
@@ -686,7 +731,7 @@ class ExecutionModule(BaseAgent):
                 {"role": "system", "content": sys_prompt},
                 {"role": "user", "content": user_prompt},
             ]
-            code_output = self.llm.chat(self.summary_message)
+            code_output = self.llm.chat(summary_message)
         
         next_action = json.dumps(next_action)
         sys_prompt = self.prompt['_SYSTEM_TASK_JUDGE_PROMPT']
@@ -699,11 +744,11 @@ class ExecutionModule(BaseAgent):
             files_and_folders=files_and_folders,
             next_action=next_action
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        response =self.llm.chat(self.message)
+        response =self.llm.chat(message)
         judge_json = self.extract_json_from_string(response)  
         print("************************<judge_json>**************************")
         print(judge_json)
@@ -723,11 +768,11 @@ class ExecutionModule(BaseAgent):
             working_dir= self.environment.working_dir,
             files_and_folders= files_and_folders
         )
-        self.message = [
+        message = [
             {"role": "system", "content": sys_prompt},
             {"role": "user", "content": user_prompt},
         ]
-        response =self.llm.chat(self.message)
+        response =self.llm.chat(message)
         analysis_json = self.extract_json_from_string(response)      
         print("************************<analysis_json>**************************")
         print(analysis_json)
@@ -803,21 +848,21 @@ class ExecutionModule(BaseAgent):
     
     def generate_call_api_format_message(self, tool_sub_task, tool_api_path, context="No context provided."):
         # self.logging.warn(self.generate_openapi_doc_2(tool_api_path), title='OpenAPI Doc')
-        self.sys_prompt = self.prompt['_SYSTEM_TOOL_USAGE_PROMPT'].format(
+        sys_prompt = self.prompt['_SYSTEM_TOOL_USAGE_PROMPT'].format(
             openapi_doc = json.dumps(self.generate_openapi_doc_2(tool_api_path)),
             tool_sub_task = tool_sub_task,
             context = context
         )
         # self.logging.info("************************<openapi_doc>**************************")
-        # self.logging.info(self.sys_prompt, title='OpenAPI Doc', color='gray')
+        # self.logging.info(sys_prompt, title='OpenAPI Doc', color='gray')
         
-        self.user_prompt = self.prompt['_USER_TOOL_USAGE_PROMPT']
-        self.message = [
-            {"role": "system", "content": self.sys_prompt},
-            {"role": "user", "content": self.user_prompt},
+        user_prompt = self.prompt['_USER_TOOL_USAGE_PROMPT']
+        message = [
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": user_prompt},
         ]
         # self.logging.info(self.message, title='API Call', color='gray')
-        return self.llm.chat(self.message)
+        return self.llm.chat(message)
     
     def generate_openapi_doc_2(self, tool_api_path):
         return self.extract_api_details(self.open_api_doc, tool_api_path)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 import arxiv
+from friday.core.service_pool import run_in_service_pool
 
 router = APIRouter()
 
@@ -14,14 +15,19 @@ ARXIV_MAX_QUERY_LENGTH = 300
 doc_content_chars_max: int = 4000
 
 
+def search_arxiv(query: str):
+    # results() is a lazy generator, the HTTP requests happen while it is consumed
+    return list(arxiv.Search(  # type: ignore
+        query[: ARXIV_MAX_QUERY_LENGTH], max_results=top_k_results
+    ).results())
+
+
 @router.get("/tools/arxiv")
 async def get_arxiv_article_information(item: ArxivQuery):
     '''Run Arxiv search and get the article meta information.
     '''
     try:
-        results = arxiv.Search(  # type: ignore
-            item.query[: ARXIV_MAX_QUERY_LENGTH], max_results=top_k_results
-        ).results()
+        results = await run_in_service_pool("arxiv", search_arxiv, item.query)
     except Exception as ex:
         return {"result": None, "error": f"Arxiv exception: {ex}"}
 
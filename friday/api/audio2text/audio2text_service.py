@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, File, UploadFile,Depends
 from pydantic import BaseModel,Field
 from typing import Optional
 from .audio2text import Audio2TextTool
+from friday.core.service_pool import run_in_service_pool
 import io
 import os
 import shutil
@@ -15,16 +16,21 @@ class AudioTextQueryItem(BaseModel):
 
 
 
+def transcribe(file: UploadFile):
+    # 创建一个临时文件来保存上传的音频
+    with open(file.filename, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    with open(file.filename, "rb") as audio:
+        caption = whisper_api.caption(audio_file=audio)
+    # 清理临时文件
+    os.remove(file.filename)
+    return caption
+
+
 @router.post("/tools/audio2text")
 async def audio2text(item: AudioTextQueryItem = Depends()):
     try:
-        # 创建一个临时文件来保存上传的音频
-        with open(item.file.filename, "wb") as buffer:
-            shutil.copyfileobj(item.file.file, buffer)
-        with open(item.file.filename, "rb") as audio:
-            caption = whisper_api.caption(audio_file=audio)
-        # 清理临时文件
-        os.remove(item.file.filename)
+        caption = await run_in_service_pool("audio2text", transcribe, item.file)
         return {"text": caption}
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
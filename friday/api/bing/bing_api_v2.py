@@ -6,11 +6,11 @@ from enum import Enum
 from dotenv import load_dotenv
 from .web_loader import WebPageLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.chains.summarize import load_summarize_chain
 from langchain_openai import OpenAI
 import os
+from friday.core.chunk_index import ChunkEmbeddingCache, PageChunkIndex
+from friday.core.embeddings import get_embedding_backend
+from friday.core.page_summarizer import create_page_summarizer
 
 load_dotenv()
 
@@ -29,10 +29,14 @@ class BingAPIV2:
         self.search_engine = BingSearchAPIWrapper(search_kwargs={'mkt': 'en-us','safeSearch': 'moderate'})
         self.web_loader = WebPageLoader()
         self.web_chunker = RecursiveCharacterTextSplitter(chunk_size=4500, chunk_overlap=0)
-        self.web_sniptter_embed = OpenAIEmbeddings()
+        # Chunk embeddings are cached on disk and the chunk index of recent pages in memory,
+        # a repeated query on a loaded page only embeds the query
+        self.web_chunk_index = PageChunkIndex(get_embedding_backend(), ChunkEmbeddingCache())
         self.web_summarizer = OpenAI(
             temperature=0,
             )
+        # Chunk summaries run concurrently and are reduced hierarchically, each summary is cached by hash
+        self.web_page_summarizer = create_page_summarizer(self.web_summarizer)
 
     def search(self, key_words: str,top_k: int = 5, max_retry: int = 3):
             # return search.results(query,top_k)
@@ -56,17 +60,14 @@ class BingAPIV2:
     def summarize_loaded_page(self,page_str):
         if page_str == "":
             return ""
-        web_chunks = self.web_chunker.create_documents([page_str])
-        summarize_chain = load_summarize_chain(self.web_summarizer, chain_type="map_reduce")
-        main_web_content = summarize_chain.run(web_chunks)
+        web_chunks = self.web_chunker.split_text(page_str)
+        main_web_content = self.web_page_summarizer.summarize(web_chunks)
         return main_web_content
     def attended_loaded_page(self,page_str,query_str):
         if page_str == "":
             return ""
-        web_chunks = self.web_chunker.create_documents([page_str])
-        chunSearch = Chroma.from_documents(web_chunks, self.web_sniptter_embed)
-        relatedChunks = chunSearch.similarity_search(query_str, k=3)
-        attended_content = '...'.join([chunk.page_content for chunk in relatedChunks])
+        relatedChunks = self.web_chunk_index.search(page_str, query_str, self.web_chunker.split_text, k=3)
+        attended_content = '...'.join(relatedChunks)
         return attended_content
 
 
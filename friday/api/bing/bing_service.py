@@ -4,9 +4,10 @@ from typing import Optional
 # from .bing_api import BingAPI
 from .bing_api_v2 import BingAPIV2
 from .image_search_api import ImageSearchAPI
+from friday.core.service_pool import run_in_service_pool
 from dotenv import load_dotenv
-import tiktoken
 import os
+from utils.token_utils import count_tokens, within_budget
 
 load_dotenv()
 
@@ -16,9 +17,7 @@ BING_API = os.getenv("BING_API")
 # 计算网页内容对gpt4来说的token数，如果token太多就用3.5做摘要或者用向量数据库检索最相关的片段
 def num_tokens_from_string(string: str) -> int:
     """Returns the number of tokens in a text string."""
-    encoding = tiktoken.encoding_for_model('gpt-4-1106-preview')
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+    return count_tokens(string, 'gpt-4-1106-preview')
 
 router = APIRouter()
 
@@ -62,7 +61,7 @@ async def image_search(item: QueryItemV2):
     try:
         if item.top_k == None:
             item.top_k = 10
-        search_results = image_search_api.search_image(item.query,item.top_k)
+        search_results = await run_in_service_pool("bing", image_search_api.search_image, item.query, item.top_k)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     return search_results
@@ -72,26 +71,26 @@ async def bing_search_v2(item: QueryItemV2):
     try:
         if item.top_k == None:
             item.top_k = 5
-        search_results = bing_api_v2.search(item.query,item.top_k)
+        search_results = await run_in_service_pool("bing", bing_api_v2.search, item.query, item.top_k)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     return search_results
 
+def load_page(url, query=None):
+    raw_page_content = bing_api_v2.load_page(url)
+    if within_budget(raw_page_content, 4096, 'gpt-4-1106-preview'):
+        return {"page_content": raw_page_content}
+    if query == None:
+        summarized_page_content = bing_api_v2.summarize_loaded_page(raw_page_content)
+        return {"page_content": summarized_page_content}
+    attended_content = bing_api_v2.attended_loaded_page(raw_page_content,query)
+    return {"page_content": attended_content}
+
 @router.get("/tools/bing/load_pagev2")
 async def load_page_v2(item: PageItemV2):
     result = {"page_content": ""}
     try:
-        raw_page_content = bing_api_v2.load_page(item.url)
-        page_token_num = num_tokens_from_string(raw_page_content)
-        if(page_token_num <= 4096):
-            result = {"page_content": raw_page_content}
-        else:
-            if item.query == None:
-                summarized_page_content = bing_api_v2.summarize_loaded_page(raw_page_content)
-                result = {"page_content": summarized_page_content}
-            else:
-                attended_content = bing_api_v2.attended_loaded_page(raw_page_content,item.query)
-                result = {"page_content": attended_content}
+        result = await run_in_service_pool("bing", load_page, item.url, item.query)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     return result
\ No newline at end of file
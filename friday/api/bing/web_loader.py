@@ -1,78 +1,39 @@
 import hashlib
-import logging
-import re
-import requests
-import pdfplumber
-from io import BytesIO
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    raise ImportError(
-        'Webpage requires extra dependencies. Install with `pip install --upgrade "embedchain[dataloaders]"`'
-    ) from None
-
-
-
-def clean_string(text):
-    """
-    This function takes in a string and performs a series of text cleaning operations.
-
-    Args:
-        text (str): The text to be cleaned. This is expected to be a string.
-
-    Returns:
-        cleaned_text (str): The cleaned text after all the cleaning operations
-        have been performed.
-    """
-    # Replacement of newline characters:
-    text = text.replace("\n", " ")
-
-    # Stripping and reducing multiple spaces to single:
-    cleaned_text = re.sub(r"\s+", " ", text.strip())
-
-    # Removing backslashes:
-    cleaned_text = cleaned_text.replace("\\", "")
-
-    # Replacing hash characters:
-    cleaned_text = cleaned_text.replace("#", " ")
-
-    # Eliminating consecutive non-alphanumeric characters:
-    # This regex identifies consecutive non-alphanumeric characters (i.e., not
-    # a word character [a-zA-Z0-9_] and not a whitespace) in the string
-    # and replaces each group of such characters with a single occurrence of
-    # that character.
-    # For example, "!!! hello !!!" would become "! hello !".
-    cleaned_text = re.sub(r"([^\w\s])\1*", r"\1", cleaned_text)
-
-    return cleaned_text
-
+import os
+import tempfile
+from friday.core.html_cleaner import clean_html
+from friday.core.pdf_extractor import PDF_TOKEN_BUDGET, get_pdf_extractor
+from friday.core.web_fetcher import get_web_fetcher
 
 
 class WebPageLoader:
-    # Shared session for all instances
-    _session = requests.Session()
+    def load_data(self, url, token_budget=PDF_TOKEN_BUDGET):
+        """Load data from a web page through the shared cached fetcher."""
+        try:
+            response = get_web_fetcher().fetch(url)
+        except Exception:
+            return self._empty_data()
+        return self._parse_response(url, response, token_budget)
+
+    def load_many(self, urls, token_budget=PDF_TOKEN_BUDGET):
+        """Load several web pages, downloading them in parallel."""
+        return [self._empty_data() if isinstance(response, Exception) else self._parse_response(url, response, token_budget)
+                for url, response in zip(urls, get_web_fetcher().fetch_many(urls))]
 
-    def load_data(self, url):
-        """Load data from a web page using a shared requests session."""
-        headers = {'User-Agent':'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_4) AppleWebKit/537.36 (KHTML like Gecko) Chrome/52.0.2743.116 Safari/537.36'}
-        web_data = {}
+    def _parse_response(self, url, response, token_budget=PDF_TOKEN_BUDGET):
+        """Parse a fetched page and release it, deleting its body file when it is not cached."""
         content = ""
         try:
-            response = self._session.get(url,headers=headers, timeout=30)
-            response.raise_for_status()
-            data = response.content
             # Check content type
-            content_type = response.headers.get('Content-Type', '')
+            content_type = response.content_type
             # print(content_type)
             if 'html' in content_type:
-                content = self._get_clean_content(data, url)
+                content = self._get_clean_content(response.content, url, content_type)
 
                 
             elif 'pdf' in content_type:
-                # Open the PDF file using pdfplumber
-                with pdfplumber.open(BytesIO(response.content)) as pdf:
-                    # Extract text from each page and combine it
-                    content = '\n'.join([page.extract_text() for page in pdf.pages if page.extract_text()])
+                # Pages are extracted in parallel up to the token budget and cached by document hash
+                content = '\n'.join(self._extract_pdf(response, token_budget))
                             
             meta_data = {"url": url}
 
@@ -87,67 +48,32 @@ class WebPageLoader:
                 ],
             }
         except Exception:
-            web_data = {
-                "data": [
-                        {
-                            "content": "",
-                            "meta_data": "",
-                        }
-                    ],
-            }
+            web_data = self._empty_data()
+        finally:
+            response.release()
         return web_data
 
-    def _get_clean_content(self, html, url) -> str:
-        soup = BeautifulSoup(html, "html.parser")
-        original_size = len(str(soup.get_text()))
-
-        tags_to_exclude = [
-            "nav",
-            "aside",
-            "form",
-            "header",
-            "noscript",
-            "svg",
-            "canvas",
-            "footer",
-            "script",
-            "style",
-        ]
-        for tag in soup(tags_to_exclude):
-            tag.decompose()
-
-        ids_to_exclude = ["sidebar", "main-navigation", "menu-main-menu"]
-        for id in ids_to_exclude:
-            tags = soup.find_all(id=id)
-            for tag in tags:
-                tag.decompose()
-
-        classes_to_exclude = [
-            "elementor-location-header",
-            "navbar-header",
-            "nav",
-            "header-sidebar-wrapper",
-            "blog-sidebar-wrapper",
-            "related-posts",
-        ]
-        for class_name in classes_to_exclude:
-            tags = soup.find_all(class_=class_name)
-            for tag in tags:
-                tag.decompose()
-
-        content = soup.get_text()
-        content = clean_string(content)
-
-        cleaned_size = len(content)
-        if original_size != 0:
-            logging.info(
-                f"[{url}] Cleaned page size: {cleaned_size} characters, down from {original_size} (shrunk: {original_size-cleaned_size} chars, {round((1-(cleaned_size/original_size)) * 100, 2)}%)"  # noqa:E501
-            )
-
-        return content
-
-    @classmethod
-    def close_session(cls):
-        cls._session.close()
-
-
+    @staticmethod
+    def _empty_data():
+        return {
+            "data": [
+                    {
+                        "content": "",
+                        "meta_data": "",
+                    }
+                ],
+        }
+
+    @staticmethod
+    def _extract_pdf(response, token_budget):
+        if response.path is not None:
+            return get_pdf_extractor().extract(response.path, response.digest, token_budget)
+        # The worker processes read the document from a file
+        with tempfile.TemporaryDirectory(prefix='friday_pdf_') as tmp_dir:
+            path = os.path.join(tmp_dir, 'document.pdf')
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            return get_pdf_extractor().extract(path, response.digest, token_budget)
+
+    def _get_clean_content(self, html, url, content_type="") -> str:
+        return clean_html(html, url, markdown=False, content_type=content_type).text
@@ -1,45 +1,83 @@
 import datetime
-from typing import List
+import json
+import os
+from typing import Any, List
+from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import sqlite3
+from friday.core.service_pool import run_in_service_pool
+from friday.core.sqlite_pool import get_sqlite_pool, is_read_only
 
 router = APIRouter()
 
+load_dotenv()
+# DATABASE_PATH = './tasks/travel/database/travel.db'
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'friday/api/database/task/travel.db')
+DATABASE_PAGE_SIZE = 500
+
 
 class SQLRequest(BaseModel):
     queries: List[str]
 
 
-def execute_sql(queries: List[str]):
-    # conn = sqlite3.connect('./tasks/travel/database/travel.db')
-    conn = sqlite3.connect('friday/api/database/task/travel.db')
-    cursor = conn.cursor()
+class SQLStreamRequest(BaseModel):
+    query: str
+    params: List[Any] = []
+    page_size: int = DATABASE_PAGE_SIZE
+
+
+class SQLBulkRequest(BaseModel):
+    query: str
+    rows: List[List[Any]]
 
+
+def execute_sql(queries: List[str]):
     results = []
-    for query in queries:
-        try:
-            cursor.execute(query)
-            results.append({
-                "query": query,
-                "result": cursor.fetchall(),
-                "error": ""
-            })
-        except Exception as e:
-            results.append({
-                "query": query,
-                "result": "",
-                "error": str(e)
-            })
-
-    # Commit changes and close the connection to the database
-    conn.commit()
-    conn.close()
+    # The statements share one connection, a failed one does not stop the next ones
+    for query, (rows, error) in zip(queries, get_sqlite_pool(DATABASE_PATH).execute_batch(queries)):
+        results.append({
+            "query": query,
+            "result": rows if error is None else "",
+            "error": "" if error is None else str(error)
+        })
 
     return results
 
 
+def execute_many(query: str, rows: List[List[Any]]):
+    try:
+        return {"query": query, "rowcount": get_sqlite_pool(DATABASE_PATH).executemany(query, rows), "error": ""}
+    except Exception as e:
+        return {"query": query, "rowcount": 0, "error": str(e)}
+
+
+def stream_pages(query: str, params: List[Any], page_size: int):
+    # One JSON line per page, an error ends the stream with an error line
+    try:
+        for rows in get_sqlite_pool(DATABASE_PATH).iter_pages(query, params, page_size):
+            yield json.dumps({"rows": rows, "error": ""}) + "\n"
+    except Exception as e:
+        yield json.dumps({"rows": [], "error": str(e)}) + "\n"
+
+
 @router.post("/tools/database")
 async def execute_sqlite(req: SQLRequest):
     print(f"{datetime.datetime.now()}:{req}")
-    return execute_sql(req.queries)
+    return await run_in_service_pool("database", execute_sql, req.queries)
+
+
+@router.post("/tools/database/bulk")
+async def execute_sqlite_many(req: SQLBulkRequest):
+    print(f"{datetime.datetime.now()}:{req.query} ({len(req.rows)} rows)")
+    return await run_in_service_pool("database", execute_many, req.query, req.rows)
+
+
+@router.post("/tools/database/stream")
+async def stream_sqlite(req: SQLStreamRequest):
+    print(f"{datetime.datetime.now()}:{req}")
+    if req.page_size <= 0:
+        raise HTTPException(status_code=400, detail="page_size must be positive")
+    if not is_read_only(req.query):
+        raise HTTPException(status_code=400, detail="only SELECT, EXPLAIN and VALUES statements can be streamed")
+    return StreamingResponse(stream_pages(req.query, req.params, req.page_size), media_type="application/x-ndjson")
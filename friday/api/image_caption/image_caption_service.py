@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException,UploadFile,File,Form, Depends
 from pydantic import BaseModel,Field
 from typing import Optional
 from .gpt4v_caption import ImageCaptionTool
+from friday.core.service_pool import run_in_service_pool
 import base64
 
 router = APIRouter()
@@ -30,7 +31,7 @@ async def image_search(item: dict = Depends(caption_parameters)):
         elif(item["image_file"] != None):
             base64Img = base64.b64encode(await item["image_file"].read()).decode('utf-8')
             image_url = f"data:image/jpeg;base64,{base64Img}"
-        caption = image_caption_api.caption(url=image_url,query=item["query"])
+        caption = await run_in_service_pool("image_caption", image_caption_api.caption, url=image_url, query=item["query"])
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     return {"caption":caption}
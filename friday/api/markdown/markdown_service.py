@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel,Field
 from typing import Optional
 from .webpage2md import WebPage2MDTool
-import tiktoken
+from friday.core.service_pool import run_in_service_pool
 
 
 
@@ -20,7 +20,7 @@ class TargetPageModel(BaseModel):
 async def get_web_md(item: TargetPageModel):
     result = {"markdown": ""}
     try:
-        markdown_text = web2MdTool.get_web_md(item.url)
+        markdown_text = await run_in_service_pool("markdown", web2MdTool.get_web_md, item.url)
         result["markdown"] = markdown_text
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,6 +4,7 @@ from pptx import Presentation
 import os
 import time
 import requests
+from friday.core.service_pool import run_in_service_pool
 
 router = APIRouter()
 
@@ -43,15 +44,18 @@ class AddTextImagePageModel(BaseModel):
     image: str
 
 
-@router.post("/tools/ppt/create_file")
-async def create_file(item: CreateFileModel):
+def _create_file(item: CreateFileModel):
     global ppt_file
     ppt_file = Presentation(os.path.join(TEMPLATE_DIR, f"{item.theme}.pptx"))
     return "created a ppt file."
 
 
-@router.post("/tools/ppt/get_image")
-async def get_image(item: GetImageModel):
+@router.post("/tools/ppt/create_file")
+async def create_file(item: CreateFileModel):
+    return await run_in_service_pool("ppt", _create_file, item)
+
+
+def _get_image(item: GetImageModel):
     picture_url = IMAGE_BED_PATTERN.format(item.keywords)
     response = requests.get(picture_url)
     img_local_path = os.path.join(CACHE_DIR, f"{time.time()}.jpg")
@@ -60,8 +64,12 @@ async def get_image(item: GetImageModel):
     return img_local_path
 
 
-@router.post("/tools/ppt/add_first_page")
-async def add_first_page(item: AddFirstPageModel):
+@router.post("/tools/ppt/get_image")
+async def get_image(item: GetImageModel):
+    return await run_in_service_pool("ppt", _get_image, item)
+
+
+def _add_first_page(item: AddFirstPageModel):
     global ppt_file
     slide = ppt_file.slides.add_slide(ppt_file.slide_layouts[0])  # layout for first page (title and subtitle only)
     title_shape = slide.shapes.title
@@ -71,8 +79,12 @@ async def add_first_page(item: AddFirstPageModel):
     return "added first page."
 
 
-@router.post("/tools/ppt/add_text_page")
-async def add_text_page(item: AddTextPageModel):
+@router.post("/tools/ppt/add_first_page")
+async def add_first_page(item: AddFirstPageModel):
+    return await run_in_service_pool("ppt", _add_first_page, item)
+
+
+def _add_text_page(item: AddTextPageModel):
     global ppt_file
     slide = ppt_file.slides.add_slide(ppt_file.slide_layouts[1])
     title_shape = slide.shapes.title
@@ -88,8 +100,12 @@ async def add_text_page(item: AddTextPageModel):
     return "added text page."
 
 
-@router.post("/tools/ppt/add_text_image_page")
-async def add_text_image_page(item: AddTextImagePageModel):
+@router.post("/tools/ppt/add_text_page")
+async def add_text_page(item: AddTextPageModel):
+    return await run_in_service_pool("ppt", _add_text_page, item)
+
+
+def _add_text_image_page(item: AddTextImagePageModel):
     global ppt_file
     slide = ppt_file.slides.add_slide(ppt_file.slide_layouts[3])
     title_shape = slide.shapes.title
@@ -107,9 +123,18 @@ async def add_text_image_page(item: AddTextImagePageModel):
     return "added text and image page."
 
 
-@router.get("/tools/ppt/submit_file")
-async def submit_file():
+@router.post("/tools/ppt/add_text_image_page")
+async def add_text_image_page(item: AddTextImagePageModel):
+    return await run_in_service_pool("ppt", _add_text_image_page, item)
+
+
+def _submit_file():
     global ppt_file
     file_path = os.path.join(CACHE_DIR, f"{time.time()}.pptx")
     ppt_file.save(file_path)
     return f"submitted. view ppt at {file_path}"
+
+
+@router.get("/tools/ppt/submit_file")
+async def submit_file():
+    return await run_in_service_pool("ppt", _submit_file)
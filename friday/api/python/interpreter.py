@@ -2,13 +2,34 @@ import ast
 import os
 import asyncio
 import subprocess
+import sys
+import tempfile
+import threading
 
 import astor
+from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from friday.core.service_pool import SERVICE_POOL_SIZES, run_in_service_pool
+from friday.environment.py_worker import PythonWorkerPool
+
 router = APIRouter()
 
+load_dotenv()
+# Warm interpreters, also the number of snippets executed concurrently
+PYTHON_POOL_SIZE = int(os.getenv('PYTHON_POOL_SIZE', SERVICE_POOL_SIZES['python']))
+PYTHON_TIMEOUT = float(os.getenv('PYTHON_TIMEOUT', 3))
+# Per-snippet limits, 0 disables a limit
+PYTHON_LIMITS = {
+    "cpu_seconds": int(os.getenv('PYTHON_CPU_SECONDS', 0)),
+    "memory_mb": int(os.getenv('PYTHON_MEMORY_MB', 4096)),
+}
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+_subprocess_semaphore = None
+
 
 class Item(BaseModel):
     code: str
@@ -36,38 +57,69 @@ def modify_code_to_print_last_expr(code: str):
     return modified_code
 
 
-async def run_code(code: str):
+def _get_worker_pool():
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = PythonWorkerPool(size=PYTHON_POOL_SIZE, cwd=tempfile.gettempdir())
+        return _worker_pool
 
-    try:
-        code = modify_code_to_print_last_expr(code)
-        # Write the code to a file
-        with open("code.py", "w") as f:
-            f.write(code)
-        with open("code_temp.py", "w") as f:
+
+def shutdown_worker_pool():
+    global _worker_pool
+    with _worker_pool_lock:
+        pool, _worker_pool = _worker_pool, None
+    if pool is not None:
+        pool.close()
+
+
+def _run_in_worker(code: str):
+    # Every request runs in its own temporary workspace, removed afterwards
+    with tempfile.TemporaryDirectory(prefix='friday_python_') as workspace:
+        try:
+            reply = _get_worker_pool().run(code, workspace, os.path.join(workspace, 'code.py'), timeout=PYTHON_TIMEOUT, limits=PYTHON_LIMITS)
+        except subprocess.TimeoutExpired:
+            return {"result": "", "error": "Code execution timed out"}
+    return {"result": reply['stdout'], "error": reply['stderr']}
+
+
+async def _run_in_subprocess(code: str):
+    with tempfile.TemporaryDirectory(prefix='friday_python_') as workspace:
+        code_file = os.path.join(workspace, 'code.py')
+        with open(code_file, "w") as f:
             f.write(code)
-        # Run the file with a timeout of 3 seconds
-        process = await asyncio.create_subprocess_shell(
-            "python code.py",
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, code_file,
+            cwd=workspace,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
-        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=3)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=PYTHON_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return {"result": "", "error": "Code execution timed out"}
+    return {"result": stdout.decode("utf-8"), "error": stderr.decode("utf-8")}
+
 
-        # Decode the stdout and stderr
-        result = stdout.decode("utf-8")
-        error = stderr.decode("utf-8")
+def _get_subprocess_semaphore():
+    global _subprocess_semaphore
+    if _subprocess_semaphore is None:
+        _subprocess_semaphore = asyncio.Semaphore(PYTHON_POOL_SIZE)
+    return _subprocess_semaphore
 
-        return {"result": result, "error": error}
-    except asyncio.TimeoutError:
-        process.terminate()
-        await process.wait()
-        return {"result": "", "error": "Code execution timed out"}
+
+async def run_code(code: str):
+    try:
+        code = modify_code_to_print_last_expr(code)
+        if os.name == 'nt':
+            # fork is not available, fall back to one interpreter per request
+            async with _get_subprocess_semaphore():
+                return await _run_in_subprocess(code)
+        return await run_in_service_pool('python', _run_in_worker, code)
     except Exception as e:
         return {"result": "", "error": str(e)}
-    finally:
-        # Delete the code file
-        if os.path.exists("code.py"):
-            os.remove("code.py")
 
 
 @router.post("/tools/python")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
+import asyncio
 import subprocess
 
 router = APIRouter()
@@ -13,5 +14,10 @@ class ShellCommandResultModel(BaseModel):
 
 @router.post("/tools/shell", response_model=ShellCommandResultModel)
 async def execute_shell_command(command: ShellCommandModel):
-    result = subprocess.run(command.command, capture_output=True, shell=True, text=True)
-    return ShellCommandResultModel(stdout=result.stdout, stderr=result.stderr)
+    process = await asyncio.create_subprocess_shell(
+        command.command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return ShellCommandResultModel(stdout=stdout.decode('utf-8', errors='replace'), stderr=stderr.decode('utf-8', errors='replace'))
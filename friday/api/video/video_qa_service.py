@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from pytube import YouTube
 from .video_qa import FrameExtractor, FileUploader, AIContentGenerator, get_gemini_response
+from friday.core.service_pool import run_in_service_pool
 
 router = APIRouter()
 
@@ -20,6 +21,39 @@ class VideoQAQueryItem(BaseModel):
 async def video_qa_parameters(prompt: Optional[str] = Form("Describe this video."), video_url: Optional[str] = Form(None), video_file: Optional[UploadFile] = File(None), start_time: Optional[int] = Form(None), end_time: Optional[int] = Form(None)):
     return {"prompt": prompt, "video_url": video_url, "video_file": video_file, "start_time": start_time, "end_time": end_time}
 
+
+def save_file(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def load_youtube(video_url):
+    yt = YouTube(video_url)
+    return yt, yt.title, yt.author
+
+
+def download_youtube_video(yt):
+    stream = yt.streams.filter(file_extension='mp4').first()
+    return stream.download('./content/video/')
+
+
+def describe_video(video_file_path, prompt, start_time=None, end_time=None):
+    # Setup frame extraction using specified time frames if provided
+    extractor = FrameExtractor(video_file_path)
+    extractor.extract_frames()
+
+    uploader = FileUploader("./content/frames")
+    uploader.list_all_files()
+    if start_time is not None and end_time is not None:
+        uploader.upload_files(upload_range=(start_time, end_time))
+    else:
+        uploader.upload_files()  # No specific range provided
+
+    ai_generator = AIContentGenerator()
+    # uploader.cleanup()
+    return ai_generator.generate_content(prompt, uploader.current_files)
+
+
 @router.post("/tools/video_qa")
 async def video_qa(item: dict = Depends(video_qa_parameters)):
     try:
@@ -34,42 +68,28 @@ async def video_qa(item: dict = Depends(video_qa_parameters)):
             directory = os.path.dirname(video_file_path)
             if not os.path.exists(directory):
                 os.makedirs(directory)
-            with open(video_file_path, "wb") as f:
-                print(f"Saving video file to {video_file_path}")
-                f.write(await item["video_file"].read())
+            content = await item["video_file"].read()
+            print(f"Saving video file to {video_file_path}")
+            await run_in_service_pool("video", save_file, video_file_path, content)
 
         elif item["video_url"]:
             video_file_path = item["video_url"]
             pattern = r'(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)[\w-]+(&\S+)?'
             match = re.match(pattern, item["video_url"])
-            yt = YouTube(item["video_url"])
-            response += "Video Title: " + yt.title + "\n"
-            response += "Video Author: " + yt.author + "\n"
+            yt, title, author = await run_in_service_pool("video", load_youtube, item["video_url"])
+            response += "Video Title: " + title + "\n"
+            response += "Video Author: " + author + "\n"
             if match:
                 modeloutput = await get_gemini_response(item["video_url"], item["prompt"])
                 print(modeloutput)
                 if "not supported" or "not mentioned" in modeloutput.text:
                     print("Gemini API not supported, using Pytube instead.")
-                    stream = yt.streams.filter(file_extension='mp4').first()
-                    video_file_path = stream.download('./content/video/')
+                    video_file_path = await run_in_service_pool("video", download_youtube_video, yt)
                 else:
                     response += "Response from youtube extension: " +  modeloutput.text + '\n'
                     return {"response": response}
 
-        # Setup frame extraction using specified time frames if provided
-        extractor = FrameExtractor(video_file_path)
-        extractor.extract_frames()
-
-        uploader = FileUploader("./content/frames")
-        uploader.list_all_files()
-        if item["start_time"] is not None and item["end_time"] is not None:
-            uploader.upload_files(upload_range=(item["start_time"], item["end_time"]))
-        else:
-            uploader.upload_files()  # No specific range provided
-
-        ai_generator = AIContentGenerator()
-        response += "Response2:" + ai_generator.generate_content(item["prompt"], uploader.current_files)
-        # uploader.cleanup()
+        response += "Response2:" + await run_in_service_pool("video", describe_video, video_file_path, item["prompt"], item["start_time"], item["end_time"])
 
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
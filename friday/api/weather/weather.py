@@ -1,23 +1,20 @@
 # api/weather/weather.py
 from fastapi import APIRouter, HTTPException, Query
-import sqlite3
+from friday.core.sqlite_pool import get_sqlite_pool
 
 router = APIRouter()
 
 @router.get("/weather/query")  # 注意这里改为GET请求
 def query_weather(date: str, city: str):  # 使用Query参数
     try:
-        conn = sqlite3.connect('./database/weather.db')
-        c = conn.cursor()
-        c.execute("SELECT max_temp, min_temp, weather FROM weather WHERE city=? AND date=?", (city, date))
-        row = c.fetchone()
-        conn.close()
+        rows = get_sqlite_pool('./database/weather.db').execute("SELECT max_temp, min_temp, weather FROM weather WHERE city=? AND date=?", (city, date))
+        row = rows[0] if rows else None
 
         if row:
             result=f'{date}, {city}: {row[2]}, {row[1]}-{row[0]} ℃'
             return {"result": str(result), "error": None}
         else:
-            {"result": '', "error": 'data not found'}
+            return {"result": '', "error": 'data not found'}
 
     except Exception as e:
         print(e)
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 import wolframalpha
 from pydantic import BaseModel
 from typing import Optional
+from friday.core.service_pool import run_in_service_pool
 
 class QueryItem(BaseModel):
     query: str
@@ -11,9 +12,8 @@ router = APIRouter()
 app_id = "XRY28U-7PVE2LRH7H"  # Replace with your app id
 client = wolframalpha.Client(app_id)
 
-@router.post("/tools/wolframalpha")
-async def wolframalpha_query(item: QueryItem):
-    res = client.query(item.query)
+def query_wolframalpha(query: str):
+    res = client.query(query)
 
     # Handle the query result
     if res['@success'] == 'false':
@@ -21,4 +21,9 @@ async def wolframalpha_query(item: QueryItem):
     else:
         # Return the first result text
         result = next(res.results).text
-        return {"result": result}
\ No newline at end of file
+        return {"result": result}
+
+
+@router.post("/tools/wolframalpha")
+async def wolframalpha_query(item: QueryItem):
+    return await run_in_service_pool("wolframalpha", query_wolframalpha, item.query)
\ No newline at end of file
@@ -1,8 +1,9 @@
 import sqlite3
 import sys
 
-from langchain_community.vectorstores import Chroma
-from langchain.embeddings.openai import OpenAIEmbeddings
+from friday.core.action_store import ActionStore
+from friday.core.embeddings import get_embedding_backend
+from friday.core.vector_index import VectorIndex
 import argparse
 import json
 import os
@@ -15,56 +16,53 @@ OPENAI_ORGANIZATION = os.getenv('OPENAI_ORGANIZATION')
 
 class ActionManager:
     def __init__(self, config_path=None, action_lib_dir=None):
-        # actions: Store the mapping relationship between descriptions and code (associated through task names)
-        self.actions = {}
+        # actions: Store the mapping relationship between descriptions and code (associated through task names).
+        # Backed by a SQLite journal, the tracked actions.json is a seed whose new or changed entries are imported on startup.
+        # Use --export to write the whole library back to it.
         self.action_lib_dir = action_lib_dir
-
-        with open(f"{self.action_lib_dir}/actions.json") as f2:
-            self.actions = json.load(f2)
-        self.vectordb_path = f"{action_lib_dir}/vectordb"
-
-        if not os.path.exists(self.vectordb_path):
-            os.makedirs(self.vectordb_path)
+        self.actions = ActionStore(f"{self.action_lib_dir}/actions.db", seed_json_path=f"{self.action_lib_dir}/actions.json")
         os.makedirs(f"{action_lib_dir}/code", exist_ok=True)
         os.makedirs(f"{action_lib_dir}/action_description", exist_ok=True)
-        # Utilize the Chroma database and employ OpenAI Embeddings for vectorization (default: text-embedding-ada-002)
-        self.vectordb = Chroma(
-            collection_name="action_vectordb",
-            embedding_function=OpenAIEmbeddings(
-                openai_api_key=OPENAI_API_KEY,
-                openai_organization=OPENAI_ORGANIZATION,
-            ),
-            persist_directory=self.vectordb_path,
-        )
-        assert self.vectordb._collection.count() == len(self.actions), (
-            f"Action Manager's vectordb is not synced with actions.json.\n"
-            f"There are {self.vectordb._collection.count()} actions in vectordb but {len(self.actions)} actions in actions.json.\n"
-        )
+        # Action descriptions are embedded once and kept in a NumPy index, only queries are embedded at retrieval time.
+        # The embedding backend is set by EMBEDDING_BACKEND ('openai' by default or 'local').
+        self.embedding_backend = get_embedding_backend()
+        self.vectordb = VectorIndex(self.embedding_backend)
+        self.sync_vectordb()
+
+    def sync_vectordb(self):
+        """
+        Load the stored description embeddings and embed the actions that have none yet.
+        """
+        names, matrix = self.actions.get_embeddings(self.embedding_backend.name)
+        self.vectordb.add(names, vectors=matrix)
+        missing = [name for name in self.actions if name not in self.vectordb]
+        if missing:
+            descriptions = self.actions.descriptions
+            matrix = self.embedding_backend.embed_documents([descriptions[name] for name in missing])
+            self.vectordb.add(missing, vectors=matrix)
+            self.actions.set_embeddings(missing, matrix, self.embedding_backend.name)
 
     # View all the code in the code repository
     @property
     def programs(self):
         programs = ""
-        for _, entry in self.actions.items():
-            programs += f"{entry['code']}\n\n"
+        for action_name in self.actions:
+            programs += f"{self.actions.get_code(action_name)}\n\n"
         return programs
     
     # Retrieve the descriptions of all actions
     @property
     def descriptions(self):
-        descriptions = {}
-        for action_name, entry in self.actions.items():
-            descriptions.update({action_name: entry["description"]})
-        return descriptions
+        return self.actions.descriptions
     
     # Retrieve all action class names
     @property
     def action_names(self):
-        return self.actions.keys()
+        return self.actions.descriptions.keys()
     
     # View the code of a specific action
     def get_action_code(self, action_name):
-        code = self.actions[action_name]['code']
+        code = self.actions.get_code(action_name)
         return code    
 
     # Add new task code
@@ -75,86 +73,73 @@ class ActionManager:
         print(
             f"\033[33m {program_name}:\n{program_description}\033[0m"
         )
-        # If this task code already exists in the action library, delete it and rewrite
+        # If this task code already exists in the action library, it is rewritten
         if program_name in self.actions:
             print(f"\033[33mAction {program_name} already exists. Rewriting!\033[0m")
-            self.vectordb._collection.delete(ids=[program_name])
-        # Store the new task code in the vector database and the action dictionary
-        self.vectordb.add_texts(
-            texts=[program_description],
-            ids=[program_name],
-            metadatas=[{"name": program_name}],
-        )
-        self.actions[program_name] = {
-            "code": program_code,
-            "description": program_description,
-        }
-        assert self.vectordb._collection.count() == len(
+        # Store the new task code in the vector database and the action library, one row each
+        embedding = self.embedding_backend.embed_documents([program_description])[0]
+        self.vectordb.add([program_name], vectors=[embedding])
+        self.actions.put(program_name, program_code, program_description, embedding, self.embedding_backend.name)
+        assert len(self.vectordb) == len(
             self.actions
-        ), "vectordb is not synced with actions.json"
-        # Store the new task code and description in the action library, and enter the mapping relationship into the dictionary
+        ), "vectordb is not synced with the action library"
+        # Export the new task code and description to the action library folders
         with open(f"{self.action_lib_dir}/code/{program_name}.py", "w") as fa:
             fa.write(program_code)
         with open(f"{self.action_lib_dir}/action_description/{program_name}.txt", "w") as fb:
             fb.write(program_description)
-        with open(f"{self.action_lib_dir}/actions.json", "w") as fc:
-            json.dump(self.actions,fc,indent=4)
-        self.vectordb.persist()
 
     # Check if there are relevant tools
     def exist_action(self, action):
-        if action in self.action_names:
+        if action in self.actions:
             return True
         return False
 
     # Retrieve related task names
     def retrieve_action_name(self, query, k=10):
-        k = min(self.vectordb._collection.count(), k)
+        k = min(len(self.vectordb), k)
         if k == 0:
             return []
         print(f"\033[33mAction Manager retrieving for {k} Actions\033[0m")
         # Retrieve descriptions of the top k related tasks.
-        docs_and_scores = self.vectordb.similarity_search_with_score(query, k=k)
+        names_and_scores = self.vectordb.search(query, k=k)
         print(
             f"\033[33mAction Manager retrieved actions: "
-            f"{', '.join([doc.metadata['name'] for doc, _ in docs_and_scores])}\033[0m"
+            f"{', '.join([name for name, _ in names_and_scores])}\033[0m"
         )
         action_name = []
-        for doc, _ in docs_and_scores:
-            action_name.append(doc.metadata["name"])
+        for name, _ in names_and_scores:
+            action_name.append(name)
         return action_name
     
     # Return the task description based on the task name
     def retrieve_action_description(self, action_name):
         action_description = []
+        descriptions = self.actions.descriptions
         for name in action_name:
-            action_description.append(self.actions[name]["description"])
+            action_description.append(descriptions[name])
         return action_description    
 
     # Return the task code based on the task name
     def retrieve_action_code(self, action_name):
         action_code = []
         for name in action_name:
-            action_code.append(self.actions[name]["code"])
+            action_code.append(self.actions.get_code(name))
         return action_code
 
     # Delete task-related information
     def delete_action(self, action):
         # Delete the task from the vector database
         if action in self.actions:
-            self.vectordb._collection.delete(ids=[action])
+            self.vectordb.delete([action])
             print(
             f"\033[33m delete {action} from vectordb successfully! \033[0m"
             )              
-        # Delete the task from actions.json
-        with open(f"{self.action_lib_dir}/actions.json", "r") as file:
-            action_infos = json.load(file)
-        if action in action_infos:
-            del action_infos[action]
-        with open(f"{self.action_lib_dir}/actions.json", "w") as file:
-            json.dump(action_infos, file, indent=4)
+        # Delete the task from the action library
+        if action in self.actions:
+            self.actions.delete(action)
             print(
-            f"\033[33m delete {action} info from JSON successfully! \033[0m"
+            f"\033[33m delete {action} info from action library successfully! \033[0m"
             )            
         # del code
         code_path = f"{self.action_lib_dir}/code/{action}.py"
@@ -223,6 +208,10 @@ def main():
                         help='Name of the tool to be added or deleted')
     parser.add_argument('--tool_path', type=str,
                         help='Path of the tool to be added', required='--add' in sys.argv)
+    parser.add_argument('--export', type=str,
+                        help='Export the action library to the given actions.json path')
+    parser.add_argument('--compact', action='store_true',
+                        help='Checkpoint and vacuum the action library journal')
 
     args = parser.parse_args()
 
@@ -232,8 +221,14 @@ def main():
         add_tool(actionManager, args.tool_name, args.tool_path)
     elif args.delete:
         delete_tool(actionManager, args.tool_name)
+    elif args.export:
+        actionManager.actions.export_json(args.export)
+        print(f"Successfully export the action library to: {args.export}")
+    elif args.compact:
+        actionManager.actions.compact()
+        print("Successfully compact the action library")
     else:
-        print_error_and_exit("Please specify an operation type (add or del)")
+        print_error_and_exit("Please specify an operation type (add, delete, export or compact)")
 
 
 if __name__ == "__main__":
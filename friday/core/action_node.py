@@ -4,6 +4,7 @@ class ActionNode:
         self._description = description
         self._return_val = ''
         self._relevant_code = {}
+        self._summary = None
         self._next_action = {}
         self._status = False
         self._type = type
@@ -25,6 +26,10 @@ class ActionNode:
     def relevant_action(self):
         return self._relevant_code
     
+    @property
+    def summary(self):
+        return self._summary
+
     @property
     def status(self):
         return self._status  
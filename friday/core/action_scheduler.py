@@ -0,0 +1,63 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ActionScheduler:
+    """
+    Dispatch every ready action node of the planning graph on a bounded worker pool.
+
+    An action is ready when it is still in the planner's execute list, is not already
+    running and all of its dependencies have finished. Results are handed back to the
+    caller as they complete, so the planning graph is only ever updated from one thread.
+    """
+
+    def __init__(self, planning_agent, max_workers=4):
+        self.planning_agent = planning_agent
+        self.max_workers = max(1, max_workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='friday-action')
+        self.running = {}  # future -> action name
+
+    @property
+    def running_actions(self):
+        return set(self.running.values())
+
+    @property
+    def idle(self):
+        return not self.running
+
+    @property
+    def full(self):
+        return len(self.running) >= self.max_workers
+
+    def ready_actions(self):
+        """
+        Get the actions of the execute list whose dependencies are all done, in topological order.
+        """
+        running = self.running_actions
+        with self.planning_agent.graph_lock:
+            return [action for action in self.planning_agent.get_ready_actions() if action not in running]
+
+    def submit(self, action, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) for the given action on the worker pool.
+        """
+        # Run in a copy of the caller's context so that trace spans stay attached to the task
+        future = self.pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        self.running[future] = action
+        return future
+
+    def wait(self, timeout=None):
+        """
+        Block until at least one running action finishes and return [(action, return_val), ...].
+        """
+        if not self.running:
+            return []
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        finished = []
+        for future in done:
+            action = self.running.pop(future)
+            finished.append((action, future.result()))
+        return finished
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
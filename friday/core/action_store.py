@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class ActionStore:
+    """
+    SQLite-backed storage of the action library.
+
+    Every mutation is a single-row transaction on a WAL journal, so adding or deleting
+    one action costs O(1) I/O regardless of the library size, and the journal is
+    compacted back into the database by SQLite checkpoints. Only names and descriptions
+    are read at startup; code bodies are loaded on demand. Description embeddings are
+    stored next to the action, tagged with the embedding backend that produced them.
+    An actions.json seed is imported on startup: only its entries that are new or changed
+    since the last import are written, and the file itself is never modified.
+    """
+
+    def __init__(self, path, seed_json_path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS actions ("
+            "name TEXT PRIMARY KEY, description TEXT, code TEXT NOT NULL, "
+            "embedding BLOB, embedding_backend TEXT)"
+        )
+        # Content hash of every seed entry last imported, and of the whole seed file
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seeds (name TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._descriptions = dict(self._conn.execute("SELECT name, description FROM actions").fetchall())
+        if seed_json_path and os.path.exists(seed_json_path):
+            self.import_json(seed_json_path)
+
+    def __len__(self):
+        return len(self._descriptions)
+
+    def __contains__(self, name):
+        return name in self._descriptions
+
+    def __iter__(self):
+        return iter(list(self._descriptions))
+
+    @property
+    def descriptions(self):
+        return dict(self._descriptions)
+
+    def get_code(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT code FROM actions WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return row[0]
+
+    def put(self, name, code, description, embedding=None, embedding_backend=None):
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO actions (name, description, code, embedding, embedding_backend) VALUES (?, ?, ?, ?, ?)",
+                (name, description, code, blob, embedding_backend)
+            )
+            self._conn.commit()
+            self._descriptions[name] = description
+
+    def delete(self, name):
+        with self._lock:
+            self._conn.execute("DELETE FROM actions WHERE name = ?", (name,))
+            self._conn.commit()
+            self._descriptions.pop(name, None)
+
+    def get_embeddings(self, embedding_backend):
+        """
+        Return (names, matrix) of the stored embeddings produced by embedding_backend.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, embedding FROM actions WHERE embedding_backend = ? AND embedding IS NOT NULL",
+                (embedding_backend,)
+            ).fetchall()
+        if not rows:
+            return [], None
+        return [name for name, _ in rows], np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+
+    def set_embeddings(self, names, matrix, embedding_backend):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE actions SET embedding = ?, embedding_backend = ? WHERE name = ?",
+                [(np.asarray(vector, dtype=np.float32).tobytes(), embedding_backend, name) for name, vector in zip(names, matrix)]
+            )
+            self._conn.commit()
+
+    def import_json(self, json_path):
+        """
+        Import the entries of an actions.json seed that are new or changed since its last import, by name and
+        content hash, and return their number. Actions added or deleted locally are left alone otherwise.
+        """
+        with open(json_path, "rb") as f:
+            raw = f.read()
+        file_hash = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'seed_hash'").fetchone()
+            if row is not None and row[0] == file_hash:
+                return 0
+            seeded = dict(self._conn.execute("SELECT name, hash FROM seeds").fetchall())
+            changed = []
+            for name, entry in json.loads(raw).items():
+                entry_hash = hashlib.sha256(json.dumps([entry["description"], entry["code"]]).encode("utf-8")).hexdigest()
+                if seeded.get(name) != entry_hash:
+                    changed.append((name, entry["description"], entry["code"], entry_hash))
+            # An unchanged description keeps its stored embedding
+            self._conn.executemany(
+                "INSERT INTO actions (name, description, code) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+                "code = excluded.code, description = excluded.description, "
+                "embedding = CASE WHEN description = excluded.description THEN embedding END, "
+                "embedding_backend = CASE WHEN description = excluded.description THEN embedding_backend END",
+                [(name, description, code) for name, description, code, _ in changed]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO seeds (name, hash) VALUES (?, ?)",
+                [(name, entry_hash) for name, _, _, entry_hash in changed]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seed_hash', ?)", (file_hash,))
+            self._conn.commit()
+            self._descriptions.update({name: description for name, description, _, _ in changed})
+        return len(changed)
+
+    def export_json(self, json_path):
+        """
+        Write the whole library in the actions.json format.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT name, code, description FROM actions").fetchall()
+        with open(json_path, "w") as f:
+            json.dump({name: {"code": code, "description": description} for name, code, description in rows}, f, indent=4)
+
+    def compact(self):
+        """
+        Fold the WAL journal back into the database and reclaim free pages.
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
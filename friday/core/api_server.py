@@ -3,6 +3,10 @@ import socket
 
 from fastapi import FastAPI
 from friday.core.server_config import ConfigManager
+from friday.core.service_pool import shutdown_service_pools
+from friday.core.sqlite_pool import close_sqlite_pools
+from friday.core.web_fetcher import close_web_fetcher
+from friday.core.pdf_extractor import close_pdf_extractor
 
 app = FastAPI()
 
@@ -18,7 +22,7 @@ from friday.api.google_calendar.calendar_service import router as calendar_route
 from friday.api.image_caption.image_caption_service import router as image_caption_router
 from friday.api.markdown.markdown_service import router as markdown_router
 from friday.api.ppt.ppt import router as ppt_router
-from friday.api.python.interpreter import router as python_router
+from friday.api.python.interpreter import router as python_router, shutdown_worker_pool as shutdown_python_workers
 from friday.api.shell.shell import router as shell_router
 from friday.api.translate.translate import router as translate_router
 from friday.api.weather.weather import router as weather_router 
@@ -44,6 +48,15 @@ class LoggingMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(LoggingMiddleware)
 
+
+@app.on_event("shutdown")
+def shutdown():
+    shutdown_service_pools()
+    shutdown_python_workers()
+    close_sqlite_pools()
+    close_web_fetcher()
+    close_pdf_extractor()
+
 # Create a dictionary that maps service names to their routers
 services = {
     "python_executor": python_router,
@@ -0,0 +1,161 @@
+"""
+Embedding index of the chunks of loaded web pages.
+
+Chunk embeddings are stored on disk by sha256 of the chunk text, tagged with the
+embedding backend that produced them, so a chunk is embedded once whatever page it
+appears in. Entries unused for CHUNK_CACHE_TTL seconds are pruned and the least recently
+used ones are evicted beyond CHUNK_CACHE_MAX_ENTRIES, on every write. Each page gets an in-memory VectorIndex of its chunks, and the indexes of
+the most recent pages are kept, so a repeated query on a loaded page only embeds
+the query.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from friday.core.vector_index import VectorIndex
+
+load_dotenv()
+CHUNK_CACHE_DIR = os.getenv('CHUNK_CACHE_DIR', 'cache/chunks')
+CHUNK_CACHE_TTL = int(os.getenv('CHUNK_CACHE_TTL', 7 * 24 * 3600))
+CHUNK_CACHE_MAX_ENTRIES = int(os.getenv('CHUNK_CACHE_MAX_ENTRIES', 50000))
+# Pages whose chunk index is kept in memory
+PAGE_INDEX_CACHE_SIZE = int(os.getenv('PAGE_INDEX_CACHE_SIZE', 64))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ChunkEmbeddingCache:
+    """
+    On-disk store of chunk embeddings keyed by chunk hash and embedding backend.
+    """
+
+    def __init__(self, cache_dir=CHUNK_CACHE_DIR, ttl=CHUNK_CACHE_TTL, max_entries=CHUNK_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'embeddings.sqlite3'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash TEXT NOT NULL, backend TEXT NOT NULL, embedding BLOB NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (hash, backend))"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)").fetchall()]
+        if 'accessed_at' not in columns:
+            # Caches created before entries were evicted
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE embeddings SET accessed_at = created_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+        self._conn.commit()
+
+    def embed(self, backend, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings of texts as a (len(texts), dim) matrix, only the texts never seen before are sent to the backend.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            stored = {}
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                stored.update(self._conn.execute(
+                    f"SELECT hash, embedding FROM embeddings WHERE backend = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [backend.name] + batch
+                ).fetchall())
+            if stored:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE hash = ? AND backend = ?",
+                    [(now, hash, backend.name) for hash in stored]
+                )
+                self._conn.commit()
+        vectors = {hash: np.frombuffer(blob, dtype=np.float32) for hash, blob in stored.items()}
+        # Identical chunks are embedded once
+        missing = {}
+        for hash, text in zip(hashes, texts):
+            if hash not in vectors:
+                missing.setdefault(hash, text)
+        self.hits += len(hashes) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            matrix = backend.embed_documents(list(missing.values()))
+            now = time.time()
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, backend, embedding, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    [(hash, backend.name, np.asarray(vector, dtype=np.float32).tobytes(), now, now) for hash, vector in zip(missing, matrix)]
+                )
+                self._evict()
+                self._conn.commit()
+            vectors.update(zip(missing, matrix))
+        return np.stack([vectors[hash] for hash in hashes])
+
+    def _evict(self):
+        if self.ttl:
+            self._conn.execute("DELETE FROM embeddings WHERE accessed_at < ?", (time.time() - self.ttl,))
+        extra = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+        if extra > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY accessed_at ASC LIMIT ?)",
+                (extra,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class PageChunkIndex:
+    """
+    Top-k chunk search over loaded pages, with the chunk indexes of recent pages kept in an LRU.
+    """
+
+    def __init__(self, backend, embedding_cache: ChunkEmbeddingCache = None, max_pages=PAGE_INDEX_CACHE_SIZE):
+        self.backend = backend
+        self.embedding_cache = embedding_cache
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, page: str, chunker: Callable[[str], List[str]]):
+        """
+        Return (index, chunks) of page, chunking and embedding it on a miss.
+        """
+        key = text_hash(page)
+        with self._lock:
+            if key in self._pages:
+                self._pages.move_to_end(key)
+                return self._pages[key]
+        chunks = chunker(page)
+        if self.embedding_cache is not None:
+            matrix = self.embedding_cache.embed(self.backend, chunks)
+        else:
+            matrix = self.backend.embed_documents(chunks)
+        index = VectorIndex(self.backend)
+        index.add(list(range(len(chunks))), vectors=matrix)
+        with self._lock:
+            self._pages[key] = (index, chunks)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return index, chunks
+
+    def search(self, page: str, query: str, chunker: Callable[[str], List[str]], k=3) -> List[str]:
+        """
+        The k chunks of page most similar to query, most similar first.
+        """
+        index, chunks = self.get(page, chunker)
+        return [chunks[i] for i, _ in index.search(query, k)]
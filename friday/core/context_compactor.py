@@ -0,0 +1,76 @@
+import json
+import os
+
+from dotenv import load_dotenv
+from utils.token_utils import count_tokens, head_tail_truncate, within_budget
+
+load_dotenv()
+# Token budget of the prerequisite task information put into a prompt
+PRE_TASKS_INFO_TOKENS = int(os.getenv('PRE_TASKS_INFO_TOKENS', 6000))
+# Token budget of the summary kept for each executed action
+PRE_TASK_NODE_TOKENS = int(os.getenv('PRE_TASK_NODE_TOKENS', 1500))
+
+
+class ContextCompactor:
+    """
+    Keeps the prerequisite task information of a prompt within a token budget.
+
+    A compact summary of every action is computed once, when its result is stored:
+    the return value and the relevant code are cut to their head and tail. Prompts use
+    the full information while it fits the budget, then the summaries, then summaries
+    cut further so that every field gets an equal share of the remaining budget.
+    """
+
+    def __init__(self, budget=PRE_TASKS_INFO_TOKENS, node_tokens=PRE_TASK_NODE_TOKENS, model='gpt-4-turbo-preview'):
+        self.budget = budget
+        self.node_tokens = node_tokens
+        self.model = model
+
+    @staticmethod
+    def _as_text(value):
+        return value if isinstance(value, str) else json.dumps(value)
+
+    def _truncate(self, value, budget):
+        return head_tail_truncate(self._as_text(value), budget, self.model)
+
+    def summarize(self, description, return_val, relevant_code=None):
+        """
+        Compact task info of one action, in the same shape as its full info.
+        """
+        summary = {
+            "description": description,
+            "return_val": self._truncate(return_val, self.node_tokens)
+        }
+        if relevant_code:
+            code_tokens = max(1, self.node_tokens // len(relevant_code))
+            summary["relevant_code"] = {name: self._truncate(code, code_tokens) for name, code in relevant_code.items()}
+        return summary
+
+    def build(self, pre_tasks):
+        """
+        Serialize {task name: (full info, summary)} within the token budget.
+        """
+        full_info = json.dumps({name: info for name, (info, _) in pre_tasks.items()})
+        if not pre_tasks or within_budget(full_info, self.budget, self.model):
+            return full_info
+        summaries = {name: summary for name, (_, summary) in pre_tasks.items()}
+        compact_info = json.dumps(summaries)
+        if within_budget(compact_info, self.budget, self.model):
+            return compact_info
+        # The JSON keys and punctuation are kept, the field values share what is left of the budget
+        skeleton = json.dumps({
+            name: {key: ({code_name: "" for code_name in value} if isinstance(value, dict) else "") for key, value in summary.items()}
+            for name, summary in summaries.items()
+        })
+        fields = sum(2 + len(summary.get("relevant_code", {})) for summary in summaries.values())
+        field_tokens = max(1, (self.budget - count_tokens(skeleton, self.model)) // fields)
+        shared = {}
+        for name, summary in summaries.items():
+            code = summary.get("relevant_code", {})
+            shared[name] = {
+                "description": self._truncate(summary["description"], field_tokens),
+                "return_val": self._truncate(summary["return_val"], field_tokens)
+            }
+            if code:
+                shared[name]["relevant_code"] = {code_name: self._truncate(value, field_tokens) for code_name, value in code.items()}
+        return json.dumps(shared)
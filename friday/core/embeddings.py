@@ -0,0 +1,143 @@
+"""Pluggable text embedding backends."""
+import abc
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_ORGANIZATION = os.getenv('OPENAI_ORGANIZATION')
+# 'openai' (text-embedding-ada-002) or 'local' (CPU sentence embedding model)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')
+LOCAL_EMBEDDING_MODEL = os.getenv('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+
+
+class EmbeddingBackend(abc.ABC):
+    """
+    Interface for embedding models. Vectors are returned L2 normalized as float32 so that
+    a dot product is the cosine similarity. Query embeddings are kept in an LRU cache.
+    """
+
+    def __init__(self, query_cache_size=1024):
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = Lock()
+
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        """Identifier of the model, embeddings of different backends are never mixed."""
+
+    @abc.abstractmethod
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a (len(texts), dim) array."""
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._normalize(self._embed(list(texts)))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        with self._query_cache_lock:
+            if text in self._query_cache:
+                self._query_cache.move_to_end(text)
+                return self._query_cache[text]
+        vector = self.embed_documents([text])[0]
+        with self._query_cache_lock:
+            self._query_cache[text] = vector
+            if len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    OpenAI embeddings (default: text-embedding-ada-002), the model used by the original Chroma store.
+    """
+
+    def __init__(self, model='text-embedding-ada-002', query_cache_size=1024):
+        super().__init__(query_cache_size)
+        from langchain.embeddings.openai import OpenAIEmbeddings
+        self.model = model
+        self.client = OpenAIEmbeddings(
+            model=model,
+            openai_api_key=OPENAI_API_KEY,
+            openai_organization=OPENAI_ORGANIZATION,
+        )
+
+    @property
+    def name(self):
+        return f"openai-{self.model}"
+
+    def _embed(self, texts):
+        return np.asarray(self.client.embed_documents(texts), dtype=np.float32)
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """
+    Sentence embedding model running on CPU through transformers, works offline once downloaded.
+    """
+
+    def __init__(self, model=LOCAL_EMBEDDING_MODEL, batch_size=32, query_cache_size=1024):
+        super().__init__(query_cache_size)
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                "The local embedding backend requires torch and transformers. "
+                "Please install them with `pip install torch transformers`."
+            ) from None
+        self.torch = torch
+        self.model = model
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.encoder = AutoModel.from_pretrained(model).eval()
+        self._lock = Lock()
+
+    @property
+    def name(self):
+        return f"local-{self.model.replace('/', '--')}"
+
+    def _embed(self, texts):
+        vectors = []
+        with self._lock, self.torch.no_grad():
+            for i in range(0, len(texts), self.batch_size):
+                batch = self.tokenizer(texts[i:i + self.batch_size], padding=True, truncation=True, max_length=512, return_tensors='pt')
+                hidden = self.encoder(**batch).last_hidden_state
+                # Mean pooling over the non-padding tokens
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors.append(pooled.numpy())
+        return np.concatenate(vectors, axis=0)
+
+
+_backends = {}
+_backends_lock = Lock()
+
+
+def get_embedding_backend(backend=None) -> EmbeddingBackend:
+    """
+    Shared embedding backend instance by name ('openai' or 'local').
+    """
+    backend = backend or EMBEDDING_BACKEND
+    with _backends_lock:
+        if backend not in _backends:
+            if backend == 'openai':
+                _backends[backend] = OpenAIEmbeddingBackend()
+            elif backend == 'local':
+                _backends[backend] = LocalEmbeddingBackend()
+            else:
+                raise ValueError(f"Embedding backend {backend} not implemented. Please choose one of ['openai', 'local']")
+        return _backends[backend]
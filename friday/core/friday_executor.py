@@ -1,30 +1,48 @@
+import contextvars
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from friday.agent.friday_agent import PlanningModule, ExecutionModule, RetrievalModule
 from utils.logger import Logger
+from utils.tracing import span
 
 class FridayExecutor:
-    def __init__(self, planning_agent:PlanningModule, execute_agent:ExecutionModule, retrieve_agent:RetrievalModule, logger:Logger, score):
+    def __init__(self, planning_agent:PlanningModule, execute_agent:ExecutionModule, retrieve_agent:RetrievalModule, logger:Logger, score, speculative=False, speculation_workers=2):
+        """
+        In speculative mode, the subtasks unblocked by a Code subtask are retrieved and generated
+        while its judge call is in flight, assuming it succeeds. The prepared code is only used if
+        the subtask is later executed with exactly the inputs it was prepared with.
+        """
         self.planning_agent = planning_agent
         self.execute_agent = execute_agent
         self.retrieve_agent = retrieve_agent
         self.logging = logger
         self.score = score
+        self.speculative = speculative
+        self._speculation_pool = ThreadPoolExecutor(max_workers=speculation_workers, thread_name_prefix='speculation') if speculative else None
+        self._speculations = {}  # action -> (source action, inputs, future)
+        self._speculation_lock = threading.Lock()
+        self.speculation_stats = {"started": 0, "used": 0, "discarded": 0}
 
     def handle_qa_type(self, pre_tasks_info, task, description):
-        if self.planning_agent.action_num == 1:
-            result = self.execute_agent.question_and_answer_action(pre_tasks_info, task, task)
-        else:
-            result = self.execute_agent.question_and_answer_action(pre_tasks_info, task, description)
+        with span('qa'):
+            if self.planning_agent.action_num == 1:
+                result = self.execute_agent.question_and_answer_action(pre_tasks_info, task, task)
+            else:
+                result = self.execute_agent.question_and_answer_action(pre_tasks_info, task, description)
         self.logging.info(result, title='QA Result', color='green')
         return result
 
     def retrieve_existing_action(self, description):
-        retrieve_name = self.retrieve_agent.retrieve_action_name(description, 3)
-        relevant_code = self.retrieve_agent.retrieve_action_code_pair(retrieve_name)
+        with span('retrieve'):
+            retrieve_name = self.retrieve_agent.retrieve_action_name(description, 3)
+            relevant_code = self.retrieve_agent.retrieve_action_code_pair(retrieve_name)
         return relevant_code
 
     def handle_execution(self, code, invoke, type):
-        state = self.execute_agent.execute_action(code, invoke, type)
+        with span('execute', type=type) as s:
+            state = self.execute_agent.execute_action(code, invoke, type)
+            s.set_attribute('error', state.error is not None)
         
         output = {
             "result": state.result,
@@ -38,16 +56,113 @@ class FridayExecutor:
     def plan_task(self, task, replan=False):
         self.logging.info(task, title='Task', color='green')
         # relevant action
-        retrieve_action_name = self.retrieve_agent.retrieve_action_name(task)
-        retrieve_action_description_pair = self.retrieve_agent.retrieve_action_description_pair(retrieve_action_name)
+        with span('retrieve'):
+            retrieve_action_name = self.retrieve_agent.retrieve_action_name(task)
+            retrieve_action_description_pair = self.retrieve_agent.retrieve_action_description_pair(retrieve_action_name)
 
         # task planner
-        if not replan:
-            self.planning_agent.decompose_task(task, retrieve_action_description_pair)
-        else:
-            self.planning_agent.redecompose_task(task, retrieve_action_description_pair, self.planning_agent.execute_list[0])
+        if self.speculative:
+            self.discard_speculations()
+        with span('plan', replan=replan):
+            if not replan:
+                self.planning_agent.decompose_task(task, retrieve_action_description_pair)
+            else:
+                self.planning_agent.redecompose_task(task, retrieve_action_description_pair, self.planning_agent.execute_list[0])
     
+    def prepare_action(self, action, action_node, pre_tasks_info):
+        """
+        Retrieve the relevant code and generate the code of an API or Code subtask.
+        Return (code, invoke, relevant_code).
+        """
+        type = action_node.type
+        description = action_node.description
+        invoke = ''
+        relevant_code = {}
+        if type == 'API':
+            api_path = self.execute_agent.extract_API_Path(description)
+            with span('generate', type=type):
+                code = self.execute_agent.api_action(description, api_path, pre_tasks_info)
+        else:
+            relevant_code = self.retrieve_existing_action(description)
+            with span('generate', type=type):
+                code, invoke = self.execute_agent.generate_action(action, description, pre_tasks_info, relevant_code)
+        return code, invoke, relevant_code
+
+    def _speculation_inputs(self, action_node, pre_tasks_info):
+        # Everything the generation prompt depends on
+        return (action_node.description, action_node.type, pre_tasks_info, self.execute_agent.environment.working_dir)
+
+    def _speculate_action(self, action, action_node, pre_tasks_info):
+        with span('speculate', action=action):
+            return self.prepare_action(action, action_node, pre_tasks_info)
+
+    def speculate(self, action, type, result, relevant_code):
+        """
+        Start preparing the API and Code subtasks unblocked by action, as if it succeeded with result.
+        """
+        candidates = []
+        with self.planning_agent.graph_lock:
+            for next_action in self.planning_agent.get_unblocked_actions(action):
+                next_node = self.planning_agent.action_node[next_action]
+                if next_node.type in ('API', 'Code'):
+                    pre_tasks_info = self.planning_agent.preview_pre_tasks_info(next_action, action, result, relevant_code, type)
+                    candidates.append((next_action, next_node, pre_tasks_info))
+        for next_action, next_node, pre_tasks_info in candidates:
+            inputs = self._speculation_inputs(next_node, pre_tasks_info)
+            future = self._speculation_pool.submit(contextvars.copy_context().run, self._speculate_action, next_action, next_node, pre_tasks_info)
+            with self._speculation_lock:
+                previous = self._speculations.get(next_action)
+                self._speculations[next_action] = (action, inputs, future)
+                self.speculation_stats["started"] += 1
+            if previous is not None:
+                previous[2].cancel()
+
+    def discard_speculations(self, source=None):
+        """
+        Throw away the subtasks prepared on the assumption that source succeeds, or all of them.
+        """
+        with self._speculation_lock:
+            discarded = [action for action, (action_source, _, _) in self._speculations.items() if source is None or action_source == source]
+            for action in discarded:
+                self._speculations.pop(action)[2].cancel()
+            self.speculation_stats["discarded"] += len(discarded)
+
+    def close(self):
+        """
+        Stop the speculation workers, the preparations not started yet are cancelled.
+        """
+        if self._speculation_pool is not None:
+            self.discard_speculations()
+            self._speculation_pool.shutdown(cancel_futures=True)
+
+    def _take_speculation(self, action, action_node, pre_tasks_info):
+        with self._speculation_lock:
+            speculation = self._speculations.pop(action, None)
+        if speculation is None:
+            return None
+        _, inputs, future = speculation
+        if inputs != self._speculation_inputs(action_node, pre_tasks_info):
+            future.cancel()
+            with self._speculation_lock:
+                self.speculation_stats["discarded"] += 1
+            return None
+        try:
+            prepared = future.result()
+        except Exception as e:
+            self.logging.error(f"Speculative preparation of {action} failed: {e!r}")
+            return None
+        with self._speculation_lock:
+            self.speculation_stats["used"] += 1
+        self.logging.info(f"Using the code prepared for {action} during the previous judge call", title='Speculation', color='gray')
+        return prepared
+
     def execute_task(self, task, action, action_node, pre_tasks_info):
+        return_val = self._execute_task(task, action, action_node, pre_tasks_info)
+        if self.speculative and return_val[0] != 'success':
+            self.discard_speculations(action)
+        return return_val
+
+    def _execute_task(self, task, action, action_node, pre_tasks_info):
         # self.logging.debug("The current task is: {task}".format(task=task))
         type = action_node.type
         next_action = action_node.next_action
@@ -63,13 +178,8 @@ class FridayExecutor:
             if "I don't know" in result:
                 return ['fail', ]
         else:
-            invoke = ''
-            if type == 'API':
-                api_path = self.execute_agent.extract_API_Path(description)
-                code = self.execute_agent.api_action(description, api_path, pre_tasks_info)
-            elif type == 'Code':
-                relevant_code = self.retrieve_existing_action(description)
-                code, invoke = self.execute_agent.generate_action(action, description, pre_tasks_info, relevant_code)
+            prepared = self._take_speculation(action, action_node, pre_tasks_info) if self.speculative else None
+            code, invoke, relevant_code = prepared or self.prepare_action(action, action_node, pre_tasks_info)
             state = self.handle_execution(code, invoke, type)
             result = state.result
             
@@ -77,17 +187,24 @@ class FridayExecutor:
                 need_amend = False
                 critique = ''
                 if state.error == None:
-                    critique, judge, score = self.execute_agent.judge_action(code, description, state, next_action)
+                    if self.speculative:
+                        self.speculate(action, type, result, relevant_code)
+                    with span('judge'):
+                        critique, judge, score = self.execute_agent.judge_action(code, description, state, next_action)
                     if not judge:
+                        if self.speculative:
+                            self.discard_speculations(action)
                         print("critique: {}".format(critique))
                         need_amend = True
                 else:
                     #  Determine whether it is caused by an error outside the code
-                    reasoning, error_type = self.execute_agent.analysis_action(code, description, state)
+                    with span('analysis'):
+                        reasoning, error_type = self.execute_agent.analysis_action(code, description, state)
                     if error_type == 'replan':
                         relevant_action_name = self.retrieve_agent.retrieve_action_name(reasoning)
                         relevant_action_description_pair = self.retrieve_agent.retrieve_action_description_pair(relevant_action_name)
-                        self.planning_agent.replan_task(reasoning, action, relevant_action_description_pair)
+                        with self.planning_agent.graph_lock:
+                            self.planning_agent.replan_task(reasoning, action, relevant_action_description_pair)
                         return ['replan']
                     need_amend = True
                     
@@ -95,15 +212,21 @@ class FridayExecutor:
                 while trial_times < self.execute_agent.max_iter and need_amend:
                     trial_times += 1
                     print(f"current amend times: {trial_times}")
-                    new_code, invoke = self.execute_agent.amend_action(code, description, state, critique, pre_tasks_info)
+                    with span('amend', trial=trial_times):
+                        new_code, invoke = self.execute_agent.amend_action(code, description, state, critique, pre_tasks_info)
                     code = new_code
                     state = self.handle_execution(code, invoke, type)
                     result = state.result
 
                     if state.error is None:
-                        critique, judge, score = self.execute_agent.judge_action(code, description, state, next_action)
+                        if self.speculative:
+                            self.speculate(action, type, result, relevant_code)
+                        with span('judge'):
+                            critique, judge, score = self.execute_agent.judge_action(code, description, state, next_action)
                         if judge:
                             need_amend = False
+                        elif self.speculative:
+                            self.discard_speculations(action)
                     else:
                         need_amend = True  
                 
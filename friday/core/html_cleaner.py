@@ -0,0 +1,238 @@
+"""
+Single-pass HTML cleaning shared by the web loaders.
+
+The page is decoded with its declared charset and tokenized once, by lxml's C parser in
+target mode when it is installed and by the standard library tokenizer otherwise, and no
+tree is built. Navigation, scripts, sidebars and the other excluded elements are skipped
+as their start tags are seen. The remaining text is collected as plain text, and the kept
+elements, with absolute links, are converted to markdown by html2text.
+"""
+import codecs
+import logging
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import html2text
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+EXCLUDED_TAGS = frozenset(["nav", "aside", "form", "header", "noscript", "svg", "canvas", "footer", "script", "style"])
+EXCLUDED_IDS = frozenset(["sidebar", "main-navigation", "menu-main-menu"])
+EXCLUDED_CLASSES = frozenset([
+    "elementor-location-header",
+    "navbar-header",
+    "nav",
+    "header-sidebar-wrapper",
+    "blog-sidebar-wrapper",
+    "related-posts",
+])
+
+VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"])
+# Tags closing the open tags listed, for the standard library tokenizer which does not balance tags
+IMPLIED_END_TAGS = {
+    "p": {"p"},
+    "li": {"li", "p"},
+    "dt": {"dt", "dd", "p"},
+    "dd": {"dt", "dd", "p"},
+    "tr": {"tr", "td", "th"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "option": {"option"},
+}
+
+# Attributes made absolute against the page URL
+LINK_ATTRIBUTES = frozenset([("a", "href"), ("img", "src")])
+
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+_HTTP_CHARSET = re.compile(r"charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+
+
+def clean_string(text):
+    """
+    This function takes in a string and performs a series of text cleaning operations.
+
+    Args:
+        text (str): The text to be cleaned. This is expected to be a string.
+
+    Returns:
+        cleaned_text (str): The cleaned text after all the cleaning operations
+        have been performed.
+    """
+    # Replacement of newline characters:
+    text = text.replace("\n", " ")
+
+    # Stripping and reducing multiple spaces to single:
+    cleaned_text = re.sub(r"\s+", " ", text.strip())
+
+    # Removing backslashes:
+    cleaned_text = cleaned_text.replace("\\", "")
+
+    # Replacing hash characters:
+    cleaned_text = cleaned_text.replace("#", " ")
+
+    # Eliminating consecutive non-alphanumeric characters:
+    # This regex identifies consecutive non-alphanumeric characters (i.e., not
+    # a word character [a-zA-Z0-9_] and not a whitespace) in the string
+    # and replaces each group of such characters with a single occurrence of
+    # that character.
+    # For example, "!!! hello !!!" would become "! hello !".
+    cleaned_text = re.sub(r"([^\w\s])\1*", r"\1", cleaned_text)
+
+    return cleaned_text
+
+
+class CleanedPage:
+    """
+    Content of a cleaned page.
+
+    Attributes:
+        text (str): The visible text on one line, normalized with clean_string.
+        markdown (str): The kept elements converted by html2text, with absolute links, empty when not requested.
+    """
+
+    def __init__(self, text: str, markdown: str = "") -> None:
+        self.text = text
+        self.markdown = markdown
+
+
+class _CleaningTarget:
+    """
+    Parser target receiving balanced start/end/data events, in the lxml target interface.
+    """
+
+    def __init__(self, url="", markdown=True):
+        self.url = url
+        self.markdown = markdown
+        self.text = []
+        # The kept elements serialized back to HTML, for html2text
+        self.html = []
+        # Depth inside an excluded element, 0 outside
+        self._skip = 0
+
+    def _excluded(self, tag, attrib):
+        return (tag in EXCLUDED_TAGS or attrib.get("id") in EXCLUDED_IDS
+                or not EXCLUDED_CLASSES.isdisjoint((attrib.get("class") or "").split()))
+
+    def _attribute(self, tag, name, value):
+        if self.url and (tag, name) in LINK_ATTRIBUTES:
+            value = urljoin(self.url, value)
+        return f' {name}="{escape(value)}"'
+
+    def start(self, tag, attrib, nsmap=None):
+        if self._skip or self._excluded(tag, attrib):
+            self._skip += 1
+            return
+        if self.markdown:
+            self.html.append(f"<{tag}{''.join(self._attribute(tag, name, value) for name, value in attrib.items())}>")
+
+    def end(self, tag):
+        if self._skip:
+            self._skip -= 1
+            return
+        if self.markdown and tag not in VOID_TAGS:
+            self.html.append(f"</{tag}>")
+
+    def data(self, data):
+        if self._skip:
+            return
+        self.text.append(data)
+        if self.markdown:
+            self.html.append(escape(data, quote=False))
+
+    def close(self):
+        markdown = html2text.HTML2Text().handle("".join(self.html)) if self.markdown else ""
+        return CleanedPage(clean_string("".join(self.text)), markdown)
+
+
+class _Tokenizer(HTMLParser):
+    """
+    Standard library tokenizer feeding a parser target with balanced events, used without lxml.
+    """
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+        self.open_tags = []
+
+    def handle_starttag(self, tag, attrs):
+        implied = IMPLIED_END_TAGS.get(tag)
+        while implied and self.open_tags and self.open_tags[-1] in implied:
+            self.target.end(self.open_tags.pop())
+        self.target.start(tag, {name: value or "" for name, value in attrs})
+        if tag in VOID_TAGS:
+            self.target.end(tag)
+        else:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, {name: value or "" for name, value in attrs})
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.open_tags:
+            return
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.target.end(open_tag)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.target.end(self.open_tags.pop())
+        return self.target.close()
+
+
+def decode_html(html: bytes, content_type: str = "") -> str:
+    """
+    Decode a page with its byte order mark, the charset of its Content-Type or of its <meta> tags,
+    in that order, and otherwise as UTF-8 or, failing that, windows-1252.
+    """
+    encodings = []
+    if html.startswith(codecs.BOM_UTF8):
+        encodings.append("utf-8-sig")
+    for match in (_HTTP_CHARSET.search(content_type or ""), _META_CHARSET.search(html[:4096])):
+        if match:
+            charset = match.group(1)
+            encodings.append(charset.decode("ascii") if isinstance(charset, bytes) else charset)
+    encodings += ["utf-8", "windows-1252"]
+    for encoding in encodings:
+        try:
+            return html.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return html.decode("latin-1")
+
+
+def clean_html(html, url="", markdown=True, content_type="") -> CleanedPage:
+    """
+    Clean an HTML page given as bytes or str in one pass. Bytes are decoded with decode_html using
+    content_type, the HTTP Content-Type header. Links of the markdown are made absolute against url.
+    """
+    if isinstance(html, bytes):
+        html = decode_html(html, content_type)
+    if not html.strip():
+        return CleanedPage("", "")
+    html = _XML_DECLARATION.sub("", html, count=1)
+
+    target = _CleaningTarget(url, markdown)
+    if etree is not None:
+        parser = etree.HTMLParser(target=target, remove_comments=True, remove_pis=True)
+    else:
+        parser = _Tokenizer(target)
+    parser.feed(html)
+    page = parser.close()
+
+    if page.text:
+        logging.info(f"[{url}] Cleaned page size: {len(page.text)} characters, down from {len(html)} of HTML")
+    return page
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache of chat completions.
+
+    Entries are keyed on a sha256 of the model, the messages and the request parameters,
+    expire after ttl seconds and are evicted least-recently-used first once the stored
+    responses exceed max_bytes.
+    """
+
+    def __init__(self, cache_dir='cache/llm', ttl=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'cache.sqlite3'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached response for key, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode('utf-8')), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
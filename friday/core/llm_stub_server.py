@@ -0,0 +1,119 @@
+"""
+Local stand-in for the OpenAI API that replays a recorded cassette (see utils/llm_cassette.py).
+
+Record a run with LLM_CASSETTE=<path> LLM_CASSETTE_MODE=record, then start
+`python -m friday.core.llm_stub_server --cassette <path>` and set
+OPENAI_BASE_URL=http://localhost:8999/v1 to replay it without network access.
+Embeddings that were not recorded (e.g. from the action library retriever) get a
+deterministic pseudo-random unit vector per input, so retrieval stays reproducible.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from utils.llm_cassette import Cassette
+
+EMBEDDING_DIM = 1536
+
+
+class StubState:
+    def __init__(self, cassette, latency_ms=0.0, replay_latency=False):
+        self.cassette = cassette
+        self.latency_ms = latency_ms
+        self.replay_latency = replay_latency
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    async def delay(self, record=None):
+        seconds = self.latency_ms / 1000
+        if self.replay_latency and record is not None and record.get('latency'):
+            seconds += record['latency']
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+
+def fake_embedding(value, dim=EMBEDDING_DIM):
+    """
+    Deterministic unit vector of an embedding input (a string or a list of token ids).
+    """
+    digest = hashlib.sha256(json.dumps(value).encode('utf-8')).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], 'little'))
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(state: StubState) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        record = state.cassette.replay('chat.completions', body)
+        state.count(record is not None)
+        if record is None:
+            return JSONResponse(status_code=404, content={"error": {
+                "message": "No recorded response for this request", "type": "cassette_miss", "code": "cassette_miss"
+            }})
+        await state.delay(record)
+        return record['response']
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        record = state.cassette.replay('embeddings', body)
+        state.count(record is not None)
+        await state.delay(record)
+        if record is not None:
+            return record['response']
+        inputs = body.get('input')
+        # A single string or a single list of token ids is one input
+        if isinstance(inputs, str) or (isinstance(inputs, list) and inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        for index, value in enumerate(inputs or []):
+            vector = fake_embedding(value)
+            if body.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.tobytes()).decode('utf-8')
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        return {"object": "list", "data": data, "model": body.get('model', ''), "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    @app.get("/stats")
+    async def stats():
+        return {"records": len(state.cassette), "hits": state.hits, "misses": state.misses}
+
+    @app.post("/rewind")
+    async def rewind():
+        state.cassette.rewind()
+        return {"rewound": True}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Replay a recorded LLM cassette through the OpenAI API')
+    parser.add_argument('--cassette', type=str, required=True, help='JSONL cassette recorded with LLM_CASSETTE_MODE=record')
+    parser.add_argument('--port', type=int, default=8999, help='port to listen on')
+    parser.add_argument('--latency_ms', type=float, default=0, help='fixed latency added to every response')
+    parser.add_argument('--replay_latency', action='store_true', help='also wait the recorded latency of each response')
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(StubState(Cassette(args.cassette), args.latency_ms, args.replay_latency)), host='localhost', port=args.port)
@@ -1,15 +1,25 @@
 import openai
 import json
 import logging
-import tiktoken
 import os
+import time
 from dotenv import load_dotenv
+from friday.core.llm_cache import LLMCache
+from utils.llm_cassette import get_recorder
+from utils.token_utils import count_message_tokens, messages_within_budget
+from utils.tracing import span
 
 
 load_dotenv()
 MODEL_NAME = os.getenv('MODEL_NAME')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_ORGANIZATION = os.getenv('OPENAI_ORGANIZATION')
+# Response cache, off by default, set LLM_CACHE=1 to enable it and LLM_CACHE_BYPASS=1 to skip lookups but still store responses
+LLM_CACHE = os.getenv('LLM_CACHE', '0') == '1'
+LLM_CACHE_BYPASS = os.getenv('LLM_CACHE_BYPASS', '0') == '1'
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', 'cache/llm')
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', 256))
 
 
 class OpenAI:
@@ -19,32 +29,51 @@ class OpenAI:
     def __init__(self, config_path=None):
 
         self.model_name = MODEL_NAME
+        self.cache = LLMCache(LLM_CACHE_DIR, LLM_CACHE_TTL, LLM_CACHE_MAX_MB * 1024 * 1024) if LLM_CACHE else None
+        self.cassette = get_recorder()
+        # Cached responses would be missing from the recording
+        self.cache_bypass = LLM_CACHE_BYPASS or self.cassette is not None
         openai.api_key = OPENAI_API_KEY
         openai.organization = OPENAI_ORGANIZATION
         # print(openai.api_key)
         # print(openai.organization)
         # openai.proxy = proxy
 
-    def chat(self, messages, temperature=0, sleep_time=2):
-        if (self.num_tokens(messages) > 20000):
+    def chat(self, messages, temperature=0, sleep_time=2, use_cache=True):
+        with span('llm.chat', model=self.model_name) as s:
+            return self._chat(messages, temperature, use_cache, s)
+
+    def _chat(self, messages, temperature, use_cache, s):
+        if not messages_within_budget(messages, 20000, 'gpt-4-turbo-preview'):
             raise ValueError("The number of tokens in the messages exceeds the limit of 10000 tokens.")
-        response = openai.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            temperature=temperature
-        )
+        # Only deterministic requests are memoized
+        cache_key = None
+        if self.cache is not None and use_cache and temperature == 0:
+            cache_key = self.cache.make_key(self.model_name, messages, temperature=temperature)
+            if not self.cache_bypass:
+                content = self.cache.get(cache_key)
+                if content is not None:
+                    logging.info(f"Cached response: {content}")
+                    s.set_attribute('cached', True)
+                    return content
+        request = {"model": self.model_name, "messages": messages, "temperature": temperature}
+        start = time.time()
+        response = openai.chat.completions.create(**request)
+        if self.cassette is not None:
+            self.cassette.record('chat.completions', request, response.model_dump(), time.time() - start)
+        if response.usage is not None:
+            s.set_attributes(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
         logging.info(f"Response: {response.choices[0].message.content}")
+        content = response.choices[0].message.content
+        if cache_key is not None and content is not None:
+            self.cache.set(cache_key, content)
 
         # time.sleep(sleep_time)
         # return response['choices'][0]['message']
-        return response.choices[0].message.content
+        return content
     
     def num_tokens(self, messages: list, encoding_name: str = 'gpt-4-turbo-preview') -> int:
-        """Returns the number of tokens in a text string."""
-        encoding = tiktoken.encoding_for_model(encoding_name)
-        num_tokens = 0
-        for msg in messages:
-            num_tokens += len(encoding.encode(msg['content']))
-        return num_tokens
+        """Returns the number of tokens in the message contents."""
+        return count_message_tokens([{'content': msg['content']} for msg in messages], encoding_name)
 
 
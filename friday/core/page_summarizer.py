@@ -0,0 +1,126 @@
+"""
+Parallel map-reduce summarization of long pages.
+
+Chunks are summarized concurrently, at most SUMMARY_CONCURRENCY calls at a time for
+the whole process, and summaries are then packed into groups that fit the reduce
+budget and summarized again, level by level, until one summary is left. Latency grows
+with the number of levels instead of the number of chunks. With SUMMARY_CACHE=1 every
+summary is cached by the hash of its prompt, so a page seen before costs no call, and
+a rate limit error pauses all calls before they are retried.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from dotenv import load_dotenv
+
+from friday.core.llm_cache import LLMCache
+from utils.token_utils import count_tokens
+
+load_dotenv()
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', 8))
+# Tokens of the summaries combined by one reduce call
+SUMMARY_REDUCE_TOKENS = int(os.getenv('SUMMARY_REDUCE_TOKENS', 3000))
+SUMMARY_RETRIES = int(os.getenv('SUMMARY_RETRIES', 4))
+# Off by default like LLM_CACHE, cached summaries are reused instead of asking the model again
+SUMMARY_CACHE = os.getenv('SUMMARY_CACHE', '0') == '1'
+SUMMARY_CACHE_DIR = os.getenv('SUMMARY_CACHE_DIR', 'cache/summaries')
+
+# The prompt of LangChain's map_reduce summarize chain, used for both map and reduce
+SUMMARY_PROMPT = """Write a concise summary of the following:
+
+
+"{text}"
+
+
+CONCISE SUMMARY:"""
+
+
+def _is_rate_limit(error):
+    return type(error).__name__ == 'RateLimitError' or getattr(error, 'status_code', None) == 429
+
+
+def _retry_after(error, default):
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+class PageSummarizer:
+    """
+    Map-reduce summarizer over a LangChain completion model.
+    """
+
+    def __init__(self, llm, max_concurrency=SUMMARY_CONCURRENCY, reduce_tokens=SUMMARY_REDUCE_TOKENS, retries=SUMMARY_RETRIES, cache: LLMCache = None):
+        self.llm = llm
+        self.model_name = getattr(llm, 'model_name', '')
+        self.reduce_tokens = reduce_tokens
+        self.retries = retries
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='summary-worker')
+        # No call is sent before this time after a rate limit error
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def summarize(self, chunks: List[str]) -> str:
+        """
+        Summary of a page split in chunks.
+        """
+        if not chunks:
+            return ""
+        summaries = list(self.pool.map(self._summarize, chunks))
+        while len(summaries) > 1:
+            groups = self._group(summaries)
+            summaries = list(self.pool.map(self._summarize, ['\n'.join(group) for group in groups]))
+        return summaries[0]
+
+    def _group(self, summaries):
+        """
+        Pack consecutive summaries into groups of at most reduce_tokens tokens and at least two summaries.
+        """
+        if sum(count_tokens(summary) for summary in summaries) <= self.reduce_tokens:
+            return [summaries]
+        groups, group, tokens = [], [], 0
+        for summary in summaries:
+            summary_tokens = count_tokens(summary)
+            if len(group) >= 2 and tokens + summary_tokens > self.reduce_tokens:
+                groups.append(group)
+                group, tokens = [], 0
+            group.append(summary)
+            tokens += summary_tokens
+        groups.append(group)
+        return groups
+
+    def _summarize(self, text):
+        prompt = SUMMARY_PROMPT.format(text=text)
+        key = None
+        if self.cache is not None:
+            key = LLMCache.make_key(self.model_name, prompt, temperature=0)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        summary = self._call(prompt).strip()
+        if self.cache is not None:
+            self.cache.set(key, summary)
+        return summary
+
+    def _call(self, prompt):
+        for attempt in range(self.retries + 1):
+            wait = self._resume_at - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return self.llm.invoke(prompt)
+            except Exception as e:
+                if not _is_rate_limit(e) or attempt >= self.retries:
+                    raise
+                with self._lock:
+                    self._resume_at = max(self._resume_at, time.time() + _retry_after(e, 2 ** attempt))
+
+
+def create_page_summarizer(llm) -> PageSummarizer:
+    return PageSummarizer(llm, cache=LLMCache(SUMMARY_CACHE_DIR) if SUMMARY_CACHE else None)
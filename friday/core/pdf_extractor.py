@@ -0,0 +1,165 @@
+"""
+Parallel, incremental text extraction of PDF documents.
+
+Pages are extracted in batches on a shared process pool, in page order, and extraction
+stops once the text collected reaches the token budget. Extracted pages are cached by
+document hash, so a document seen before is not parsed again and a larger budget only
+extracts the pages that are missing.
+"""
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from dotenv import load_dotenv
+
+from utils.token_utils import approx_tokens
+
+load_dotenv()
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+# Estimated tokens after which the remaining pages are not extracted, 0 extracts every page
+PDF_TOKEN_BUDGET = int(os.getenv('PDF_TOKEN_BUDGET', 100000))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 4))
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'cache/pdf')
+
+
+def count_pages(path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pages(path: str, page_numbers: List[int]) -> List[str]:
+    """
+    Text of the given 0-based pages of the PDF at path, run in the worker processes.
+    """
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[number].extract_text() or "" for number in page_numbers]
+
+
+class PDFPageCache:
+    """
+    On-disk store of extracted page texts keyed by document hash and page number.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'pages.sqlite3'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS documents (digest TEXT PRIMARY KEY, pages INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (digest TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL, PRIMARY KEY (digest, page))"
+        )
+        self._conn.commit()
+
+    def get(self, digest):
+        """
+        Return (page count, {page number: text}) of a document, page count is None for an unknown document.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM documents WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None, {}
+            return row[0], dict(self._conn.execute("SELECT page, text FROM pages WHERE digest = ?", (digest,)).fetchall())
+
+    def set(self, digest, page_count, pages):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO documents (digest, pages) VALUES (?, ?)", (digest, page_count))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (digest, page, text) VALUES (?, ?, ?)",
+                [(digest, number, text) for number, text in pages.items()]
+            )
+            self._conn.commit()
+
+
+class PDFExtractor:
+    """
+    Budgeted page extraction of PDF files on a process pool.
+    """
+
+    def __init__(self, workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK, cache: PDFPageCache = None):
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = cache
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Forking the multithreaded server could copy locks held by other threads
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def extract(self, path: str, digest: str, token_budget: int = PDF_TOKEN_BUDGET) -> List[str]:
+        """
+        Non-empty page texts of the PDF at path in page order, stopping once token_budget is reached.
+        """
+        page_count, pages = self.cache.get(digest) if self.cache is not None else (None, {})
+        if page_count is None:
+            page_count = count_pages(path)
+        extracted = {}
+        texts = []
+        tokens = 0
+        batches = self._batches([number for number in range(page_count) if number not in pages])
+        pending = {}
+        try:
+            for number in range(page_count):
+                if number not in pages:
+                    # Keep the pool busy with the next batches while the current one is collected
+                    while batches and len(pending) < self.workers:
+                        batch = batches.pop(0)
+                        pending[batch[0]] = (batch, self._get_pool().submit(extract_pages, path, batch))
+                    batch, future = pending.pop(number)
+                    extracted.update(zip(batch, future.result()))
+                    pages.update(extracted)
+                text = pages[number]
+                if text:
+                    texts.append(text)
+                    tokens += approx_tokens(text)
+                if token_budget and tokens >= token_budget:
+                    break
+        finally:
+            for _, future in pending.values():
+                future.cancel()
+            if self.cache is not None and (extracted or not pages):
+                self.cache.set(digest, page_count, extracted)
+        return texts
+
+    def _batches(self, numbers):
+        return [numbers[i:i + self.pages_per_task] for i in range(0, len(numbers), self.pages_per_task)]
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_pdf_extractor() -> PDFExtractor:
+    """
+    The extractor shared by every web loader.
+    """
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = PDFExtractor(cache=PDFPageCache())
+        return _extractor
+
+
+def close_pdf_extractor():
+    global _extractor
+    with _extractor_lock:
+        extractor, _extractor = _extractor, None
+    if extractor is not None:
+        extractor.close()
@@ -0,0 +1,63 @@
+"""
+Per-service worker pools of the tool server.
+
+Tool handlers are `async def` routes, so any blocking call made inside them stalls
+the event loop and every other request with it. Blocking work is handed to a
+thread pool owned by its service instead, so a slow service only queues behind
+itself. Pool sizes default to SERVICE_POOL_SIZES and can be overridden with
+<SERVICE>_POOL_SIZE environment variables, e.g. BING_POOL_SIZE=16.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+DEFAULT_POOL_SIZE = int(os.getenv('SERVICE_POOL_SIZE', 8))
+
+SERVICE_POOL_SIZES = {
+    "arxiv": 4,
+    "bing": 16,
+    "markdown": 8,
+    "database": 4,
+    "wolframalpha": 4,
+    "image_caption": 4,
+    # the uploaded file is written to and deleted from a fixed name in the working directory
+    "audio2text": 1,
+    # frames are extracted to the shared ./content/frames directory
+    "video": 1,
+    # one thread per warm interpreter of /tools/python
+    "python": 4,
+    # ppt handlers share one presentation object, run them one at a time
+    "ppt": 1,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_service_pool(service) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if service not in _pools:
+            size = int(os.getenv(f'{service.upper()}_POOL_SIZE', SERVICE_POOL_SIZES.get(service, DEFAULT_POOL_SIZE)))
+            _pools[service] = ThreadPoolExecutor(max_workers=max(1, size), thread_name_prefix=f'{service}-worker')
+        return _pools[service]
+
+
+async def run_in_service_pool(service, fn, *args, **kwargs):
+    """
+    Run a blocking fn(*args, **kwargs) in the pool of service without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_service_pool(service), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_service_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False)
@@ -0,0 +1,256 @@
+"""
+Shared SQLite connection pools of the tool server.
+
+Every database file gets one pool holding a single read-write connection, since
+SQLite serializes writers anyway, and up to `size` read-only connections for
+queries. Connections are opened once and kept, so their prepared statement caches
+stay warm, and the database is switched to WAL mode so readers never wait for the
+writer. Statements that look read-only go to a reader; if SQLite refuses one
+because it writes after all, it is run again on the writer. The statements of one
+request run on the same connection, and the writer is handed back without an open
+transaction or temporary tables.
+
+Pools open a working copy of the database file under SQLITE_COPY_DIR, so the WAL mode
+and the -wal/-shm files never touch the original, which may be tracked in git. Streamed
+queries fetch every page with a short reader checkout, a slow client holds no connection.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import Queue, Empty
+
+from dotenv import load_dotenv
+
+from friday.core.service_pool import SERVICE_POOL_SIZES
+
+load_dotenv()
+# Read-only connections per database, one per thread of the database service by default
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', SERVICE_POOL_SIZES['database']))
+# Prepared statements kept per connection
+SQLITE_STATEMENT_CACHE = int(os.getenv('SQLITE_STATEMENT_CACHE', 256))
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+SQLITE_COPY_DIR = os.getenv('SQLITE_COPY_DIR', 'cache/sqlite')
+
+_READ_ONLY_STATEMENT = re.compile(r'^\s*(?:--[^\n]*\n\s*|/\*.*?\*/\s*)*(SELECT|EXPLAIN|VALUES)\b', re.IGNORECASE | re.DOTALL)
+
+
+def is_read_only(sql):
+    return _READ_ONLY_STATEMENT.match(sql) is not None
+
+
+def _read_only_uri(path):
+    return 'file:' + path.replace('?', '%3f').replace('#', '%23') + '?mode=ro'
+
+
+def working_copy(path, copy_dir=SQLITE_COPY_DIR):
+    """
+    Path of the copy of the database file at path that its pool opens. The copy is made again when the
+    original changes, which drops the writes made to the previous copy.
+    """
+    path = os.path.abspath(path)
+    copy_dir = os.path.abspath(copy_dir)
+    os.makedirs(copy_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    copy = os.path.join(copy_dir, f"{name}-{hashlib.sha256(path.encode('utf-8')).hexdigest()[:12]}.db")
+    source_signature = ''
+    if os.path.exists(path):
+        stat = os.stat(path)
+        source_signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+    try:
+        with open(copy + '.source') as f:
+            copied_signature = f.read()
+    except OSError:
+        copied_signature = None
+    if copied_signature != source_signature or not os.path.exists(copy):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(copy + suffix):
+                os.remove(copy + suffix)
+        if source_signature:
+            # The original is only read, its journal mode is left as it is
+            source = sqlite3.connect(_read_only_uri(path), uri=True)
+            target = sqlite3.connect(copy)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+        with open(copy + '.source', 'w') as f:
+            f.write(source_signature)
+    return copy
+
+
+class SQLitePool:
+    """
+    Thread-safe connection pool of one SQLite database file.
+    """
+
+    def __init__(self, path, size=SQLITE_POOL_SIZE, cached_statements=SQLITE_STATEMENT_CACHE, busy_timeout=SQLITE_BUSY_TIMEOUT):
+        self.path = os.path.abspath(path)
+        self.size = max(1, size)
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        # Autocommit, transactions are opened explicitly
+        self._writer = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False,
+                                       isolation_level=None, cached_statements=cached_statements)
+        try:
+            self._writer.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError:
+            # e.g. a database on a read-only file system
+            pass
+        self._writer_lock = threading.Lock()
+        self._readers = Queue()
+        self._opened_readers = 0
+        self._lock = threading.Lock()
+
+    def _open_reader(self):
+        return sqlite3.connect(_read_only_uri(self.path), uri=True, timeout=self.busy_timeout, check_same_thread=False,
+                               isolation_level=None, cached_statements=self.cached_statements)
+
+    @contextmanager
+    def reader(self):
+        """
+        Borrow a read-only connection.
+        """
+        try:
+            connection = self._readers.get_nowait()
+        except Empty:
+            with self._lock:
+                can_open = self._opened_readers < self.size
+                if can_open:
+                    self._opened_readers += 1
+            connection = self._open_reader() if can_open else self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put(connection)
+
+    @contextmanager
+    def writer(self):
+        """
+        Hold the read-write connection.
+        """
+        with self._writer_lock:
+            try:
+                yield self._writer
+            finally:
+                self._reset_writer()
+
+    def _reset_writer(self):
+        # A BEGIN without COMMIT or a temporary table must not leak into the next request
+        if self._writer.in_transaction:
+            self._writer.execute("ROLLBACK")
+        for kind, name in self._writer.execute(
+                "SELECT type, name FROM sqlite_temp_master WHERE type IN ('table', 'view')").fetchall():
+            self._writer.execute(f'DROP {kind} IF EXISTS temp."{name.replace(chr(34), chr(34) * 2)}"')
+
+    def execute(self, sql, params=()):
+        """
+        Run one statement and return all its rows.
+        """
+        if is_read_only(sql):
+            try:
+                with self.reader() as connection:
+                    return connection.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                if 'readonly' not in str(e):
+                    raise
+        with self.writer() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def execute_batch(self, statements):
+        """
+        Run the statements of one request in order on one connection and return a (rows, error) pair for each.
+        """
+        if all(is_read_only(sql) for sql in statements):
+            with self.reader() as connection:
+                results = [self._run(connection, sql) for sql in statements]
+            if not any(error is not None and 'readonly' in str(error) for _, error in results):
+                return results
+        with self.writer() as connection:
+            return [self._run(connection, sql) for sql in statements]
+
+    @staticmethod
+    def _run(connection, sql):
+        try:
+            return connection.execute(sql).fetchall(), None
+        except Exception as e:
+            return None, e
+
+    def iter_pages(self, sql, params=(), page_size=500):
+        """
+        Yield the rows of a read-only query in lists of at most page_size rows.
+        Each page is a LIMIT/OFFSET query over sql run on its own reader checkout, so no connection is held
+        while the consumer handles a page; pages are therefore not one snapshot if the database is written meanwhile.
+        The writer is never streamed from, a slow client would block every write.
+        """
+        match = _READ_ONLY_STATEMENT.match(sql)
+        if match is None:
+            raise ValueError("only read-only statements can be streamed")
+        sql = sql.strip().rstrip(';')
+        if match.group(1).upper() == 'EXPLAIN':
+            # Not usable as a subquery, and short
+            with self.reader() as connection:
+                rows = connection.execute(sql, params).fetchall()
+            for i in range(0, len(rows), page_size):
+                yield rows[i:i + page_size]
+            return
+        # The newline ends a trailing line comment of sql
+        paged_sql = f"SELECT * FROM ({sql}\n) LIMIT ? OFFSET ?"
+        offset = 0
+        while True:
+            with self.reader() as connection:
+                rows = connection.execute(paged_sql, list(params) + [page_size, offset]).fetchall()
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            offset += page_size
+
+    def executemany(self, sql, seq_of_params):
+        """
+        Run one statement for every parameter tuple in a single transaction and return the number of changed rows.
+        """
+        with self.writer() as connection:
+            connection.execute("BEGIN")
+            try:
+                cursor = connection.executemany(sql, seq_of_params)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def close(self):
+        with self._writer_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_sqlite_pool(path) -> SQLitePool:
+    """
+    The shared pool of the database file at path.
+    """
+    path = os.path.abspath(path)
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = SQLitePool(working_copy(path))
+        return _pools[path]
+
+
+def close_sqlite_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,187 @@
+"""
+Offline end-to-end benchmark of the framework overhead.
+
+1. Record a task once against the real API:
+   python friday/core/test/benchmark.py --record --cassette cache/bench.jsonl --query "..."
+2. Replay it as many times as needed, with no network access:
+   python friday/core/test/benchmark.py --cassette cache/bench.jsonl --query "..." --runs 10
+
+The prompts contain the working directory and its listing, so recording and every
+replay run in the same --working_dir, emptied before each run. Requests missing from
+the cassette are answered with an error by the stub server, the run fails and the
+benchmark reports it with the number of misses instead of stopping.
+
+The stub server (friday/core/llm_stub_server.py) answers every LLM call from the
+cassette, so the measured time is the framework's own: planning bookkeeping,
+retrieval, code execution in the python workers, serialization and logging.
+Per-stage timings come from the trace spans of each run.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replay a recorded task through run.py and report the framework overhead')
+    parser.add_argument('--cassette', type=str, required=True, help='JSONL cassette recorded with LLM_CASSETTE_MODE=record')
+    parser.add_argument('--query', type=str, required=True, help='the query the cassette was recorded with')
+    parser.add_argument('--query_file_path', type=str, default='', help='the query file path the cassette was recorded with')
+    parser.add_argument('--action_lib_path', type=str, default='friday/action_lib', help='tool repo path')
+    parser.add_argument('--runs', type=int, default=5, help='number of measured runs')
+    parser.add_argument('--warmup', type=int, default=1, help='number of unmeasured runs')
+    parser.add_argument('--max_workers', type=int, default=4, help='max number of independent subtasks executed concurrently')
+    parser.add_argument('--port', type=int, default=8999, help='port of the stub server')
+    parser.add_argument('--latency_ms', type=float, default=0, help='fixed latency added by the stub server to every LLM call')
+    parser.add_argument('--speculative', action='store_true', help='overlap the judge calls with the preparation of the next subtasks')
+    parser.add_argument('--vision', action='store_true', help='load the vision executor, for cassettes with Vision subtasks')
+    parser.add_argument('--output_dir', type=str, default='', help='directory of the logs and traces, defaults to a temporary directory')
+    parser.add_argument('--working_dir', type=str, default='working_dir/bench', help='working directory of the task, emptied before every run')
+    parser.add_argument('--record', action='store_true', help='run the task once against the real API and record it to the cassette')
+    return parser.parse_args()
+
+
+def start_stub_server(cassette_path, port, latency_ms):
+    import requests
+    import uvicorn
+    from friday.core.llm_stub_server import StubState, create_app
+    from utils.llm_cassette import Cassette
+
+    server = uvicorn.Server(uvicorn.Config(create_app(StubState(Cassette(cassette_path), latency_ms)), host='localhost', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://localhost:{port}/stats', timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError('The stub server did not start')
+
+
+def read_summaries(trace_file):
+    with open(trace_file, encoding='utf-8') as f:
+        return [record for record in map(json.loads, f) if record.get('type') == 'summary']
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)] if values else 0.0
+
+
+def reset_working_dir(working_dir):
+    shutil.rmtree(working_dir, ignore_errors=True)
+    os.makedirs(working_dir)
+    return working_dir
+
+
+def main():
+    args = parse_args()
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix='friday-bench-')
+    base_url = f'http://localhost:{args.port}/v1'
+    # The clients read their configuration at import time
+    if args.record:
+        os.environ.update({
+            'LLM_CACHE': '0',
+            'LLM_CASSETTE': args.cassette,
+            'LLM_CASSETTE_MODE': 'record',
+        })
+    else:
+        os.environ.update({
+            'OPENAI_BASE_URL': base_url,
+            'OPENAI_API_BASE': base_url,
+            'OPENAI_API_KEY': os.environ.get('OPENAI_API_KEY') or 'sk-offline',
+            'LLM_CACHE': '0',
+            'LLM_CASSETTE_MODE': '',
+        })
+    import requests
+    from friday.agent.friday_agent import FridayAgent
+    from friday.core.friday_executor import FridayExecutor
+    from friday.environment.py_env import PythonEnv
+    from run import format_task, run_task
+    from utils.logger import Logger
+    from utils.tracing import tracer
+
+    if not args.record:
+        start_stub_server(args.cassette, args.port, args.latency_ms)
+    trace_file = os.path.join(output_dir, 'trace.jsonl')
+    tracer.configure(trace_file)
+
+    logger = Logger(log_dir=output_dir, log_filename='bench.log', log_prefix='bench')
+    shared_agent = FridayAgent(action_lib_dir=args.action_lib_path, logger=logger)
+    vision_executor = None
+    if args.vision:
+        from vision.core.vision import Vision
+        vision_executor = Vision(logger=logger)
+    task = format_task(args.query, args.query_file_path)
+
+    working_dir = os.path.abspath(args.working_dir)
+    runs = 1 if args.record else args.warmup + args.runs
+    warmup = 0 if args.record else args.warmup
+    elapsed = []
+    failed = 0
+    misses = 0
+    for run in range(runs):
+        if not args.record:
+            requests.post(f'http://localhost:{args.port}/rewind')
+        run_dir = os.path.join(output_dir, f'run{run}')
+        environment = PythonEnv(working_dir=reset_working_dir(working_dir), worker_pool=shared_agent.environment.worker_pool)
+        agent = FridayAgent(logger=logger, llm=shared_agent.llm, action_lib=shared_agent.action_lib, environment=environment)
+        # A score above the maximum keeps the replayed actions out of the action library
+        executor = FridayExecutor(agent.planner, agent.executor, agent.retriever, logger, 11, args.speculative)
+        os.makedirs(run_dir, exist_ok=True)
+        start = time.time()
+        try:
+            completed, _ = run_task(task, agent.planner, executor, vision_executor, logger, run_dir, args.max_workers)
+            error = None
+        except Exception as e:
+            completed, error = False, e
+        finally:
+            executor.close()
+        run_elapsed = time.time() - start
+        run_misses = 0
+        if not args.record:
+            total_misses = requests.get(f'http://localhost:{args.port}/stats').json()['misses']
+            run_misses, misses = total_misses - misses, total_misses
+        if error is not None:
+            failed += 1
+            print(f"run {run}{' (warmup)' if run < warmup else ''}: failed after {run_elapsed:.3f}s "
+                  f"with {run_misses} cassette misses: {error!r}")
+            continue
+        if run >= warmup:
+            elapsed.append(run_elapsed)
+        print(f"run {run}{' (warmup)' if run < warmup else ''}: {run_elapsed:.3f}s completed={completed} misses={run_misses}")
+
+    if args.record:
+        print(f"recorded to {args.cassette}, logs and traces: {output_dir}")
+        return
+    stats = requests.get(f'http://localhost:{args.port}/stats').json()
+    summaries = read_summaries(trace_file)[args.warmup:]
+    stages = {}
+    for summary in summaries:
+        for name, stage in summary['stages'].items():
+            stages.setdefault(name, []).append(stage['total_ms'])
+    llm_ms = [summary['stages'].get('llm.chat', {}).get('total_ms', 0) for summary in summaries]
+
+    print(f"\nruns={len(elapsed)} failed={failed} p50={percentile(elapsed, 50):.3f}s p95={percentile(elapsed, 95):.3f}s "
+          f"stub hits={stats['hits']} misses={stats['misses']}")
+    if llm_ms:
+        overhead = [total - llm / 1000 for total, llm in zip(elapsed, llm_ms)]
+        print(f"framework overhead (excluding LLM calls): p50={percentile(overhead, 50):.3f}s p95={percentile(overhead, 95):.3f}s")
+    print("per-stage total per run (ms):")
+    for name, totals in sorted(stages.items()):
+        print(f"  {name:<20} p50={percentile(totals, 50):10.1f} p95={percentile(totals, 95):10.1f}")
+    if stats['misses']:
+        print("warning: some LLM calls were not in the cassette, the replay diverged from the recording")
+    print(f"logs and traces: {output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Concurrent load test of the tool server.
+
+Start the server with `python -m friday.core.api_server`, then run
+`python friday/core/test/load_test.py`. Every request runs a shell command that
+sleeps for SLEEP seconds, so with non-blocking handlers the throughput grows with
+the concurrency while the latency stays close to SLEEP.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8998")
+SLEEP = float(os.getenv("SLEEP", 0.5))
+REQUESTS_PER_LEVEL = int(os.getenv("REQUESTS_PER_LEVEL", 32))
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16]
+
+
+def call_shell(session):
+    start = time.time()
+    response = session.post(
+        BASE_URL + '/tools/shell',
+        json={'command': f'sleep {SLEEP} && echo done'}
+    )
+    response.raise_for_status()
+    assert response.json()['stdout'].strip() == 'done'
+    return time.time() - start
+
+
+def run_level(concurrency):
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(lambda _: call_shell(session), range(REQUESTS_PER_LEVEL)))
+        elapsed = time.time() - start
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"concurrency={concurrency:<3} requests={REQUESTS_PER_LEVEL} elapsed={elapsed:.2f}s "
+          f"throughput={REQUESTS_PER_LEVEL / elapsed:.2f} req/s p50={p50:.2f}s p95={p95:.2f}s")
+    return REQUESTS_PER_LEVEL / elapsed
+
+
+if __name__ == '__main__':
+    baseline = run_level(CONCURRENCY_LEVELS[0])
+    for concurrency in CONCURRENCY_LEVELS[1:]:
+        throughput = run_level(concurrency)
+        print(f"  speedup over concurrency=1: {throughput / baseline:.1f}x")
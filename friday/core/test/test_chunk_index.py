@@ -0,0 +1,53 @@
+import numpy as np
+
+from friday.core.chunk_index import ChunkEmbeddingCache, text_hash
+
+
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def stored_hashes(cache):
+    return {row[0] for row in cache._conn.execute("SELECT hash FROM embeddings").fetchall()}
+
+
+def test_embeds_each_chunk_once(tmp_path):
+    backend = FakeBackend()
+    cache = ChunkEmbeddingCache(str(tmp_path))
+    first = cache.embed(backend, ['a', 'bb', 'a'])
+    second = cache.embed(backend, ['bb', 'ccc'])
+    assert backend.embedded == ['a', 'bb', 'ccc']
+    assert first.tolist() == [[1, 1], [2, 1], [1, 1]]
+    assert second.tolist() == [[2, 1], [3, 1]]
+
+
+def test_evicts_least_recently_used_beyond_max_entries(tmp_path):
+    backend = FakeBackend()
+    cache = ChunkEmbeddingCache(str(tmp_path), max_entries=2)
+    cache.embed(backend, ['a'])
+    cache.embed(backend, ['bb'])
+    # A hit makes 'a' more recent than 'bb'
+    cache._conn.execute("UPDATE embeddings SET accessed_at = accessed_at - 10 WHERE hash = ?", (text_hash('bb'),))
+    cache.embed(backend, ['a'])
+    cache.embed(backend, ['ccc'])
+    assert len(cache) == 2
+    assert stored_hashes(cache) == {text_hash('a'), text_hash('ccc')}
+
+
+def test_prunes_entries_unused_for_ttl_on_write(tmp_path):
+    backend = FakeBackend()
+    cache = ChunkEmbeddingCache(str(tmp_path), ttl=60)
+    cache.embed(backend, ['a', 'bb'])
+    cache._conn.execute("UPDATE embeddings SET accessed_at = accessed_at - 120 WHERE hash = ?", (text_hash('a'),))
+    cache._conn.commit()
+    cache.embed(backend, ['ccc'])
+    assert stored_hashes(cache) == {text_hash('bb'), text_hash('ccc')}
+    cache.embed(backend, ['a'])
+    assert backend.embedded == ['a', 'bb', 'ccc', 'a']
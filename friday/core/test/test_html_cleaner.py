@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("html2text")
+
+from friday.core import html_cleaner
+from friday.core.html_cleaner import clean_html, decode_html
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def parser(request, monkeypatch):
+    if request.param == "lxml":
+        if html_cleaner.etree is None:
+            pytest.skip("lxml is not installed")
+    else:
+        monkeypatch.setattr(html_cleaner, "etree", None)
+    return request.param
+
+
+PAGE = """<html><head><title>Page title</title><style>p { color: red }</style></head>
+<body>
+<nav>Home | About</nav>
+<div id="sidebar">Related</div>
+<h1>Heading</h1>
+<p>Intro with <a href="/docs/page">a link</a> and <img src="img/logo.png" alt="logo"></p>
+<ul><li>first<li>second</ul>
+<table><tr><th>name</th><th>value</th></tr><tr><td>a</td><td>1</td></tr></table>
+<script>alert("x")</script>
+<footer>Copyright</footer>
+</body></html>"""
+
+
+def test_excluded_elements_are_dropped(parser):
+    page = clean_html(PAGE, "https://example.com/blog/")
+    for excluded in ("Home | About", "Related", "alert", "Copyright", "color: red"):
+        assert excluded not in page.text
+        assert excluded not in page.markdown
+    assert page.text.startswith("Page title")
+    assert "Heading" in page.text
+
+
+def test_title_is_not_in_markdown(parser):
+    assert "Page title" not in clean_html(PAGE).markdown
+
+
+def test_links_are_absolute(parser):
+    markdown = clean_html(PAGE, "https://example.com/blog/").markdown
+    assert "[a link](https://example.com/docs/page)" in markdown
+    assert "![logo](https://example.com/blog/img/logo.png)" in markdown
+
+
+def test_lists_and_tables(parser):
+    markdown = clean_html(PAGE).markdown
+    assert "# Heading" in markdown
+    assert "* first" in markdown
+    assert "* second" in markdown
+    assert "name| value" in markdown
+    assert "a| 1" in markdown
+
+
+def test_text_only_skips_markdown(parser):
+    page = clean_html(PAGE, markdown=False)
+    assert page.markdown == ""
+    assert "second" in page.text
+
+
+def test_meta_charset(parser):
+    html = '<html><head><meta charset="iso-8859-1"></head><body><p>café</p></body></html>'.encode("latin-1")
+    page = clean_html(html)
+    assert "café" in page.text
+    assert "café" in page.markdown
+
+
+def test_http_charset_wins_over_meta(parser):
+    html = '<html><head><meta charset="utf-8"></head><body><p>naïve</p></body></html>'.encode("latin-1")
+    assert "naïve" in clean_html(html, content_type="text/html; charset=ISO-8859-1").text
+
+
+def test_undeclared_charset():
+    assert decode_html("café".encode("utf-8")) == "café"
+    assert decode_html("café".encode("cp1252")) == "café"
+    assert decode_html(b"\xef\xbb\xbfcaf\xc3\xa9", "text/html; charset=latin-1") == "café"
+    assert decode_html("café".encode("latin-1"), "text/html; charset=unknown-charset") == "café"
+
+
+def test_empty_page(parser):
+    page = clean_html(b"  ")
+    assert page.text == "" and page.markdown == ""
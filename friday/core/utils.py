@@ -9,104 +9,25 @@ import string
 from typing import Any
 import tqdm
 import re
-import tiktoken
+from utils.token_utils import count_tokens
+from friday.core.html_cleaner import clean_html, clean_string
 
 def num_tokens_from_string(string: str) -> int:
     """Returns the number of tokens in a text string."""
-    encoding = tiktoken.encoding_for_model('gpt-4-1106-preview')
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+    return count_tokens(string, 'gpt-4-1106-preview')
 
 
 
 def parse_content(content, type="html.parser"):
+    """
+    Visible text of an HTML page, see friday.core.html_cleaner. type is only validated,
+    the page is always tokenized by the shared single-pass cleaner.
+    """
     implemented = ["html.parser", "lxml", "lxml-xml", "xml", "html5lib"]
     if type not in implemented:
         raise ValueError(f"Parser type {type} not implemented. Please choose one of {implemented}")
 
-    from bs4 import BeautifulSoup
-
-    soup = BeautifulSoup(content, type)
-    original_size = len(str(soup.get_text()))
-
-    tags_to_exclude = [
-        "nav",
-        "aside",
-        "form",
-        "header",
-        "noscript",
-        "svg",
-        "canvas",
-        "footer",
-        "script",
-        "style",
-    ]
-    for tag in soup(tags_to_exclude):
-        tag.decompose()
-
-    ids_to_exclude = ["sidebar", "main-navigation", "menu-main-menu"]
-    for id in ids_to_exclude:
-        tags = soup.find_all(id=id)
-        for tag in tags:
-            tag.decompose()
-
-    classes_to_exclude = [
-        "elementor-location-header",
-        "navbar-header",
-        "nav",
-        "header-sidebar-wrapper",
-        "blog-sidebar-wrapper",
-        "related-posts",
-    ]
-    for class_name in classes_to_exclude:
-        tags = soup.find_all(class_=class_name)
-        for tag in tags:
-            tag.decompose()
-
-    content = soup.get_text()
-    content = clean_string(content)
-
-    cleaned_size = len(content)
-    if original_size != 0:
-        logging.info(
-            f"Cleaned page size: {cleaned_size} characters, down from {original_size} (shrunk: {original_size-cleaned_size} chars, {round((1-(cleaned_size/original_size)) * 100, 2)}%)"  # noqa:E501
-        )
-
-    return content
-
-
-def clean_string(text):
-    """
-    This function takes in a string and performs a series of text cleaning operations.
-
-    Args:
-        text (str): The text to be cleaned. This is expected to be a string.
-
-    Returns:
-        cleaned_text (str): The cleaned text after all the cleaning operations
-        have been performed.
-    """
-    # Replacement of newline characters:
-    text = text.replace("\n", " ")
-
-    # Stripping and reducing multiple spaces to single:
-    cleaned_text = re.sub(r"\s+", " ", text.strip())
-
-    # Removing backslashes:
-    cleaned_text = cleaned_text.replace("\\", "")
-
-    # Replacing hash characters:
-    cleaned_text = cleaned_text.replace("#", " ")
-
-    # Eliminating consecutive non-alphanumeric characters:
-    # This regex identifies consecutive non-alphanumeric characters (i.e., not
-    # a word character [a-zA-Z0-9_] and not a whitespace) in the string
-    # and replaces each group of such characters with a single occurrence of
-    # that character.
-    # For example, "!!! hello !!!" would become "! hello !".
-    cleaned_text = re.sub(r"([^\w\s])\1*", r"\1", cleaned_text)
-
-    return cleaned_text
+    return clean_html(content, markdown=False).text
 
 
 def is_readable(s):
@@ -0,0 +1,80 @@
+from threading import RLock
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    In-memory matrix of normalized embeddings with brute-force top-k search.
+
+    Rows are addressed by an id. The index is not persisted, stored embeddings are
+    reloaded into it by its owner, e.g. from the action store.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.ids = []
+        self.matrix = None
+        self._positions = {}
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return id in self._positions
+
+    def add(self, ids, texts=None, vectors=None):
+        """
+        Insert or replace rows. Either texts (embedded with the backend) or precomputed vectors are required.
+        """
+        if not ids:
+            return
+        if vectors is None:
+            vectors = self.backend.embed_documents(texts)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # An id given several times keeps its last vector
+        rows = dict(zip(ids, vectors))
+        with self._lock:
+            new_rows = []
+            new_ids = []
+            for id, vector in rows.items():
+                if id in self._positions:
+                    self.matrix[self._positions[id]] = vector
+                else:
+                    new_ids.append(id)
+                    new_rows.append(vector)
+            if new_rows:
+                new_rows = np.stack(new_rows)
+                self.matrix = new_rows if self.matrix is None or len(self.ids) == 0 else np.vstack([self.matrix, new_rows])
+                self._positions.update((id, len(self.ids) + i) for i, id in enumerate(new_ids))
+                self.ids.extend(new_ids)
+
+    def delete(self, ids):
+        ids = set(ids)
+        with self._lock:
+            keep = [i for i, id in enumerate(self.ids) if id not in ids]
+            if len(keep) == len(self.ids):
+                return
+            self.ids = [self.ids[i] for i in keep]
+            self.matrix = self.matrix[keep] if keep else None
+            self._positions = {id: i for i, id in enumerate(self.ids)}
+
+    def search(self, query, k=10):
+        """
+        Return the k most similar rows as [(id, cosine similarity), ...] in descending order.
+        """
+        if not self.ids:
+            return []
+        query_vector = query if isinstance(query, np.ndarray) else self.backend.embed_query(query)
+        with self._lock:
+            if not self.ids:
+                return []
+            scores = self.matrix @ query_vector
+            k = min(k, len(self.ids))
+            if k < len(self.ids):
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(self.ids))
+            top = top[np.argsort(-scores[top])]
+            return [(self.ids[i], float(scores[i])) for i in top]
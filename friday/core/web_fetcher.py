@@ -0,0 +1,402 @@
+"""
+Shared web page fetcher of the tool server.
+
+All page loads go through one httpx.AsyncClient running on a background event loop,
+so sync callers in the service pools and async callers share its connection pool.
+Concurrent fetches of the same URL share one request, and responses are kept in a
+disk cache that honors Cache-Control max-age and revalidates stale entries with
+ETag / Last-Modified before downloading them again. Binary documents such as PDFs
+are streamed to a file instead of being read into memory; a file that is not kept in
+the cache belongs to its response and is deleted by WebResponse.release.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import List
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+WEB_CACHE = os.getenv('WEB_CACHE', '1') != '0'
+WEB_CACHE_DIR = os.getenv('WEB_CACHE_DIR', 'cache/web')
+# Freshness of responses without a Cache-Control max-age
+WEB_CACHE_TTL = int(os.getenv('WEB_CACHE_TTL', 3600))
+WEB_CACHE_MAX_BYTES = int(os.getenv('WEB_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+WEB_FETCH_CONNECT_TIMEOUT = float(os.getenv('WEB_FETCH_CONNECT_TIMEOUT', 5))
+WEB_FETCH_READ_TIMEOUT = float(os.getenv('WEB_FETCH_READ_TIMEOUT', 20))
+# Parallel downloads of fetch_many
+WEB_FETCH_CONCURRENCY = int(os.getenv('WEB_FETCH_CONCURRENCY', 8))
+WEB_FETCH_STREAM_CHUNK = 64 * 1024
+
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_4) AppleWebKit/537.36 (KHTML like Gecko) Chrome/52.0.2743.116 Safari/537.36'}
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+_release_lock = threading.Lock()
+
+
+class WebResponse:
+    """
+    Body of a fetched page.
+
+    Attributes:
+        url (str): The requested URL.
+        status (int): HTTP status of the response the body came from.
+        content_type (str): Its Content-Type header.
+        content (bytes): The body, read from path on first access for bodies stored on disk.
+        path (str): File holding the body, set for cached and streamed bodies.
+        digest (str): sha256 of the body.
+        from_cache (bool): Whether the body was served from the cache, fresh or revalidated.
+        temporary (bool): Whether path is a temporary file, deleted once every caller released the response.
+    """
+
+    def __init__(self, url: str, status: int, content_type: str, content: bytes = None, from_cache: bool = False, path: str = None, digest: str = None, holders: list = None) -> None:
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.from_cache = from_cache
+        self.path = path
+        self._content = content
+        self._digest = digest
+        # [number of callers sharing a temporary body], None when the body is not temporary
+        self._holders = holders
+
+    @property
+    def temporary(self) -> bool:
+        return self._holders is not None
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None and self.path is not None:
+            with open(self.path, 'rb') as f:
+                self._content = f.read()
+        return self._content
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.content).hexdigest()
+        return self._digest
+
+    def release(self):
+        """
+        Give the response back once its body has been used, deleting a temporary body file after the last caller.
+        """
+        if self._holders is None:
+            return
+        with _release_lock:
+            self._holders[0] -= 1
+            if self._holders[0] > 0:
+                return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _is_text(content_type):
+    content_type = content_type.lower()
+    return content_type.startswith('text/') or any(kind in content_type for kind in ('html', 'json', 'xml'))
+
+
+class WebCache:
+    """
+    Content-addressed on-disk cache of web pages.
+
+    Bodies are stored once per sha256 of their content under cache_dir/bodies, and an
+    index maps each URL to its body, validators and expiry. Least-recently-used
+    entries are evicted once the stored bodies exceed max_bytes.
+    """
+
+    def __init__(self, cache_dir=WEB_CACHE_DIR, max_bytes=WEB_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.cache_dir, 'bodies'), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, body TEXT NOT NULL, size INTEGER NOT NULL, status INTEGER NOT NULL, "
+            "content_type TEXT NOT NULL, etag TEXT, last_modified TEXT, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self._conn.commit()
+
+    @property
+    def spool_dir(self):
+        # Streamed bodies are written next to the stored ones, so storing them is a rename
+        return os.path.join(self.cache_dir, 'bodies')
+
+    def _body_path(self, body):
+        return os.path.join(self.cache_dir, 'bodies', body[:2], body)
+
+    def get(self, url):
+        """
+        Return (entry, path) for url, or (None, None) on a miss. entry is a dict with the validators,
+        the body digest and a 'fresh' flag, a stale entry must be revalidated before its body is used.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, status, content_type, etag, last_modified, expires_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        path = self._body_path(row[0])
+        if not os.path.exists(path):
+            return None, None
+        entry = {"digest": row[0], "status": row[1], "content_type": row[2], "etag": row[3], "last_modified": row[4], "fresh": row[5] > time.time()}
+        return entry, path
+
+    def put_body(self, digest, content: bytes = None, spooled_path: str = None) -> str:
+        """
+        Store a body given as bytes or as a spooled file, which is moved, and return its path.
+        """
+        path = self._body_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if spooled_path is not None:
+            os.replace(spooled_path, path)
+        elif not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return path
+
+    def set(self, url, response: WebResponse, size, etag, last_modified, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, size, status, content_type, etag, last_modified, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.digest, size, response.status, response.content_type, etag, last_modified, now + ttl, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url, ttl):
+        """
+        Mark a revalidated entry fresh for another ttl seconds.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE pages SET expires_at = ? WHERE url = ?", (time.time() + ttl, url))
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, body, size in self._conn.execute("SELECT url, body, size FROM pages ORDER BY accessed_at ASC").fetchall():
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            # Bodies are shared by every URL with the same content
+            if self._conn.execute("SELECT 1 FROM pages WHERE body = ? LIMIT 1", (body,)).fetchone() is None:
+                try:
+                    os.remove(self._body_path(body))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+def _cache_ttl(headers):
+    """
+    Seconds a response stays fresh, None when it must not be stored.
+    """
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    return int(match.group(1)) if match else WEB_CACHE_TTL
+
+
+class WebFetcher:
+    """
+    Cached, deduplicating page fetcher shared by the web loaders.
+    """
+
+    def __init__(self, cache: WebCache = None, concurrency=WEB_FETCH_CONCURRENCY,
+                 connect_timeout=WEB_FETCH_CONNECT_TIMEOUT, read_timeout=WEB_FETCH_READ_TIMEOUT):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._loop = None
+        self._client = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # Parent directory of the temporary bodies, removed by close with any body never released
+        self._spool_dir = None
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='web-fetcher', daemon=True).start()
+            return self._loop
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop())
+
+    def fetch(self, url: str) -> WebResponse:
+        """
+        Fetch url from any thread, raising httpx errors like response.raise_for_status.
+        """
+        return self._submit(self._fetch(url)).result()
+
+    def fetch_many(self, urls: List[str], concurrency: int = None) -> list:
+        """
+        Fetch urls with at most concurrency downloads at once. Returns one WebResponse or exception per URL.
+        """
+        return self._submit(self._fetch_many(urls, concurrency or self.concurrency)).result()
+
+    async def afetch(self, url: str) -> WebResponse:
+        """
+        Async variant of fetch, usable from any event loop.
+        """
+        return await asyncio.wrap_future(self._submit(self._fetch(url)))
+
+    async def _fetch_many(self, urls, concurrency):
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch_one(url):
+            async with semaphore:
+                return await self._fetch(url)
+
+        return await asyncio.gather(*(fetch_one(url) for url in urls), return_exceptions=True)
+
+    async def _fetch(self, url):
+        # Runs on the fetcher's loop, so the in-flight table needs no lock
+        inflight = self._inflight.get(url)
+        if inflight is None or inflight[0].done():
+            # Callers joining the download, each releases a temporary body once
+            holders = [0]
+            inflight = (asyncio.ensure_future(self._fetch_cached(url, holders)), holders)
+            self._inflight[url] = inflight
+            inflight[0].add_done_callback(lambda _, inflight=inflight: self._inflight.get(url) is inflight and self._inflight.pop(url))
+        task, holders = inflight
+        with _release_lock:
+            holders[0] += 1
+        return await asyncio.shield(task)
+
+    async def _fetch_cached(self, url, holders):
+        loop = asyncio.get_running_loop()
+        entry, path = (None, None)
+        if self.cache is not None:
+            entry, path = await loop.run_in_executor(None, self.cache.get, url)
+            if entry is not None and entry['fresh']:
+                self.cache.hits += 1
+                return WebResponse(url, entry['status'], entry['content_type'], from_cache=True, path=path, digest=entry['digest'])
+
+        headers = dict(DEFAULT_HEADERS)
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True)
+        async with self._client.stream('GET', url, headers=headers) as response:
+            ttl = _cache_ttl(response.headers)
+            if response.status_code == 304 and entry is not None:
+                self.cache.revalidated += 1
+                if ttl is not None:
+                    await loop.run_in_executor(None, self.cache.touch, url, ttl)
+                return WebResponse(url, entry['status'], entry['content_type'], from_cache=True, path=path, digest=entry['digest'])
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if _is_text(content_type):
+                result = WebResponse(url, response.status_code, content_type, content=await response.aread())
+                size = len(result.content)
+            else:
+                result, size = await self._spool(url, response, content_type, holders, store=self.cache is not None and ttl is not None)
+
+        if self.cache is not None:
+            self.cache.misses += 1
+            if ttl is not None:
+                if result.path is None:
+                    result.path = await loop.run_in_executor(None, self.cache.put_body, result.digest, result.content)
+                await loop.run_in_executor(None, self.cache.set, url, result, size,
+                                           response.headers.get('ETag'), response.headers.get('Last-Modified'), ttl)
+        return result
+
+    async def _spool(self, url, response, content_type, holders, store):
+        """
+        Stream a binary body to a file, hashing it on the way, and return (WebResponse, size).
+        The file is stored in the cache when store is set and is a temporary file of the response otherwise.
+        """
+        if store:
+            spool_dir = self.cache.spool_dir
+        else:
+            if self._spool_dir is None:
+                self._spool_dir = tempfile.mkdtemp(prefix='friday_web_')
+            spool_dir = self._spool_dir
+        digest = hashlib.sha256()
+        size = 0
+        fd, spooled_path = tempfile.mkstemp(dir=spool_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in response.aiter_bytes(WEB_FETCH_STREAM_CHUNK):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(spooled_path)
+            raise
+        digest = digest.hexdigest()
+        if not store:
+            return WebResponse(url, response.status_code, content_type, path=spooled_path, digest=digest, holders=holders), size
+        path = await asyncio.get_running_loop().run_in_executor(None, self.cache.put_body, digest, None, spooled_path)
+        return WebResponse(url, response.status_code, content_type, path=path, digest=digest), size
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            self._spool_dir = None
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_web_fetcher() -> WebFetcher:
+    """
+    The fetcher shared by every web loader.
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = WebFetcher(WebCache() if WEB_CACHE else None)
+        return _fetcher
+
+
+def close_web_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        fetcher, _fetcher = _fetcher, None
+    if fetcher is not None:
+        fetcher.close()
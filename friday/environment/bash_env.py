@@ -1,9 +1,122 @@
 import subprocess
 import os
+import signal
+import threading
+import time
+import uuid
+from queue import Queue, Empty
 from friday.core.schema import EnvState
 from friday.environment.env import Env
+from friday.environment.py_worker import list_dir
 from friday.action import get_os_version
 
+
+class ShellSession:
+    """
+    Long-lived shell driven over pipes.
+
+    Commands are eval'ed by the session's shell with stdin from /dev/null, so cd,
+    exported variables and shell variables carry over from one command to the next,
+    and a syntax error does not kill the shell. After each command the shell prints a
+    sentinel line with the exit code and the working directory on stdout and a
+    sentinel line on stderr, which delimit the output of the command. The shell is
+    restarted after a timeout or when a command exits it.
+    """
+
+    def __init__(self, working_dir, shell='/bin/bash'):
+        self.working_dir = working_dir
+        self.shell = shell
+        self.sentinel = f'__FRIDAY_{uuid.uuid4().hex}__'
+        self.process = None
+        self._stdout = None
+        self._stderr = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        args = [self.shell, '--noprofile', '--norc'] if os.path.basename(self.shell) == 'bash' else [self.shell]
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        cwd=self.working_dir, text=True, bufsize=1, start_new_session=True)
+        self._stdout = self._pump(self.process.stdout)
+        self._stderr = self._pump(self.process.stderr)
+
+    @staticmethod
+    def _pump(stream):
+        lines = Queue()
+
+        def read():
+            for line in stream:
+                lines.put(line)
+            lines.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+        return lines
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        self.process = None
+
+    @staticmethod
+    def _quote(command):
+        return "'" + command.replace("'", "'\\''") + "'"
+
+    def _script(self, command):
+        return (f"eval {self._quote(command)} < /dev/null\n"
+                f"printf '\\n%s %s %s\\n' '{self.sentinel}' \"$?\" \"$PWD\"\n"
+                f"printf '\\n%s\\n' '{self.sentinel}' >&2\n")
+
+    def _read_until_sentinel(self, lines, deadline):
+        output = []
+        while True:
+            line = lines.get(timeout=None if deadline is None else max(0.0, deadline - time.time()))
+            if line is None:
+                raise EOFError('The shell exited')
+            if line.startswith(self.sentinel):
+                # Drop the newline printed before the sentinel
+                return ''.join(output)[:-1], line[len(self.sentinel):].strip()
+            output.append(line)
+
+    def run(self, commands, timeout=None, cwd=None):
+        """
+        Run commands in one round-trip, from cwd when given, and return [(returncode, stdout, stderr, cwd), ...].
+        After a timeout or an exit of the shell, the remaining commands are not run.
+        """
+        with self._lock:
+            script = ''.join(self._script(command) for command in commands)
+            if cwd is not None and cwd != self.working_dir:
+                self.working_dir = cwd
+                if self.alive:
+                    script = f"cd {self._quote(cwd)} < /dev/null\n" + script
+            if not self.alive:
+                self.start()
+            self.process.stdin.write(script)
+            self.process.stdin.flush()
+            deadline = time.time() + timeout if timeout else None
+            results = []
+            for _ in commands:
+                try:
+                    stdout, status = self._read_until_sentinel(self._stdout, deadline)
+                    stderr, _ = self._read_until_sentinel(self._stderr, deadline)
+                except (Empty, EOFError) as e:
+                    self.close()
+                    error = 'Timeout' if isinstance(e, Empty) else str(e)
+                    results.append((None, '', f'{error}, the shell session was restarted', self.working_dir))
+                    break
+                returncode, _, cwd = status.partition(' ')
+                self.working_dir = cwd
+                results.append((int(returncode), stdout, stderr, cwd))
+            return results
+
+
 class BashEnv(Env):
     """Base class for all actions.
 
@@ -18,13 +131,43 @@ class BashEnv(Env):
         super().__init__()
         self._name: str = self.__class__.__name__
         self.os_name = get_os_version.get_os_name()
+        # Windows has no persistent session, every command runs in a fresh cmd.exe
+        self.session = ShellSession(self.working_dir) if self.os_name != 'windows' else None
 
     def step(self, _command) -> EnvState:
+        if self.session is None:
+            return self._subprocess_step(_command)
+        return self.step_batch([_command])[0]
+
+    def step_batch(self, commands) -> list[EnvState]:
+        """
+        Run several commands in one round-trip to the shell session, one EnvState per command.
+        """
+        if self.session is None:
+            return [self._subprocess_step(command) for command in commands]
+        results = self.session.run(commands, self.timeout, self.working_dir)
+        states = []
+        for command, (returncode, stdout, stderr, cwd) in zip(commands, results):
+            self.env_state = EnvState(command=command)
+            if returncode == 0:
+                self.env_state.result = stdout.strip()
+            else:
+                self.env_state.result = stdout.strip() or None
+                self.env_state.error = stderr
+            self.env_state.pwd = cwd
+            self.working_dir = cwd
+            self.env_state.ls = list_dir(cwd)
+            states.append(self.env_state)
+        for command in commands[len(results):]:
+            states.append(EnvState(command=command, error='Not run, the shell session was restarted', pwd=self.working_dir, ls=list_dir(self.working_dir)))
+        return states
+
+    def _subprocess_step(self, _command) -> EnvState:
         self.env_state = EnvState(command=_command)
         if self.os_name == 'windows':
-            _command = _command() + ' & cd'
+            _command = _command + ' & cd'
         else:
-            _command = _command() + ' && pwd'
+            _command = _command + ' && pwd'
 
         try:
             results = subprocess.run(_command, capture_output=True, check=True, cwd=self.working_dir,
@@ -43,6 +186,9 @@ class BashEnv(Env):
 
     def reset(self):
         self.working_dir = os.path.abspath(os.path.join(__file__, "..", "..", "..", "working_dir"))
+        if self.session is not None:
+            self.session.close()
+            self.session = ShellSession(self.working_dir)
 
     def observe(self, pwd):
         self.env_state.pwd = pwd
@@ -50,7 +196,7 @@ class BashEnv(Env):
         if self.os_name == 'windows':
             self.env_state.ls = subprocess.run(['cmd.exe', '/c', 'dir'], cwd=self.working_dir, capture_output=True, text=True).stdout
         else:
-            self.env_state.ls = subprocess.run(['ls'], cwd=self.working_dir, capture_output=True, text=True).stdout
+            self.env_state.ls = list_dir(self.working_dir)
 
 if __name__ == '__main__':
     env = BashEnv()
@@ -61,4 +207,4 @@ if __name__ == '__main__':
     # print(env.step("gogo"))
     # env.reset()
     # print(env.step("sleep 3")) # for macOS and Linux
-    # print(env.step("timeout /t 3")) # for Windows
\ No newline at end of file
+    # print(env.step("timeout /t 3")) # for Windows
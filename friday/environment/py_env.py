@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import subprocess
 import os
+import threading
 from friday.core.schema import EnvState
 from friday.environment.env import Env
+from friday.environment.py_worker import PythonWorkerPool, list_dir
 from tempfile import NamedTemporaryFile
+from utils.tracing import span
 from friday.action import get_os_version
 
 class PythonEnv(Env):
@@ -17,12 +20,62 @@ class PythonEnv(Env):
             be class name. Defaults to None.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, working_dir: str = None, worker_pool: PythonWorkerPool = None) -> None:
         super().__init__()
         self._name: str = self.__class__.__name__
         self.os_name = get_os_version.get_os_name()
+        if working_dir is not None:
+            self.working_dir = os.path.abspath(working_dir)
+            os.makedirs(self.working_dir, exist_ok=True)
+        self.default_working_dir = self.working_dir
+        # Actions may be executed from several scheduler threads; steps share the env state and working dir and are serialized.
+        self._step_lock = threading.Lock()
+        # Warm interpreters that fork a fresh child per snippet, fork is not available on Windows.
+        # Environments of concurrent tasks may share one pool.
+        self.worker_pool = worker_pool
+        # A pool passed in belongs to its creator and is not closed with this environment
+        self._owns_pool = worker_pool is None
+        if self.worker_pool is None and self.os_name != 'windows' and os.getenv('PYTHON_ENV_WORKERS', '2') != '0':
+            self.worker_pool = PythonWorkerPool(size=int(os.getenv('PYTHON_ENV_WORKERS', '2')), cwd=self.working_dir)
 
     def step(self, _command: str, args: list[str] | str = []) -> EnvState:
+        with span('env.step', pooled=self.worker_pool is not None) as s:
+            env_state = self._step(_command, args)
+            s.set_attribute('error', env_state.error is not None)
+        return env_state
+
+    def _step(self, _command: str, args: list[str] | str = []) -> EnvState:
+        if isinstance(args, str):
+            args = args.split()  # Convert space-separated string to a list
+        if self.worker_pool is None:
+            with self._step_lock:
+                return self._subprocess_step(_command, args)
+
+        # The step runs in and may change the shared working dir, so steps of concurrent subtasks
+        # run one after the other, like in the subprocess path. Environments of different tasks share
+        # the worker pool and still run in parallel.
+        with self._step_lock:
+            env_state = EnvState(command=_command)
+            working_dir = self.working_dir
+            pwd, ls = working_dir, None
+            try:
+                reply = self.worker_pool.run(_command.strip(), working_dir, os.path.join(working_dir, 'friday_step.py'), args, self.timeout)
+                if reply['returncode'] == 0:
+                    env_state.result = reply['stdout'].strip()
+                    pwd = reply['cwd']
+                else:
+                    env_state.error = reply['stderr']
+                if reply['cwd'] == pwd:
+                    ls = reply['ls']
+            except Exception as e:
+                env_state.error = repr(e)
+            env_state.pwd = pwd
+            env_state.ls = ls if ls is not None else list_dir(pwd)
+            self.working_dir = pwd
+            self.env_state = env_state
+        return env_state
+
+    def _subprocess_step(self, _command: str, args: list[str] = []) -> EnvState:
         tmp_code_file = NamedTemporaryFile("w", dir=self.working_dir, suffix=".py", encoding="utf-8", delete=False)
         # Solving the issue of not being able to retrieve the current working directory of the last line of output
         _command = _command.strip() + "\n" + "import os" + "\n" + "print(os.getcwd())"
@@ -30,9 +83,6 @@ class PythonEnv(Env):
         tmp_code_file.close()
         filename = tmp_code_file.name
 
-        if isinstance(args, str):
-            args = args.split()  # Convert space-separated string to a list
-
         self.env_state = EnvState(command=_command)
 
         try:
@@ -73,7 +123,11 @@ class PythonEnv(Env):
         return self.env_state
 
     def reset(self):
-        self.working_dir = os.path.abspath(os.path.join(__file__, "..", "..", "..", "working_dir"))
+        self.working_dir = self.default_working_dir
+
+    def close(self):
+        if self.worker_pool is not None and self._owns_pool:
+            self.worker_pool.close()
 
     def observe(self, pwd):
         self.env_state.pwd = pwd
@@ -0,0 +1,276 @@
+"""
+Warm python worker used by PythonEnv.
+
+The worker is started once with the commonly used modules already imported, then
+reads one JSON request per line from stdin. Each request is executed in a child
+forked from the worker, so every snippet still gets a fresh interpreter state while
+skipping interpreter startup and imports. The reply is one JSON line on stdout with
+the exit code, stdout, stderr, the final working directory and its listing.
+A request may set CPU time and memory limits, which only apply to its child.
+
+Only standard library modules may be imported here, the file is run by path.
+"""
+import importlib
+import json
+import linecache
+import os
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+from queue import Queue
+
+DEFAULT_PRELOAD = "os,sys,re,json,glob,shutil,subprocess,datetime,pathlib,numpy,pandas,requests"
+
+# Duplicate of the worker's original stdout, replies are written here only
+_protocol = None
+
+
+def list_dir(path):
+    """
+    Same output as running `ls` without a tty: visible entries sorted one per line.
+    """
+    try:
+        names = sorted(name for name in os.listdir(path) if not name.startswith('.'))
+    except OSError:
+        return ''
+    return ''.join(name + '\n' for name in names)
+
+
+def _run_child(request, stdout_file, stderr_file):
+    """
+    Executed in the forked child, never returns.
+    """
+    _protocol.close()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(stdout_file.fileno(), 1)
+    os.dup2(stderr_file.fileno(), 2)
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', encoding='utf-8', closefd=False)
+    sys.stderr = open(2, 'w', encoding='utf-8', closefd=False)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    exit_code = 0
+    try:
+        # Unix only, like the forking worker itself, the module stays importable on Windows
+        import resource
+        limits = request.get('limits') or {}
+        if limits.get('cpu_seconds'):
+            resource.setrlimit(resource.RLIMIT_CPU, (limits['cpu_seconds'], limits['cpu_seconds'] + 1))
+        if limits.get('memory_mb'):
+            memory = limits['memory_mb'] * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        cwd = request['cwd']
+        os.chdir(cwd)
+        sys.argv = [request['filename']] + request.get('args', [])
+        sys.path[0] = cwd
+        # Tracebacks show the snippet lines as if it had been run from a file
+        linecache.cache[request['filename']] = (len(request['code']), None, request['code'].splitlines(True), request['filename'])
+        code = compile(request['code'], request['filename'], 'exec')
+        exec(code, {'__name__': '__main__', '__file__': request['filename'], '__builtins__': __builtins__})
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        # Skip this frame so the traceback starts at the snippet like a script run
+        _, value, tb = sys.exc_info()
+        traceback.print_exception(type(value), value, tb.tb_next)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            with open(request['cwd_file'], 'w') as f:
+                f.write(os.getcwd())
+        except BaseException:
+            pass
+    os._exit(exit_code)
+
+
+def handle(request):
+    # The cwd file is created and removed by the pool, also when it kills this worker
+    cwd_file = request['cwd_file']
+    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        pid = os.fork()
+        if pid == 0:
+            _run_child(request, stdout_file, stderr_file)
+        _, status = os.waitpid(pid, 0)
+        exit_code = os.waitstatus_to_exitcode(status)
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        with open(cwd_file) as f:
+            cwd = f.read() or request['cwd']
+        stderr = stderr_file.read().decode('utf-8', errors='replace')
+        if exit_code < 0:
+            # e.g. SIGXCPU once the CPU time limit is reached
+            stderr += f"Killed by {signal.Signals(-exit_code).name}\n"
+        return {
+            "returncode": exit_code,
+            "stdout": stdout_file.read().decode('utf-8', errors='replace'),
+            "stderr": stderr,
+            "cwd": cwd,
+            "ls": list_dir(cwd)
+        }
+
+
+def serve(preload):
+    global _protocol
+    # Keep stray prints of preloaded modules out of the reply stream
+    _protocol = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass
+    out = _protocol
+    out.write(json.dumps({"ready": True}) + '\n')
+    out.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            reply = handle(json.loads(line))
+        except Exception:
+            reply = {"returncode": 1, "stdout": "", "stderr": traceback.format_exc(), "cwd": None, "ls": ""}
+        out.write(json.dumps(reply) + '\n')
+        out.flush()
+
+
+class PythonWorker:
+    """
+    Handle to one warm worker process.
+    """
+
+    def __init__(self, python_executable, env, preload, cwd, start_timeout=60):
+        self.start_timeout = start_timeout
+        self.ready = False
+        self.process = subprocess.Popen(
+            [python_executable, '-B', os.path.abspath(__file__)] + list(preload),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=cwd,
+            env=env,
+            start_new_session=True
+        )
+        self._buffer = b''
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def _read_line(self, timeout):
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                raise subprocess.TimeoutExpired(self.process.args, timeout)
+            data = os.read(fd, 1 << 16)
+            if not data:
+                raise RuntimeError("Python worker exited unexpectedly.")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def run(self, request, timeout):
+        if not self.ready:
+            self._read_line(self.start_timeout)
+            self.ready = True
+        self.process.stdin.write((json.dumps(request) + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+        return self._read_line(timeout)
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+
+
+class PythonWorkerPool:
+    """
+    Up to a fixed number of warm workers, started on first use. A worker that times out
+    or dies is killed together with the snippet it runs and replaced by a fresh one.
+    """
+
+    def __init__(self, size=2, preload=None, cwd=None, start_timeout=60):
+        self.size = max(1, size)
+        self.preload = preload if preload is not None else DEFAULT_PRELOAD.split(',')
+        self.cwd = cwd or os.getcwd()
+        self.start_timeout = start_timeout
+        self.python_executable = shutil.which('python') or sys.executable
+        self.env = os.environ.copy()
+        self.env["PYTHONPATH"] = os.getcwd()
+        self._idle = Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        # Workers started so far, at most size
+        self._started = 0
+
+    def _spawn(self):
+        worker = PythonWorker(self.python_executable, self.env, self.preload, self.cwd, self.start_timeout)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker):
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def run(self, code, cwd, filename, args=None, timeout=1000, limits=None):
+        """
+        Execute code in a warm worker and return its reply dict.
+        limits may set the 'cpu_seconds' and 'memory_mb' of the snippet.
+        Raises subprocess.TimeoutExpired when the snippet runs longer than timeout.
+        """
+        with self._lock:
+            start = self._idle.empty() and self._started < self.size
+            if start:
+                self._started += 1
+        worker = self._spawn() if start else self._idle.get()
+        cwd_fd, cwd_file = tempfile.mkstemp(prefix='friday_cwd_')
+        os.close(cwd_fd)
+        try:
+            if not worker.alive:
+                self._retire(worker)
+                worker = self._spawn()
+            request = {"code": code, "cwd": cwd, "filename": filename, "args": args or [], "limits": limits, "cwd_file": cwd_file}
+            try:
+                return worker.run(request, timeout)
+            except subprocess.TimeoutExpired:
+                raise subprocess.TimeoutExpired([self.python_executable, '-B', filename] + (args or []), timeout) from None
+        except BaseException:
+            self._retire(worker)
+            worker = self._spawn()
+            raise
+        finally:
+            self._idle.put(worker)
+            try:
+                os.unlink(cwd_file)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            self._retire(worker)
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1:])
@@ -1,9 +1,17 @@
 import argparse
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from utils.logger import Logger
+from utils.tracing import tracer, trace, current_trace_id
 from friday.agent.friday_agent import FridayAgent
 from friday.core.friday_executor import FridayExecutor
+from friday.core.action_scheduler import ActionScheduler
+from friday.environment.py_env import PythonEnv
 from vision.core.vision import Vision
+from vision.grounding.http_client import close_grounding_client
 
 import dotenv
 
@@ -17,68 +25,210 @@ def main():
     parser.add_argument('--logging_filename', type=str, default='temp.log', help='log file name')
     parser.add_argument('--logging_prefix', type=str, default=Logger.random_string(4), help='log file prefix')
     parser.add_argument('--score', type=int, default=8, help='critic score > score => store the tool')
+    parser.add_argument('--max_workers', type=int, default=4, help='max number of independent subtasks executed concurrently')
+    parser.add_argument('--batch_file', type=str, default='', help='JSONL file of tasks ({"task_id": ..., "query": ..., "query_file_path": ...} per line), runs them in batch mode')
+    parser.add_argument('--batch_output', type=str, default='', help='JSONL file the batch results are appended to, defaults to <logging_filedir>/batch_results.jsonl')
+    parser.add_argument('--batch_concurrency', type=int, default=4, help='max number of batch tasks executed concurrently')
+    parser.add_argument('--batch_working_dir', type=str, default='working_dir/batch', help='parent of the isolated working dir of each batch task')
+    parser.add_argument('--speculative', action='store_true', help='prepare the subtasks unblocked by a Code subtask while its judge call is in flight')
+    parser.add_argument('--trace_file', type=str, default='', help='JSONL file the trace spans and per-task summaries are appended to, defaults to <logging_filedir>/trace.jsonl')
     args = parser.parse_args()
 
     if args.logging_filedir != 'log' and os.path.exists(args.logging_filedir):
         return
 
     logging_logger = Logger(log_dir=args.logging_filedir, log_filename=args.logging_filename, log_prefix=args.logging_prefix)
-    friday_agent = FridayAgent(config_path=args.config_path, action_lib_dir=args.action_lib_path, logger=logging_logger)
-    planning_agent = friday_agent.planner
-    executor = FridayExecutor(planning_agent, friday_agent.executor, friday_agent.retriever, logging_logger, args.score)
-    vision_executor = Vision(logger=logging_logger)
+    tracer.configure(args.trace_file or os.path.join(args.logging_filedir, 'trace.jsonl'))
+    try:
+        if args.batch_file:
+            run_batch(args, logging_logger)
+            return
+
+        friday_agent = FridayAgent(config_path=args.config_path, action_lib_dir=args.action_lib_path, logger=logging_logger)
+        planning_agent = friday_agent.planner
+        executor = FridayExecutor(planning_agent, friday_agent.executor, friday_agent.retriever, logging_logger, args.score, args.speculative)
+        vision_executor = Vision(logger=logging_logger)
+
+        task = format_task(args.query, args.query_file_path)
+        try:
+            run_task(task, planning_agent, executor, vision_executor, logging_logger, args.logging_filedir, args.max_workers)
+        finally:
+            executor.close()
+            friday_agent.environment.close()
+    finally:
+        close_grounding_client()
+
+
+def format_task(query, query_file_path=''):
+    task = 'Your task is: {0}'.format(query)
+    if query_file_path != '':
+        task = task + '\nThe path of the files you need to use: {0}'.format(query_file_path)
+    return task
 
-    task = 'Your task is: {0}'.format(args.query)
-    if args.query_file_path != '':
-        task = task + '\nThe path of the files you need to use: {0}'.format(args.query_file_path)
-    
+
+def run_task(task, planning_agent, executor, vision_executor, logging_logger, logging_filedir, max_workers, vision_lock=None):
+    """
+    Plan the task and execute its subtasks until the action graph is done.
+    Return (completed, final_result).
+    """
+    with trace('task', task=task) as root:
+        trace_id = current_trace_id()
+        completed, final_result = execute_plan(task, planning_agent, executor, vision_executor, logging_logger, logging_filedir, max_workers, vision_lock)
+        root.set_attribute('completed', completed)
+    stages = tracer.write_summary(trace_id, task=task, completed=completed)
+    if stages:
+        logging_logger.info(json.dumps(stages, indent=2), title='Trace Summary', color='green')
+    return completed, final_result
+
+
+def execute_plan(task, planning_agent, executor, vision_executor, logging_logger, logging_filedir, max_workers, vision_lock=None):
+    final_result = ''
     executor.plan_task(task)
     planed = 1
+    scheduler = ActionScheduler(planning_agent, max_workers)
+    failed_action = None
+
+    try:
+        # iter each subtask, dispatching every ready non-vision subtask concurrently
+        while planning_agent.execute_list or not scheduler.idle:
+            finished = []
+            if failed_action is None:
+                for action in scheduler.ready_actions():
+                    if scheduler.full:
+                        break
+                    action_node = planning_agent.action_node[action] # action_node: name, description, return_val, relevant_code, next_action, status, type, detail
+                    type = action_node.type # '{"open_google_chrome": {"description": "Execute a system command to open Google Chrome on macOS.", "return_val": ["\\nNone\\n"]}}'
+                    if type == 'Vision':
+                        # Vision subtasks drive the shared screen, so they only run when nothing else is in flight
+                        if scheduler.idle:
+                            finished.append((action, run_vision_actions(task, action, planning_agent, vision_executor, logging_logger, vision_lock)))
+                        break
+                    with planning_agent.graph_lock:
+                        pre_tasks_info = planning_agent.get_pre_tasks_info(action)
+                    logging_logger.info("The current subtask is: {subtask}".format(subtask=action_node.description), title=f'Current {type} Task', color='red')
+                    scheduler.submit(action, executor.execute_task, task, action, action_node, pre_tasks_info)
+
+            if not finished:
+                if scheduler.idle:
+                    if failed_action is not None:
+                        # every in-flight subtask has settled, replan from the failed one
+                        with planning_agent.graph_lock:
+                            if failed_action in planning_agent.execute_list:
+                                planning_agent.execute_list.remove(failed_action)
+                                planning_agent.execute_list.insert(0, failed_action)
+                            executor.plan_task(task, replan=True)
+                        planed += 1
+                        failed_action = None
+                        continue
+                    if not scheduler.ready_actions():
+                        logging_logger.error("No executable subtask left, the action graph may contain a cycle.")
+                        break
+                    continue
+                finished = scheduler.wait()
+
+            for action, return_val in finished:
+                type = planning_agent.action_node[action].type
+                if return_val[0] == 'fail' and planed < 3:
+                    # planning_agent.redecompose_task(task, action)
+                    if failed_action is None:
+                        failed_action = action
+                elif return_val[0] == 'replan':
+                    continue
+                elif return_val[0] == 'success':
+                    _, result, relevant_code = return_val
+                    print("Current task execution completed!!!")
+
+                    if result != None and result != '':
+                        with open(os.path.join(logging_filedir, 'result.txt'), 'a') as f:
+                            f.write(f'{action}: {result} \n')
+                        with open(os.path.join(logging_filedir, 'final_result.txt'), 'w') as f:
+                            f.write(f'{action}: {result.strip()} \n')
+                        final_result = f'{action}: {result.strip()}'
+                    with planning_agent.graph_lock:
+                        planning_agent.update_action(action, result, relevant_code, True, type)
+                        planning_agent.execute_list.remove(action)
+    finally:
+        # a subtask that raised must not leave the scheduler's workers running
+        scheduler.shutdown()
+    return not planning_agent.execute_list, final_result
+
+
+def run_batch(args, logging_logger):
+    """
+    Run every task of the batch file concurrently over shared, already initialized components.
+    Each task gets its own planner, log dir and working dir; results are streamed to the output JSONL.
+    """
+    with open(args.batch_file) as f:
+        batch = [json.loads(line) for line in f if line.strip()]
+    batch_output = args.batch_output or os.path.join(args.logging_filedir, 'batch_results.jsonl')
+
+    shared_agent = FridayAgent(config_path=args.config_path, action_lib_dir=args.action_lib_path, logger=logging_logger)
+    vision_executor = Vision(logger=logging_logger)
+    # There is only one screen, vision subtasks of different tasks must not interleave
+    vision_lock = threading.Lock()
+    output_lock = threading.Lock()
+
+    def run_one(index, item, output):
+        task_id = str(item.get('task_id', index))
+        task_log_dir = os.path.join(args.logging_filedir, task_id)
+        task_logger = Logger(log_dir=task_log_dir, log_filename=args.logging_filename, log_prefix=f'{args.logging_prefix}-{task_id}')
+        environment = PythonEnv(working_dir=os.path.join(args.batch_working_dir, task_id), worker_pool=shared_agent.environment.worker_pool)
+        friday_agent = FridayAgent(config_path=args.config_path, logger=task_logger, llm=shared_agent.llm, action_lib=shared_agent.action_lib, environment=environment)
+        executor = FridayExecutor(friday_agent.planner, friday_agent.executor, friday_agent.retriever, task_logger, args.score, args.speculative)
+
+        record = {"task_id": task_id, "query": item.get('query')}
+        start = time.time()
+        try:
+            task = format_task(item['query'], item.get('query_file_path', ''))
+            completed, result = run_task(task, friday_agent.planner, executor, vision_executor, task_logger, task_log_dir, args.max_workers, vision_lock)
+            record["status"] = 'success' if completed else 'fail'
+            record["result"] = result
+        except Exception as e:
+            task_logger.error(repr(e), title='Batch Task Error')
+            record["status"] = 'error'
+            record["error"] = repr(e)
+        finally:
+            executor.close()
+        record["elapsed"] = round(time.time() - start, 3)
+        with output_lock:
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+        logging_logger.info(f"{task_id}: {record['status']} in {record['elapsed']}s", title='Batch Task Finished', color='green')
+
+    try:
+        with open(batch_output, 'a') as output, ThreadPoolExecutor(max_workers=max(1, args.batch_concurrency)) as pool:
+            futures = [pool.submit(run_one, index, item, output) for index, item in enumerate(batch)]
+            for future in futures:
+                future.result()
+    finally:
+        # The task environments share the worker pool of the shared agent's environment
+        shared_agent.environment.close()
+
 
-    # iter each subtask
-    while planning_agent.execute_list:
-        overall_result = {}
-        action = planning_agent.execute_list[0] # name, str
-        action_node = planning_agent.action_node[action] # action_node: name, description, return_val, relevant_code, next_action, status, type, detail
-        description = action_node.description
+def run_vision_actions(task, action, planning_agent, vision_executor, logging_logger, vision_lock=None):
+    """
+    Execute the consecutive vision subtasks starting from action as one vision plan.
+    """
+    with planning_agent.graph_lock:
+        action_node = planning_agent.action_node[action]
         pre_tasks_info = planning_agent.get_pre_tasks_info(action)
-        type = planning_agent.action_node[planning_agent.execute_list[0]].type # '{"open_google_chrome": {"description": "Execute a system command to open Google Chrome on macOS.", "return_val": ["\\nNone\\n"]}}'
-        logging_logger.info("The current subtask is: {subtask}".format(subtask=description), title=f'Current {type} Task', color='red')
-        
-        if type == 'Vision':
-            actions = []
-            action_nodes = []
-            for execute_action in planning_agent.execute_list:
-                print(execute_action)
-                if planning_agent.action_node[execute_action].type == 'Vision':
-                    actions.append(execute_action)
-                    action_nodes.append(planning_agent.action_node[execute_action])
-                else:
-                    break
-            for execute_action in actions:
-                planning_agent.execute_list.remove(execute_action)
-            planning_agent.execute_list.insert(0, action)
-            return_val = vision_executor.global_execute(task, actions, action_nodes, pre_tasks_info)
-        else:
-            return_val = executor.execute_task(task, action, action_node, pre_tasks_info)
-        
-        if return_val[0] == 'fail' and planed < 3:
-            # planning_agent.redecompose_task(task, action)
-            executor.plan_task(task, replan=True)
-            planed += 1
-        elif return_val[0] == 'replan':
-            continue
-        elif return_val[0] == 'success':
-            _, result, relevant_code = return_val
-            print("Current task execution completed!!!")
-            
-            if result != None and result != '':
-                with open(os.path.join(args.logging_filedir, 'result.txt'), 'a') as f:
-                    f.write(f'{action}: {result} \n')
-                with open(os.path.join(args.logging_filedir, 'final_result.txt'), 'w') as f:
-                    f.write(f'{action}: {result.strip()} \n')
-            planning_agent.update_action(action, result, relevant_code, True, type)
-            planning_agent.execute_list.remove(action)
+        logging_logger.info("The current subtask is: {subtask}".format(subtask=action_node.description), title='Current Vision Task', color='red')
+        actions = []
+        action_nodes = []
+        for execute_action in planning_agent.execute_list[planning_agent.execute_list.index(action):]:
+            print(execute_action)
+            if planning_agent.action_node[execute_action].type == 'Vision':
+                actions.append(execute_action)
+                action_nodes.append(planning_agent.action_node[execute_action])
+            else:
+                break
+        for execute_action in actions:
+            planning_agent.execute_list.remove(execute_action)
+        planning_agent.execute_list.insert(0, action)
+    if vision_lock is None:
+        return vision_executor.global_execute(task, actions, action_nodes, pre_tasks_info)
+    with vision_lock:
+        return vision_executor.global_execute(task, actions, action_nodes, pre_tasks_info)
 
 if __name__ == '__main__':
     dotenv.load_dotenv()
@@ -1,4 +1,6 @@
 import os
+import re
+import sys
 import time
 import pyautogui
 
@@ -90,6 +92,34 @@ class IOEnvironment():
             pyautogui.keyUp(key)
 
 
+    def type_text(self, text, interval=0.01):
+        """
+        Type a whole string at once instead of pressing its keys one by one.
+        ASCII text, newlines and tabs included, is written with pyautogui. A line with characters
+        pyautogui cannot type (non-ASCII) is pasted through the clipboard, its newlines and tabs
+        are still pressed as keys so that forms submit as before. The clipboard is not restored,
+        the target application may read the paste at any later time.
+        """
+        if not text:
+            return
+        if text.isascii():
+            pyautogui.write(text, interval=interval)
+            return
+        import pyperclip
+        for part in re.split(r'([\n\t])', text):
+            if part == '\n':
+                pyautogui.press('enter')
+            elif part == '\t':
+                pyautogui.press('tab')
+            elif part.isascii():
+                pyautogui.write(part, interval=interval)
+            else:
+                pyperclip.copy(part)
+                pyautogui.hotkey('command' if sys.platform == 'darwin' else 'ctrl', 'v')
+                # Let the application read the clipboard before it is replaced by a next part
+                time.sleep(.2)
+
+
     ALIASES_RIGHT_MOUSE = ['right', 'rightbutton', 'rightmousebutton', 'r', 'rbutton', 'rmouse', 'rightmouse', 'rm', 'mouseright', 'mouserightbutton']
     ALIASES_LEFT_MOUSE = ['left', 'leftbutton', 'leftmousebutton', 'l', 'lbutton', 'lmouse', 'leftmouse', 'lm', 'mouseleft', 'mouseleftbutton']
     ALIASES_CENTER_MOUSE = ['middle', 'middelbutton', 'middlemousebutton', 'm', 'mbutton', 'mmouse', 'middlemouse', 'center', 'c', 'centerbutton', 'centermouse', 'cm', 'mousecenter', 'mousecenterbutton']
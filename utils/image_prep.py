@@ -0,0 +1,129 @@
+"""
+Image preparation of screen frames before they are sent to a vision model.
+
+A frame is optionally cropped to a region of interest, downscaled so that its long
+side fits max_side and encoded as JPEG, WebP or PNG. Frames for the grounding model
+stay lossless and full resolution by default. The models answer in coordinates
+of the image they received, PreparedImage.to_screen maps them back to the screen.
+"""
+import io
+import os
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+from PIL import Image
+
+from utils.encode_image import encode_image_binary
+
+load_dotenv()
+# Long side in pixels of the images sent to the models, 0 keeps the full resolution
+VISION_IMAGE_MAX_SIDE = int(os.getenv('VISION_IMAGE_MAX_SIDE', 1280))
+# 'JPEG' or 'WEBP'
+VISION_IMAGE_FORMAT = os.getenv('VISION_IMAGE_FORMAT', 'JPEG').upper()
+VISION_IMAGE_QUALITY = int(os.getenv('VISION_IMAGE_QUALITY', 85))
+# Grounding gets lossless full-resolution frames unless downscaling is enabled here
+GROUNDING_IMAGE_MAX_SIDE = int(os.getenv('GROUNDING_IMAGE_MAX_SIDE', 0))
+# 'PNG', 'JPEG' or 'WEBP'
+GROUNDING_IMAGE_FORMAT = os.getenv('GROUNDING_IMAGE_FORMAT', 'PNG').upper()
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+
+
+class ImageSpec:
+    """
+    How to prepare an image for a model.
+
+    Attributes:
+        max_side (int): Long side of the prepared image in pixels, 0 or None keeps the resolution.
+        format (str): 'JPEG', 'WEBP' or 'PNG'.
+        quality (int): Encoder quality of JPEG and WebP.
+        roi (Tuple[int, int, int, int]): Optional (left, top, width, height) region of interest,
+            in screen coordinates relative to the monitor.
+    """
+
+    def __init__(self, max_side: int = VISION_IMAGE_MAX_SIDE, format: str = VISION_IMAGE_FORMAT, quality: int = VISION_IMAGE_QUALITY, roi: Tuple[int, int, int, int] = None) -> None:
+        if format.upper() not in MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {format}")
+        self.max_side = max_side or 0
+        self.format = format.upper()
+        self.quality = quality
+        self.roi = tuple(int(v) for v in roi) if roi is not None else None
+
+    @classmethod
+    def grounding(cls) -> 'ImageSpec':
+        """
+        The spec of the frames sent to the grounding model, see GROUNDING_IMAGE_*.
+        """
+        return cls(GROUNDING_IMAGE_MAX_SIDE, GROUNDING_IMAGE_FORMAT, VISION_IMAGE_QUALITY)
+
+    @property
+    def key(self) -> tuple:
+        return (self.max_side, self.format, self.quality, self.roi)
+
+    def with_roi(self, roi: Tuple[int, int, int, int]) -> 'ImageSpec':
+        return ImageSpec(self.max_side, self.format, self.quality, roi)
+
+
+class PreparedImage:
+    """
+    Encoded image sent to a model and the screen region it covers.
+
+    Attributes:
+        data (bytes): The encoded image.
+        mime_type (str): Its MIME type.
+        size (Tuple[int, int]): Width and height of the encoded image.
+        region (Dict[str, float]): 'left', 'top', 'width', 'height' of the covered screen region.
+    """
+
+    def __init__(self, data: bytes, mime_type: str, size: Tuple[int, int], region: Dict[str, float]) -> None:
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.region = region
+        self._base64 = None
+
+    @property
+    def file_name(self) -> str:
+        return 'image.' + self.mime_type.split('/')[1]
+
+    def base64(self, heading: bool = True) -> str:
+        if self._base64 is None:
+            self._base64 = encode_image_binary(self.data)
+        if heading:
+            return f"data:{self.mime_type};base64,{self._base64}"
+        return self._base64
+
+    def to_screen(self, x: float, y: float) -> Tuple[float, float]:
+        """
+        Map a point given as fractions (0-1) of the prepared image to screen coordinates.
+        """
+        return self.region['left'] + x * self.region['width'], self.region['top'] + y * self.region['height']
+
+
+def prepare_image(image: Image.Image, dimensions: Dict[str, int], spec: ImageSpec = None) -> PreparedImage:
+    """
+    Crop, downscale and encode a screenshot of the monitor of the given dimensions.
+    """
+    spec = spec or ImageSpec()
+    # Screenshots can have more pixels than screen points, e.g. on HiDPI displays
+    scale_x = image.width / dimensions['width']
+    scale_y = image.height / dimensions['height']
+    region = {'left': 0, 'top': 0, 'width': dimensions['width'], 'height': dimensions['height']}
+    if spec.roi is not None:
+        left, top, width, height = spec.roi
+        left, top = max(0, left), max(0, top)
+        width = max(1, min(width, dimensions['width'] - left))
+        height = max(1, min(height, dimensions['height'] - top))
+        region = {'left': left, 'top': top, 'width': width, 'height': height}
+        image = image.crop((round(left * scale_x), round(top * scale_y), round((left + width) * scale_x), round((top + height) * scale_y)))
+
+    if spec.max_side and max(image.size) > spec.max_side:
+        ratio = spec.max_side / max(image.size)
+        image = image.resize((max(1, round(image.width * ratio)), max(1, round(image.height * ratio))), Image.LANCZOS)
+
+    buffered = io.BytesIO()
+    if spec.format == 'PNG':
+        image.save(buffered, format='PNG')
+    else:
+        image.convert('RGB').save(buffered, format=spec.format, quality=spec.quality)
+    return PreparedImage(buffered.getvalue(), MIME_TYPES[spec.format], image.size, region)
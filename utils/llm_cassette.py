@@ -0,0 +1,119 @@
+"""
+Record/replay cassettes of OpenAI requests.
+
+With LLM_CASSETTE_MODE=record, the LLM clients append every request they send and the
+raw response they get to the JSONL cassette LLM_CASSETTE. The stub server
+(friday/core/llm_stub_server.py) replays a cassette through the OpenAI HTTP API, so
+pointing OPENAI_BASE_URL at it runs the framework offline and deterministically.
+
+Requests are matched on a hash of their model, messages and sampling parameters.
+Image parts only contribute their type to the hash since screenshots differ from run
+to run. Identical requests are answered in the order they were recorded.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+LLM_CASSETTE = os.getenv('LLM_CASSETTE', '')
+# 'record' appends to LLM_CASSETTE, anything else leaves it untouched
+LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', '')
+
+# Request fields that select the response, the other ones (stream, user...) are ignored
+KEY_FIELDS = ('model', 'messages', 'temperature', 'seed', 'max_tokens', 'input')
+
+
+def _normalize_content(content):
+    if isinstance(content, list):
+        return [part if part.get('type') == 'text' else {"type": part.get('type')} for part in content]
+    return content
+
+
+def make_key(endpoint, request):
+    """
+    Hash of the fields of request that select its response.
+    """
+    payload = {field: request[field] for field in KEY_FIELDS if request.get(field) is not None}
+    if 'messages' in payload:
+        payload['messages'] = [dict(message, content=_normalize_content(message.get('content'))) for message in payload['messages']]
+    encoded = json.dumps({"endpoint": endpoint, "request": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class Cassette:
+    """
+    JSONL file of {key, endpoint, request, response, latency} records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses = defaultdict(list)
+        self._replayed = defaultdict(int)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._responses[record['key']].append(record)
+
+    def __len__(self):
+        return sum(len(records) for records in self._responses.values())
+
+    def record(self, endpoint, request, response, latency=None):
+        """
+        Append a request and its raw response (a dict, e.g. ChatCompletion.model_dump()).
+        """
+        record = {
+            "key": make_key(endpoint, request),
+            "endpoint": endpoint,
+            "request": request,
+            "response": response,
+            "latency": latency,
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self._responses[record['key']].append(record)
+
+    def replay(self, endpoint, request):
+        """
+        Return the next recorded record of request, repeating the last one once they are
+        exhausted, or None when the request was never recorded.
+        """
+        key = make_key(endpoint, request)
+        with self._lock:
+            records = self._responses.get(key)
+            if not records:
+                return None
+            index = self._replayed[key]
+            self._replayed[key] += 1
+        return records[min(index, len(records) - 1)]
+
+    def rewind(self):
+        with self._lock:
+            self._replayed.clear()
+
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder():
+    """
+    The shared cassette the clients record to, or None when recording is off.
+    """
+    if LLM_CASSETTE_MODE != 'record' or not LLM_CASSETTE:
+        return None
+    with _recorders_lock:
+        if LLM_CASSETTE not in _recorders:
+            _recorders[LLM_CASSETTE] = Cassette(LLM_CASSETTE)
+        return _recorders[LLM_CASSETTE]
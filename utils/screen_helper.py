@@ -1,24 +1,126 @@
 from typing import Dict
 from mss import mss
 from PIL import Image
+import numpy as np
 from utils.logger import Logger
-from utils.encode_image import encode_image_binary, encode_single_data_to_base64
+from utils.image_prep import ImageSpec, PreparedImage, prepare_image
+from utils.tracing import span
+import io
+import itertools
 import os
+import threading
+import time
 from datetime import datetime
 
 
+class Frame:
+    """
+    One captured screen frame shared by every consumer of a vision step.
+
+    The PNG file and the prepared images (see utils/image_prep.py) are produced on
+    first use and kept, so a frame is written and encoded at most once per image
+    spec however many times it is read.
+    Item access ('image', 'dimensions', 'file_path', 'base64') is kept for callers
+    of the former dict returned by ScreenHelper.capture.
+
+    Attributes:
+        id (int): Monotonically increasing frame number of the ScreenHelper.
+        image (Image.Image): The captured screenshot.
+        dimensions (Dict[str, int]): 'left', 'top', 'width', 'height' of the monitor.
+        timestamp (float): time.monotonic() of the capture.
+        image_spec (ImageSpec): Default preparation of the images sent to the models.
+    """
+
+    def __init__(self, id: int, image: Image.Image, dimensions: Dict[str, int], directory: str, image_name: str = None, logger: Logger = None, image_spec: ImageSpec = None) -> None:
+        self.id = id
+        self.image = image
+        self.dimensions = dimensions
+        self.timestamp = time.monotonic()
+        self.directory = directory
+        self.image_name = image_name or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{id}.png"
+        self.logger = logger
+        self.image_spec = image_spec or ImageSpec()
+        self._file_path = None
+        self._prepared = {}
+        self._png_bytes = None
+        self._lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.timestamp
+
+    @property
+    def file_path(self) -> str:
+        """
+        Path of the frame saved as PNG, written on first access.
+        """
+        with self._lock:
+            if self._file_path is None:
+                file_path = os.path.join(self.directory, self.image_name)
+                with open(file_path, 'wb') as f:
+                    f.write(self._get_png_bytes())
+                self._file_path = file_path
+                if self.logger:
+                    self.logger.info(f"Screenshot saved to {file_path}")
+            return self._file_path
+
+    @property
+    def png_bytes(self) -> bytes:
+        with self._lock:
+            return self._get_png_bytes()
+
+    def _get_png_bytes(self) -> bytes:
+        if self._png_bytes is None:
+            buffered = io.BytesIO()
+            self.image.save(buffered, format="PNG")
+            self._png_bytes = buffered.getvalue()
+        return self._png_bytes
+
+    def prepare(self, spec: ImageSpec = None) -> PreparedImage:
+        """
+        The frame cropped, resized and encoded as described by spec, defaults to image_spec.
+        """
+        spec = spec or self.image_spec
+        with self._lock:
+            prepared = self._prepared.get(spec.key)
+            if prepared is None:
+                prepared = prepare_image(self.image, self.dimensions, spec)
+                self._prepared[spec.key] = prepared
+                if self.logger:
+                    self.logger.info(f"Frame {self.id} prepared as {prepared.mime_type} {prepared.size[0]}x{prepared.size[1]}, {len(prepared.data)} bytes")
+            return prepared
+
+    def base64(self, heading: bool = True, spec: ImageSpec = None) -> str:
+        """
+        The prepared frame in base64, prefixed with its data URI header when heading is True.
+        """
+        return self.prepare(spec).base64(heading)
+
+    def __getitem__(self, key):
+        if key == 'base64':
+            return self.base64()
+        if key in ('image', 'dimensions', 'file_path'):
+            return getattr(self, key)
+        raise KeyError(key)
+
+
 class ScreenHelper:
     """
     ScreenHelper is a utility class for capturing screen shots,
     retrieving dimensions of the screen shots, and saving screen shots to files.
 
+    Captured frames are cached for frame_ttl seconds, so the consumers of one
+    vision step (planner, grounding, judge) share a single grab and its encodings.
+    Call invalidate() after any input that changes the screen.
+
     Attributes:
         logger (Optional[logging.Logger]): An optional logger for logging operations.
         monitor (int): The index of the monitor to capture.
         sct (mss.mss): The MSS context for capturing the screen.
+        frame_ttl (float): Seconds a captured frame is reused for.
     """
 
-    def __init__(self, logger: Logger = None, monitor: int = 1, path: str = "./working_dir/screenshot") -> None:
+    def __init__(self, logger: Logger = None, monitor: int = 1, path: str = "./working_dir/screenshot", frame_ttl: float = 1.0, image_spec: ImageSpec = None) -> None:
         """
         Initializes the ScreenHelper instance.
 
@@ -26,42 +128,102 @@ class ScreenHelper:
             logger (Optional[logging.Logger]): An optional logger instance for logging.
             monitor (int): The index of the monitor to capture (1-based).
             path (str): The file path where the screenshot will be saved.
+            frame_ttl (float): Seconds a captured frame is reused for, 0 disables the cache.
+            image_spec (ImageSpec, optional): Default preparation of the images sent to the models.
         """
         self.sct = mss()
         self.monitor = monitor
         self.path = path
+        self.frame_ttl = frame_ttl
+        self.image_spec = image_spec or ImageSpec()
+        self._frame = None
+        self._frame_ids = itertools.count(1)
+        self._lock = threading.Lock()
         if not os.path.exists(self.path):
             os.makedirs(self.path)
         self.logger = logger
         if logger:
             self.logger.info(f"ScreenHelper initialized for monitor {monitor}")
     
-    def capture(self, heading = True, image_name: str = str(datetime.now().strftime("%Y%m%d_%H%M%S")) + '.png') -> Dict:
+    def capture(self, image_name: str = None, max_age: float = None) -> Frame:
         """
-        Captures a screenshot of the specified monitor and returns it as a PIL Image.
+        Returns the current frame of the specified monitor, reusing the last capture
+        when it is younger than max_age (defaults to frame_ttl) seconds.
+
+        Args:
+            image_name (str, optional): File name used when the frame is saved.
+            max_age (float, optional): Maximum age in seconds of a reused frame.
 
         Returns:
-            Image.Image: The captured screenshot as a PIL Image object.
+            Frame: The captured frame with its lazily computed file and encodings.
         """
-        
-        captured = [self.capture_screenshot(), self.get_screenshot_dimensions()]
-        
-        if image_name:
-            captured.append(self.save_image(image_name, captured[0]))
-        
-        captured.append(encode_single_data_to_base64(captured[0], heading=heading))
-        
-        captured = {
-            'image': captured[0],
-            'dimensions': captured[1],
-            'file_path': captured[2],
-            'base64': captured[3]
-        }
+        max_age = self.frame_ttl if max_age is None else max_age
+        with span('vision.capture') as s, self._lock:
+            frame = self._frame
+            if frame is not None and frame.age <= max_age and image_name is None:
+                s.set_attributes(cached=True, frame=frame.id)
+                return frame
+            frame = Frame(next(self._frame_ids), self.capture_screenshot(), self.get_screenshot_dimensions(), self.path, image_name, self.logger, self.image_spec)
+            self._frame = frame
+            s.set_attributes(cached=False, frame=frame.id)
 
         if self.logger:
-            self.logger.info("Screenshot captured")
+            self.logger.info(f"Frame {frame.id} captured")
+
+        return frame
+
+    def wait_until_stable(self, timeout: float = 5.0, min_settle: float = 0.5, interval: float = 0.1, threshold: float = 0.005, initial_delay: float = 0.2, thumbnail_size=(160, 90)) -> bool:
+        """
+        Blocks until the screen stops changing, e.g. after a click or while a page loads.
 
-        return captured
+        Frames are compared as downscaled grayscale thumbnails. The screen is stable once
+        the mean absolute difference between consecutive thumbnails stays below threshold
+        for min_settle seconds. The last grabbed frame becomes the cached frame.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+            min_settle (float): Seconds without change required to consider the screen stable.
+            interval (float): Seconds between two grabs.
+            threshold (float): Mean absolute pixel difference (0-1) still counted as no change.
+            initial_delay (float): Seconds to wait before the first grab, so the input has an effect.
+            thumbnail_size (tuple): Size of the compared thumbnails.
+
+        Returns:
+            bool: True if the screen settled, False on timeout.
+        """
+        time.sleep(initial_delay)
+        deadline = time.monotonic() + timeout
+        previous = None
+        stable_since = None
+        stable = False
+        while True:
+            image = self.capture_screenshot()
+            thumbnail = np.asarray(image.convert('L').resize(thumbnail_size, Image.BILINEAR), dtype=np.float32) / 255
+            now = time.monotonic()
+            if previous is not None and np.abs(thumbnail - previous).mean() <= threshold:
+                stable_since = stable_since or now
+                if now - stable_since >= min_settle:
+                    stable = True
+                    break
+            else:
+                stable_since = None
+            previous = thumbnail
+            if now >= deadline:
+                break
+            time.sleep(max(0.0, min(interval, deadline - now)))
+
+        with self._lock:
+            self._frame = Frame(next(self._frame_ids), image, self.get_screenshot_dimensions(), self.path, logger=self.logger, image_spec=self.image_spec)
+        if self.logger:
+            self.logger.info(f"Screen {'settled' if stable else 'still changing'} after waiting, frame {self._frame.id}")
+        return stable
+
+    def invalidate(self) -> None:
+        """
+        Drops the cached frame, the next capture grabs the screen again.
+        """
+        with self._lock:
+            self._frame = None
 
     def capture_screenshot(self) -> Image.Image:
         """
@@ -0,0 +1,138 @@
+"""
+Shared token accounting for the OpenAI models.
+
+Encoders are loaded once per model. Every BPE token covers at least one byte, so
+the UTF-8 length of a text is an upper bound of its token count: budget checks of
+short texts never need to encode, and long texts are only encoded up to the budget.
+"""
+import math
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_MODEL = 'gpt-4-1106-preview'
+# Average UTF-8 bytes per cl100k token on English text, used for estimates only
+APPROX_BYTES_PER_TOKEN = 4
+# Characters of text encoded per budget token when truncating, grown when too short
+TRUNCATE_WINDOW_CHARS_PER_TOKEN = 8
+TRUNCATION_MARKER = '\n...[truncated]...\n'
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Returns the memoized encoding of model, cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def encode(text: str, model: str = DEFAULT_MODEL) -> list:
+    # Special token strings found in pages or prompts are counted as plain text
+    return get_encoding(model).encode(text, disallowed_special=())
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Returns the exact number of tokens in a text string."""
+    return len(encode(text, model))
+
+
+def approx_tokens(text: str) -> int:
+    """Returns a cheap estimate of the number of tokens from the UTF-8 length."""
+    return math.ceil(len(text.encode('utf-8')) / APPROX_BYTES_PER_TOKEN)
+
+
+def _bytes_within(text: str, budget: int) -> bool:
+    # At most budget bytes implies at most budget tokens
+    return len(text) <= budget and len(text.encode('utf-8')) <= budget
+
+
+def within_budget(text: str, budget: int, model: str = DEFAULT_MODEL) -> bool:
+    """Returns whether text has at most budget tokens, encoding at most a window proportional to the budget."""
+    return _bytes_within(text, budget) or len(truncate_to_budget(text, budget, model)) == len(text)
+
+
+def truncate_to_budget(text: str, budget: int, model: str = DEFAULT_MODEL) -> str:
+    """
+    Returns the longest prefix of text with at most budget tokens.
+    Only a window of the text proportional to the budget is encoded, never the whole text.
+    """
+    if budget <= 0:
+        return ''
+    if _bytes_within(text, budget):
+        return text
+    encoding = get_encoding(model)
+    window = budget * TRUNCATE_WINDOW_CHARS_PER_TOKEN
+    while True:
+        tokens = encoding.encode(text[:window], disallowed_special=())
+        if len(tokens) > budget or window >= len(text):
+            break
+        window *= 2
+    if len(tokens) <= budget:
+        return text
+    # Drop a multi-byte character split by the cut
+    return encoding.decode_bytes(tokens[:budget]).decode('utf-8', errors='ignore')
+
+
+def truncate_tail_to_budget(text: str, budget: int, model: str = DEFAULT_MODEL) -> str:
+    """
+    Returns the longest suffix of text with at most budget tokens, see truncate_to_budget.
+    """
+    if budget <= 0:
+        return ''
+    if _bytes_within(text, budget):
+        return text
+    encoding = get_encoding(model)
+    window = budget * TRUNCATE_WINDOW_CHARS_PER_TOKEN
+    while True:
+        tokens = encoding.encode(text[-window:], disallowed_special=())
+        if len(tokens) > budget or window >= len(text):
+            break
+        window *= 2
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode_bytes(tokens[-budget:]).decode('utf-8', errors='ignore')
+
+
+def head_tail_truncate(text: str, budget: int, model: str = DEFAULT_MODEL, marker: str = TRUNCATION_MARKER) -> str:
+    """
+    Returns text unchanged when it has at most budget tokens, otherwise its head and tail joined by marker.
+    """
+    head = truncate_to_budget(text, budget, model)
+    if len(head) == len(text):
+        return text
+    keep = budget - count_tokens(marker, model)
+    if keep <= 0:
+        # No room for the marker, keep the head only
+        return head
+    tail_budget = keep // 3
+    return truncate_to_budget(text, keep - tail_budget, model) + marker + truncate_tail_to_budget(text, tail_budget, model)
+
+
+def message_content_text(content) -> str:
+    """Returns the text parts of a chat message content, which is a string or a list of parts."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return '\n'.join(part.get('text', '') for part in content if isinstance(part, dict) and part.get('type') == 'text')
+    return '' if content is None else str(content)
+
+
+def count_message_tokens(messages: list, model: str = DEFAULT_MODEL, tokens_per_message: int = 0, tokens_per_name: int = 0, reply_tokens: int = 0) -> int:
+    """Returns the number of tokens of a list of chat messages, with the per-message overhead of model."""
+    num_tokens = reply_tokens
+    for message in messages:
+        num_tokens += tokens_per_message
+        for key, value in message.items():
+            num_tokens += count_tokens(message_content_text(value), model)
+            if key == 'name':
+                num_tokens += tokens_per_name
+    return num_tokens
+
+
+def messages_within_budget(messages: list, budget: int, model: str = DEFAULT_MODEL) -> bool:
+    """Returns whether the contents of messages have at most budget tokens."""
+    texts = [message_content_text(message.get('content')) for message in messages]
+    if sum(len(text.encode('utf-8')) for text in texts) <= budget:
+        return True
+    return sum(count_tokens(text, model) for text in texts) <= budget
@@ -0,0 +1,220 @@
+"""
+Lightweight span tracing exported to a JSONL file.
+
+Spans follow the OpenTelemetry model: each span has a trace id (one per task), a span
+id, its parent span, a name, start/end timestamps and attributes. Nesting follows the
+current context, so code running in worker threads must be submitted through
+contextvars.copy_context().run to stay attached to its task. Tracing is a no-op until
+configure() is called with a file path, or TRACE_FILE is set in the environment.
+
+    with span('llm.chat', model=model) as s:
+        ...
+        s.set_attribute('prompt_tokens', usage.prompt_tokens)
+"""
+import contextvars
+import functools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Attributes summed per stage in the task summary
+TOKEN_ATTRIBUTES = ('prompt_tokens', 'completion_tokens')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.status = 'ok'
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = 'error'
+            self.error = repr(error)
+
+    def to_dict(self):
+        return {
+            "type": "span",
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "thread": threading.current_thread().name,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Writes finished spans to a JSONL file and keeps per-trace stage statistics for summaries.
+    """
+
+    def __init__(self, path=None):
+        self.path = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._stats = {}  # trace_id -> {span name: [(duration, tokens), ...]}
+        if path:
+            self.configure(path)
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    def configure(self, path):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.path = path
+            self._file = open(path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+
+    def export(self, span):
+        tokens = sum(span.attributes.get(key) or 0 for key in TOKEN_ATTRIBUTES)
+        with self._lock:
+            self._stats.setdefault(span.trace_id, {}).setdefault(span.name, []).append((span.duration, tokens))
+        self._write(span.to_dict())
+
+    def summary(self, trace_id, clear=True):
+        """
+        Per span name statistics of a trace: count, total, p50 and p95 in milliseconds and tokens.
+        """
+        with self._lock:
+            stats = self._stats.pop(trace_id, {}) if clear else dict(self._stats.get(trace_id, {}))
+        stages = {}
+        for name, records in sorted(stats.items()):
+            durations = sorted(duration for duration, _ in records)
+            stages[name] = {
+                "count": len(durations),
+                "total_ms": round(sum(durations) * 1000, 3),
+                "p50_ms": round(_percentile(durations, 50) * 1000, 3),
+                "p95_ms": round(_percentile(durations, 95) * 1000, 3),
+                "tokens": sum(tokens for _, tokens in records),
+            }
+        return stages
+
+    def write_summary(self, trace_id, **attributes):
+        stages = self.summary(trace_id)
+        self._write({"type": "summary", "trace_id": trace_id, "attributes": attributes, "stages": stages})
+        return stages
+
+
+def _percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, math.ceil(percentile / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+tracer = Tracer(os.getenv('TRACE_FILE') or None)
+
+
+def configure(path):
+    tracer.configure(path)
+
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Start a new trace, e.g. for one task. Its root span is named name.
+    """
+    trace_id = uuid.uuid4().hex
+    token = _current_trace.set(trace_id)
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the enclosed block as a child of the current span.
+    """
+    if not tracer.enabled:
+        yield _NOOP_SPAN
+        return
+    parent = _current_span.get()
+    trace_id = _current_trace.get() or (parent.trace_id if parent else 'untraced')
+    current = Span(name, trace_id, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end(error)
+        tracer.export(current)
+
+
+def traced(name=None):
+    """
+    Decorator running the function inside a span, named after the function by default.
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id():
+    return _current_trace.get()
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+
+class MicroBatcher:
+    """
+    In-memory request queue in front of a model.
+
+    Request threads submit one item and block on its future. A single worker thread
+    takes the first queued item, keeps collecting for up to max_wait_ms or until
+    max_batch_size items are queued, and runs batch_fn on the whole batch. batch_fn
+    receives a list of items and returns a list of results in the same order.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=8, max_wait_ms=20):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = Queue()
+        self._stats_lock = threading.Lock()
+        self._started_at = time.time()
+        self.batches = 0
+        self.requests = 0
+        self.busy_time = 0.0
+        self.last_batch = {}
+        self._worker = threading.Thread(target=self._run, name=f'{name}-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.time()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _, _ in batch]
+            start = time.time()
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} requests")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                results = None
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            end = time.time()
+            self._record(batch, start, end)
+
+    def _record(self, batch, start, end):
+        latency = end - start
+        queue_wait = max(start - enqueued for _, _, enqueued in batch)
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.busy_time += latency
+            self.last_batch = {
+                "size": len(batch),
+                "latency": round(latency, 4),
+                "max_queue_wait": round(queue_wait, 4),
+                "throughput": round(len(batch) / latency, 3) if latency > 0 else None,
+            }
+        print(f"[{self.name}] batch of {len(batch)} in {latency:.3f}s "
+              f"({len(batch) / latency if latency > 0 else 0:.2f} req/s, max queue wait {queue_wait:.3f}s)")
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "queued": self._queue.qsize(),
+                "avg_batch_size": round(self.requests / self.batches, 3) if self.batches else 0,
+                "avg_batch_latency": round(self.busy_time / self.batches, 4) if self.batches else 0,
+                "throughput": round(self.requests / self.busy_time, 3) if self.busy_time else 0,
+                "uptime": round(time.time() - self._started_at, 1),
+                "last_batch": self.last_batch,
+            }
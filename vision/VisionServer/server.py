@@ -6,13 +6,22 @@ cache_dir = default_cache_path
 print(f"loading models from: {cache_dir}")
 
 os.environ['CUDA_VISIBLE_DEVICES'] = '1'
+import argparse
+import importlib
+import io
 import json
 import socket
 import base64
+import threading
+import uuid
+from contextlib import contextmanager
 from flask import Flask, request, jsonify
+from PIL import Image
 from transformers import AutoModelForCausalLM, AutoTokenizer
 from transformers.generation import GenerationConfig
 import cv2
+import torch
+from batching import MicroBatcher
 
 app = Flask(__name__)
 
@@ -20,11 +29,114 @@ app = Flask(__name__)
 tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen-VL-Chat", trust_remote_code=True)
 model = AutoModelForCausalLM.from_pretrained('cckevinn/SeeClick', device_map="auto", trust_remote_code=True, bf16=True).eval()
 model.generation_config = GenerationConfig.from_pretrained("Qwen/Qwen-VL-Chat", trust_remote_code=True)
+# Batched generation pads on the left so that every prompt ends at the same position
+tokenizer.padding_side = 'left'
+tokenizer.pad_token_id = tokenizer.eod_id
+qwen_utils = importlib.import_module(model.__class__.__module__.rsplit('.', 1)[0] + '.qwen_generation_utils')
+
+# Qwen-VL reads images from the paths embedded in the prompt. Uploaded images are
+# decoded in memory and referenced by a mem:// key instead of being written to disk.
+_memory_images = {}
+_memory_images_lock = threading.Lock()
+_encode_image_paths = model.transformer.visual.encode
+
+
+def _encode_memory_images(image_paths):
+    with _memory_images_lock:
+        images = [_memory_images.get(path) for path in image_paths]
+    if all(image is None for image in images):
+        return _encode_image_paths(image_paths)
+    images = [image if image is not None else Image.open(path).convert("RGB") for image, path in zip(images, image_paths)]
+    visual = model.transformer.visual
+    return visual(torch.stack([visual.image_transform(image) for image in images], dim=0))
+
+
+model.transformer.visual.encode = _encode_memory_images
+
+
+@contextmanager
+def memory_images(images):
+    keys = [f"mem://{uuid.uuid4().hex}.png" for _ in images]
+    with _memory_images_lock:
+        _memory_images.update(zip(keys, images))
+    try:
+        yield keys
+    finally:
+        with _memory_images_lock:
+            for key in keys:
+                _memory_images.pop(key, None)
 
 # Load second model
 from OmniLMMChat import OmniLMMChat, img2base64
 # chat_model = OmniLMMChat('openbmb/OmniLMM-12B') # or 'openbmb/MiniCPM-V'
 
+def seeclick_chat(key, prompt):
+    query = tokenizer.from_list_format([
+        {'image': key},
+        {'text': prompt},
+    ])
+    response, history = model.chat(tokenizer, query=query, history=None)
+    return response
+
+
+def seeclick_generate(keys, prompts):
+    """
+    One generate call over the whole batch, the batched equivalent of model.chat.
+    """
+    chat_format = model.generation_config.chat_format
+    raw_texts = []
+    for key, prompt in zip(keys, prompts):
+        query = tokenizer.from_list_format([
+            {'image': key},
+            {'text': prompt},
+        ])
+        raw_text, _ = qwen_utils.make_context(
+            tokenizer, query, history=None, system="You are a helpful assistant.",
+            max_window_size=model.generation_config.max_window_size, chat_format=chat_format
+        )
+        raw_texts.append(raw_text)
+    batch = tokenizer(raw_texts, padding='longest', return_tensors='pt')
+    input_ids = batch.input_ids.to(model.device)
+    with torch.inference_mode():
+        outputs = model.generate(
+            input_ids,
+            attention_mask=batch.attention_mask.to(model.device),
+            stop_words_ids=qwen_utils.get_stop_words_ids(chat_format, tokenizer),
+            return_dict_in_generate=False,
+            generation_config=model.generation_config,
+        )
+    responses = []
+    for i, raw_text in enumerate(raw_texts):
+        padding = int(input_ids[i].eq(tokenizer.pad_token_id).sum())
+        responses.append(qwen_utils.decode_tokens(
+            outputs[i][padding:], tokenizer, raw_text_len=len(raw_text),
+            context_length=input_ids.size(1) - padding, chat_format=chat_format,
+            verbose=False, errors='replace'
+        ))
+    return responses
+
+
+def seeclick_batch(items):
+    with memory_images([item['image'] for item in items]) as keys:
+        prompts = [item['prompt'] for item in items]
+        if len(items) == 1:
+            return [seeclick_chat(keys[0], prompts[0])]
+        try:
+            return seeclick_generate(keys, prompts)
+        except Exception as e:
+            print(f"Batched SeeClick generation failed ({e}), running the batch one by one")
+            return [seeclick_chat(key, prompt) for key, prompt in zip(keys, prompts)]
+
+
+def omni_batch(items):
+    # OmniLMM generates one sequence per call, the batch only drains the shared queue
+    return [chat_model.chat(item) for item in items]
+
+
+seeclick_batcher = None
+omni_batcher = None
+
+
 @app.route('/seeclick', methods=['POST'])
 def seeclick():
     if 'image' not in request.files or 'text' not in request.form:
@@ -36,16 +148,12 @@ def seeclick():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
-    # Save the image
-    image_path = os.path.join('assets', file.filename)
-    file.save(image_path)
-    
-    query = tokenizer.from_list_format([
-        {'image': image_path},
-        {'text': prompt},
-    ])
-    
-    response, history = model.chat(tokenizer, query=query, history=None)
+    try:
+        image = Image.open(io.BytesIO(file.read())).convert('RGB')
+    except Exception:
+        return jsonify({'error': 'Image decode error'}), 400
+
+    response = seeclick_batcher({'image': image, 'prompt': prompt})
     return jsonify({'dot_location': response})
 
 @app.route('/omni', methods=['POST'])
@@ -58,9 +166,22 @@ def omnilmm():
     msgs = [{"role": "user", "content": content}]
     inputs = {"image": base64_img, "question": json.dumps(msgs)}
 
-    response = chat_model.chat(inputs)
+    response = omni_batcher(inputs)
     
     return jsonify({'answer': response})
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({'seeclick': seeclick_batcher.stats(), 'omni': omni_batcher.stats()})
+
 if __name__ == '__main__':
-    app.run(debug=True, host=socket.gethostname(), port=8998)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='SeeClick / OmniLMM inference server')
+    parser.add_argument('--port', type=int, default=8998)
+    parser.add_argument('--max_batch_size', type=int, default=8, help='max number of concurrent requests run as one batch, 1 disables batching')
+    parser.add_argument('--max_wait_ms', type=float, default=20, help='how long the first request of a batch waits for others')
+    args = parser.parse_args()
+
+    seeclick_batcher = MicroBatcher('seeclick', seeclick_batch, args.max_batch_size, args.max_wait_ms)
+    omni_batcher = MicroBatcher('omni', omni_batch, args.max_batch_size, args.max_wait_ms)
+    # Requests are handled on threads and wait on the batchers, the reloader would load the models twice
+    app.run(debug=True, use_reloader=False, threaded=True, host=socket.gethostname(), port=args.port)
\ No newline at end of file
@@ -1,4 +1,3 @@
-import time
 from typing import List, Dict, Union, Any
 from friday.action.get_os_version import get_os_name
 from vision.llm.openai import OpenAIProvider
@@ -10,6 +9,7 @@ from utils.screen_helper import ScreenHelper
 from utils.KEY_TOOL import IOEnvironment
 from utils.logger import Logger
 from dotenv import load_dotenv
+import json
 import os
 
 '''
@@ -74,9 +74,10 @@ class Vision:
             self.vision_planner.update_action(task_name, current_result, True, vision_type)
             
             if vision_type == 'Click' or vision_type == 'Enter':
-                time.sleep(5)
+                self.screen_helper.wait_until_stable(timeout=5)
 
         result = self.vision_planner.get_pre_tasks_info('end', True)
+        self.logger.info(json.dumps(self.seeclick.client.metrics()), title='Grounding Latency', color='gray')
         
         return result, relevant_code
         
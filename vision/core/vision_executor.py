@@ -5,7 +5,7 @@ import torch
 from vision.llm.openai import OpenAIProvider
 from vision.grounding.seeclick import SeeClick
 from vision.grounding.omnilmm import OmniLMM
-from utils.encode_image import encode_data_to_base64_path, encode_single_data_to_base64
+from utils.encode_image import encode_data_to_base64_path
 from utils.screen_helper import ScreenHelper
 from utils.KEY_TOOL import IOEnvironment
 from utils.logger import Logger
@@ -74,6 +74,12 @@ class VisionExecutor:
             return [False,message]
 
     def text_regularization(self, text):
+        return [key for key, _ in self._split_keys(text)]
+
+    def _split_keys(self, text):
+        """
+        Split text into (key, is_tag) pairs, <key> tags are keys to press and the other characters text to type.
+        """
         result = []
         i = 0
         in_tag = False  
@@ -85,37 +91,47 @@ class VisionExecutor:
                 tag_start = i
             elif s[i] == ">" and in_tag: 
                 in_tag = False
-                result.append(s[tag_start+1:i])
+                result.append((s[tag_start+1:i], True))
             elif not in_tag:
                 if s[i] == " ": 
-                    result.append("space")
+                    result.append(("space", False))
                 else:  
-                    result.append(s[i])
+                    result.append((s[i], False))
             i += 1
 
         return result
     
     def enter(self, text):
-        text_list = self.text_regularization(text)
-        self.logger.info(f"Enter text: {text_list}")
-        for key in text_list:
+        keys = self._split_keys(text)
+        self.logger.info(f"Enter text: {[key for key, _ in keys]}")
+        # Plain characters are typed in bulk, <key> tags, even of a single character, are pressed as keys
+        pending = ''
+        for key, is_tag in keys:
+            if not is_tag:
+                pending += ' ' if key == 'space' else key
+                continue
+            self.key_tool.type_text(pending)
+            pending = ''
             self.key_tool.key_press(key)
+        self.key_tool.type_text(pending)
+        self.screen_helper.invalidate()
         return 'success'
     
-    def click(self, content):
-        image_before = self.screen_helper.capture(heading=False)['base64']
-        result = self.seeclick.get_location_with_current(content)
-        x, y = result['position'][0].item(), result['position'][1].item()
+    def click(self, content, roi=None):
+        # The frame is shared with SeeClick, the screen is grabbed once before the click
+        image_before = self.screen_helper.capture().base64(heading=False)
+        result = self.seeclick.get_location_with_current(content, roi=roi)
+        x, y = result['position']
         
         self.key_tool.move_and_click(x, y, button='left', clicks=2, interval=2, duration=None)
+        self.screen_helper.invalidate()
         
         if not self.assess(content, image_before):
             return 'success'
         return 'fail'
     
     def observe(self, content):
-        captured = self.screen_helper.capture()
-        current_screen = encode_single_data_to_base64(captured['image'])
+        current_screen = self.screen_helper.capture().base64()
         self.messages.append({
             "role": "user",
             "content": [
@@ -6,7 +6,7 @@ from typing import List, Dict, Union, Any
 from vision.llm.openai import OpenAIProvider
 from vision.grounding.seeclick import SeeClick
 from vision.grounding.omnilmm import OmniLMM
-from utils.encode_image import encode_data_to_base64_path, encode_single_data_to_base64
+from utils.encode_image import encode_data_to_base64_path
 from utils.screen_helper import ScreenHelper
 from utils.logger import Logger
 from utils import json_utils
@@ -121,8 +121,7 @@ class VisionPlanner:
             system_prompt = self.templates.get("_SYSTEM_REPLAN_PROMPT", "default")
             user_prompt += "\nThe previous task execution failed. Here's the reflection for failed run: \n" + self.reflection + "\n"
         
-        current_image = self.screen_helper.capture()
-        current_image_base64 = current_image['base64']
+        current_image_base64 = self.screen_helper.capture().base64()
 
         self.message = [
             {
@@ -235,8 +234,7 @@ class VisionPlanner:
             system_version = self.system_version
         )
         
-        captured = self.screen_helper.capture()
-        current_screen = encode_single_data_to_base64(captured['image'])
+        current_screen = self.screen_helper.capture().base64()
         messages = []
         messages.append({
             "role": "user",
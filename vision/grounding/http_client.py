@@ -0,0 +1,196 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.tracing import span
+
+load_dotenv()
+GROUNDING_CONNECT_TIMEOUT = float(os.getenv('GROUNDING_CONNECT_TIMEOUT', 5))
+GROUNDING_READ_TIMEOUT = float(os.getenv('GROUNDING_READ_TIMEOUT', 60))
+# Attempts after the first one on connection errors and gateway errors of the model server,
+# a request that may have reached the server (e.g. a read timeout) is never sent again
+GROUNDING_RETRIES = int(os.getenv('GROUNDING_RETRIES', 2))
+GROUNDING_POOL_SIZE = int(os.getenv('GROUNDING_POOL_SIZE', 8))
+RETRY_STATUSES = (502, 503, 504)
+RETRY_BACKOFF = 0.5
+
+
+class LatencyStats:
+    """
+    Latencies of the last requests of one endpoint, with error and retry counts.
+    """
+
+    def __init__(self, window=1000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg": round(sum(latencies) / len(latencies), 4) if latencies else 0,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "max": round(latencies[-1], 4) if latencies else 0,
+        }
+
+
+def _percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0
+    return round(sorted_values[min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))], 4)
+
+
+class GroundingClient:
+    """
+    Keep-alive HTTP client of the grounding model servers (SeeClick, OmniLMM).
+
+    Sync requests share a pooled requests.Session and async requests a pooled
+    httpx.AsyncClient per event loop. Both use the same timeouts and retry connection
+    errors and gateway errors with exponential backoff. Latencies are recorded per name.
+    close releases both, and aclose the async client of the running loop.
+    """
+
+    def __init__(self, connect_timeout=GROUNDING_CONNECT_TIMEOUT, read_timeout=GROUNDING_READ_TIMEOUT, retries=GROUNDING_RETRIES, pool_size=GROUNDING_POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=RETRY_BACKOFF,
+                      status_forcelist=RETRY_STATUSES, allowed_methods=None, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._async_clients = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name, latency, error=False, retries=0):
+        with self._lock:
+            stats = self._stats.setdefault(name, LatencyStats())
+            stats.requests += 1
+            stats.retries += retries
+            if error:
+                stats.errors += 1
+            else:
+                stats.latencies.append(latency)
+
+    def metrics(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+    def post(self, name, url, data=None, files=None) -> requests.Response:
+        """
+        POST to a grounding server, files as {field: (file name, bytes, content type)}.
+        """
+        start = time.time()
+        with span(f'grounding.{name}', url=url) as s:
+            try:
+                response = self.session.post(url, data=data, files=files, timeout=self.timeout)
+                response.raise_for_status()
+            except requests.RequestException:
+                self._record(name, time.time() - start, error=True)
+                raise
+            history = getattr(getattr(response.raw, 'retries', None), 'history', ())
+            s.set_attribute('retries', len(history))
+        self._record(name, time.time() - start, retries=len(history))
+        return response
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Clients of closed loops cannot be used or closed anymore
+            for closed_loop in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[closed_loop]
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+                self._async_clients[loop] = client
+            return client
+
+    async def apost(self, name, url, data=None, files=None) -> httpx.Response:
+        """
+        Async variant of post.
+        """
+        client = self._get_async_client()
+        start = time.time()
+        with span(f'grounding.{name}', url=url) as s:
+            attempt = 0
+            while True:
+                try:
+                    response = await client.post(url, data=data, files=files)
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                        response.raise_for_status()
+                        break
+                except httpx.TransportError as e:
+                    if attempt >= self.retries or not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                        self._record(name, time.time() - start, error=True, retries=attempt)
+                        raise
+                except httpx.HTTPStatusError:
+                    self._record(name, time.time() - start, error=True, retries=attempt)
+                    raise
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+                attempt += 1
+            s.set_attribute('retries', attempt)
+        self._record(name, time.time() - start, retries=attempt)
+        return response
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """
+        Close the session and the async clients, each on its own event loop. Call aclose instead from a running loop.
+        """
+        self.session.close()
+        with self._lock:
+            clients, self._async_clients = self._async_clients, {}
+        for loop, client in clients.items():
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=GROUNDING_CONNECT_TIMEOUT)
+            else:
+                loop.run_until_complete(client.aclose())
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_grounding_client() -> GroundingClient:
+    """
+    The client shared by every grounding model.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GroundingClient()
+        return _client
+
+
+def close_grounding_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
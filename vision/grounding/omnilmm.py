@@ -1,33 +1,43 @@
-import requests
 import numpy as np
 import torch
 from typing import Union, Dict
 from utils.screen_helper import ScreenHelper
+from vision.grounding.http_client import GroundingClient, get_grounding_client
 
 class OmniLMM:
-    def __init__(self, screen_helper: ScreenHelper, url: str = 'http://localhost:8998/omni', prompt_template: str = "What text on the search box?"):
+    def __init__(self, screen_helper: ScreenHelper, url: str = 'http://localhost:8998/omni', prompt_template: str = "What text on the search box?", client: GroundingClient = None):
         self.url = url
         self.prompt_template = prompt_template
         self.screen_helper = screen_helper
+        self.client = client if client is not None else get_grounding_client()
 
-    def get_response(self, ref: str, custom_template: Union[str, None] = None):
-        try:
-            captured = self.screen_helper.capture(heading=False)
-            base64_img = captured['base64']
-            # print(base64_img[:100])
-            template = custom_template if custom_template else self.prompt_template
-            data = {
-                'content': ref,
-                'image': base64_img
-            }
-            response = requests.post(self.url, data=data)
-            print(response.text)
+    def _request_data(self, ref: str) -> Dict[str, str]:
+        captured = self.screen_helper.capture()
+        return {
+            'content': ref,
+            'image': captured.base64(heading=False)
+        }
 
-            if 'answer' not in response.json():
-                raise ValueError("Response does not contain 'answer'")
+    @staticmethod
+    def _parse_answer(response):
+        print(response.text)
+        answer = response.json()
+        if 'answer' not in answer:
+            raise ValueError("Response does not contain 'answer'")
+        return answer['answer']
 
-            return response.json()['answer']
+    def get_response(self, ref: str, custom_template: Union[str, None] = None):
+        try:
+            response = self.client.post('omnilmm', self.url, data=self._request_data(ref))
+            return self._parse_answer(response)
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"error": str(e)}
 
+    async def get_response_async(self, ref: str, custom_template: Union[str, None] = None):
+        try:
+            response = await self.client.apost('omnilmm', self.url, data=self._request_data(ref))
+            return self._parse_answer(response)
         except Exception as e:
             print(f"Error: {e}")
             return {"error": str(e)}
@@ -1,43 +1,77 @@
-import requests
 import numpy as np
 import cv2
 import supervision as sv
 import datetime
+import os
 import torch
 from typing import Union
 from utils.screen_helper import ScreenHelper
+from utils.image_prep import ImageSpec
+from vision.grounding.http_client import GroundingClient, get_grounding_client
 
 class SeeClick:
-    def __init__(self, screen_helper: ScreenHelper, url: str = 'http://localhost:8998/seeclick', prompt_template: str = "In this UI screenshot, what is the position of the element corresponding to the command \"{}\" (with point)?"):
+    def __init__(self, screen_helper: ScreenHelper, url: str = 'http://localhost:8998/seeclick', prompt_template: str = "In this UI screenshot, what is the position of the element corresponding to the command \"{}\" (with point)?", client: GroundingClient = None, image_spec: ImageSpec = None):
         self.url = url
         self.prompt_template = prompt_template
         self.screen_helper = screen_helper
+        self.client = client if client is not None else get_grounding_client()
+        # Defaults to lossless full-resolution frames, see GROUNDING_IMAGE_*
+        self.image_spec = image_spec if image_spec is not None else ImageSpec.grounding()
 
-    def get_location(self, img_path: str, ref: str, custom_template: str = None) -> torch.Tensor:
+    @staticmethod
+    def parse_location(location: str) -> torch.Tensor:
+        return torch.tensor([[float(coord) for coord in location.strip("()").split(",")]])
+
+    def get_location(self, image: Union[str, bytes], ref: str, custom_template: str = None) -> torch.Tensor:
+        """
+        Locate ref in an image given as a file path or as PNG bytes.
+        """
         prompt = custom_template.format(ref) if custom_template else self.prompt_template.format(ref)
-        files = {'image': open(img_path, 'rb')}
+        if isinstance(image, str):
+            with open(image, 'rb') as f:
+                files = {'image': (os.path.basename(image), f.read(), 'image/png')}
+        else:
+            files = {'image': ('image.png', image, 'image/png')}
         data = {'text': prompt}
 
-        response = requests.post(self.url, files=files, data=data).json()
+        response = self.client.post('seeclick', self.url, data=data, files=files).json()
         print(response['dot_location'])
 
-        location = response['dot_location']
-        return torch.tensor([[float(coord) for coord in location.strip("()").split(",")]])
+        return self.parse_location(response['dot_location'])
 
-    def get_location_with_current(self, ref: str, custom_template: str = None) -> torch.Tensor:
+    def _prepare_current(self, roi=None):
         captured = self.screen_helper.capture()
-        files = {'image': open(captured['file_path'], 'rb')}
+        spec = self.image_spec
+        if roi is not None:
+            spec = spec.with_roi(roi)
+        return captured, captured.prepare(spec)
+
+    def get_location_with_current(self, ref: str, custom_template: str = None, roi=None) -> dict:
+        """
+        Locate ref on the current screen, or only in the (left, top, width, height) region roi.
+        """
+        captured, prepared = self._prepare_current(roi)
+        files = {'image': (prepared.file_name, prepared.data, prepared.mime_type)}
         data = {'text': ref}
         
-        response = requests.post(self.url, files=files, data=data).json()
+        response = self.client.post('seeclick', self.url, data=data, files=files).json()
+        print(response)
+        return self._location_result(response['dot_location'], captured, prepared)
+
+    async def get_location_with_current_async(self, ref: str, custom_template: str = None, roi=None) -> dict:
+        captured, prepared = self._prepare_current(roi)
+        files = {'image': (prepared.file_name, prepared.data, prepared.mime_type)}
+        data = {'text': ref}
+
+        response = (await self.client.apost('seeclick', self.url, data=data, files=files)).json()
         print(response)
-        location = response['dot_location']
-        # location = "(0.39,0.48)"
+        return self._location_result(response['dot_location'], captured, prepared)
 
-        tensor_location = torch.tensor([[float(coord) for coord in location.strip("()").split(",")]])
-        position = [captured['dimensions']['width'] * tensor_location[0][0], captured['dimensions']['height'] * tensor_location[0][1]] # 'left', 'top', 'width', 'height'
+    def _location_result(self, location: str, captured, prepared) -> dict:
+        # location = "(0.39,0.48)", relative to the prepared image
+        tensor_location = self.parse_location(location)
+        position = list(prepared.to_screen(tensor_location[0][0].item(), tensor_location[0][1].item()))
         
-        captured.pop('base64')
         result = {
             "tensor": tensor_location,
             "position": position,
@@ -11,9 +11,9 @@ from typing import (
     Union,
 )
 import asyncio
+import time
 
 import backoff
-import tiktoken
 import numpy as np
 from openai import OpenAI, APIError, RateLimitError, APITimeoutError
 
@@ -24,6 +24,9 @@ from utils.logger import Logger
 from utils.json_utils import load_json
 from utils.encoding_utils import encode_base64, decode_base64
 from utils.file_utils import assemble_project_path
+from utils.token_utils import get_encoding, count_message_tokens
+from utils.tracing import span
+from utils.llm_cassette import get_recorder
 
 config = Config()
 logger = Logger()
@@ -68,6 +71,7 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
         """
         self.retries = 5
         self.cost = 0.0
+        self.cassette = get_recorder()
 
 
     def init_provider(self, provider_cfg ) -> None:
@@ -119,7 +123,10 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
             jitter=None,
         )
         def _embed_with_retry(**kwargs: Any) -> Any:
+            start = time.time()
             response = self.client.embeddings.create(**kwargs)
+            if self.cassette is not None:
+                self.cassette.record('embeddings', kwargs, response.model_dump(), time.time() - start)
             if any(len(d.embedding) == 1 for d in response.data):
                 raise RuntimeError("OpenAI API returned an empty embedding")
             return response
@@ -132,24 +139,11 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
         texts: List[str],
     ) -> List[List[float]]:
         embeddings: List[List[float]] = [[] for _ in range(len(texts))]
-        try:
-            import tiktoken
-        except ImportError:
-            raise ImportError(
-                "Could not import tiktoken python package. "
-                "This is needed in order to for OpenAIEmbeddings. "
-                "Please install it with `pip install tiktoken`."
-            )
 
         tokens = []
         indices = []
         model_name = self.tiktoken_model_name or self.embedding_model
-        try:
-            encoding = tiktoken.encoding_for_model(model_name)
-        except KeyError:
-            logger.warn("Warning: model not found. Using cl100k_base encoding.")
-            model = "cl100k_base"
-            encoding = tiktoken.get_encoding(model)
+        encoding = get_encoding(model_name)
         for i, text in enumerate(texts):
             token = encoding.encode(
                 text,
@@ -294,11 +288,11 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
 
             """Send a request to the OpenAI API."""
 
-            response = self.client.chat.completions.create(model=model,
-            messages=messages,
-            temperature=temperature,
-            seed=seed,
-            max_tokens=max_tokens,)
+            request = dict(model=model, messages=messages, temperature=temperature, seed=seed, max_tokens=max_tokens)
+            start = time.time()
+            response = self.client.chat.completions.create(**request)
+            if self.cassette is not None and response is not None:
+                self.cassette.record('chat.completions', request, response.model_dump(), time.time() - start)
 
             if response is None:
                 logger.error("Failed to get a response from OpenAI. Try again.")
@@ -321,13 +315,16 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
 
             return message, info
 
-        return _generate_response_with_retry(
-            messages,
-            model,
-            temperature,
-            seed,
-            max_tokens,
-        )
+        with span('llm.completion', model=model) as s:
+            message, info = _generate_response_with_retry(
+                messages,
+                model,
+                temperature,
+                seed,
+                max_tokens,
+            )
+            s.set_attributes(prompt_tokens=info["prompt_tokens"], completion_tokens=info["completion_tokens"])
+        return message, info
 
     async def create_completion_async(
             self,
@@ -365,14 +362,11 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
         ) -> Tuple[str, Dict[str, int]]:
 
             """Send a request to the OpenAI API."""
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                seed=seed,
-                max_tokens=max_tokens,
-            )
+            request = dict(model=model, messages=messages, temperature=temperature, seed=seed, max_tokens=max_tokens)
+            start = time.time()
+            response = await asyncio.to_thread(self.client.chat.completions.create, **request)
+            if self.cassette is not None and response is not None:
+                self.cassette.record('chat.completions', request, response.model_dump(), time.time() - start)
 
             if response is None:
                 logger.error("Failed to get a response from OpenAI. Try again.")
@@ -390,24 +384,22 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
 
             return message, info
 
-        return await _generate_response_with_retry_async(
-            messages,
-            model,
-            temperature,
-            seed,
-            max_tokens,
-        )
+        with span('llm.completion', model=model) as s:
+            message, info = await _generate_response_with_retry_async(
+                messages,
+                model,
+                temperature,
+                seed,
+                max_tokens,
+            )
+            s.set_attributes(prompt_tokens=info["prompt_tokens"], completion_tokens=info["completion_tokens"])
+        return message, info
 
 
     def num_tokens_from_messages(self, messages, model):
         """Return the number of tokens used by a list of messages.
         Borrowed from https://github.com/openai/openai-cookbook/blob/main/examples/How_to_count_tokens_with_tiktoken.ipynb
         """
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            logger.debug("Warning: model not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
         if model in {
             "gpt-4-1106-vision-preview",
         }:
@@ -434,17 +426,8 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
                 f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
             )
 
-        num_tokens = 0
-        for message in messages:
-            num_tokens += tokens_per_message
-            for key, value in message.items():
-                num_tokens += len(encoding.encode(value))
-                if key == "name":
-                    num_tokens += tokens_per_name
-
-        num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-
-        return num_tokens
+        # every reply is primed with <|start|>assistant<|message|>
+        return count_message_tokens(messages, model, tokens_per_message, tokens_per_name, reply_tokens=3)
 
 
 # __init__: 初始化类实例。